@@ -0,0 +1,274 @@
+"""Fetch and render many decklists in one run.
+
+``python3 batch.py DECKS`` takes either a directory of card lists
+(``<name>.txt``, each with an optional ``<name>.yml`` of config overrides)
+or a YAML manifest such as::
+
+    decks:
+      - list: lists/elves.txt
+      - name: burn-es
+        list: lists/burn.txt
+        config: {language-default: es, pages-intercalation: false}
+
+Each deck gets its own folder under ``resources/decks/`` and its PDFs under
+``results/batch_<timestamp>/``.  Entries that need fetching are resolved
+together across all decks, images shared between decks are downloaded once
+through the image cache, and the PDFs are rendered in parallel processes.
+"""
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import yaml
+
+import deck_manifest
+import fetch_images
+import generate_pdf
+import prepare_images
+
+DECKS_DIR = os.path.join(fetch_images.RESOURCES_DIR, 'decks')
+
+
+def load_jobs(source):
+    """Return ``{'name', 'list', 'config'}`` for every deck in *source*.
+
+    Names are made safe for file names and unique (``burn``, ``burn-2``) as
+    they name each deck's folder and PDFs.
+    """
+    return _unique_names(_read_jobs(source))
+
+
+def _safe_name(name):
+    # Names become a folder and PDF names, so they must not leave them.
+    name = fetch_images.sanitize_filename(str(name))
+    for sep in (os.sep, os.altsep):
+        if sep:
+            name = name.replace(sep, '')
+    return name.lstrip('. ') or 'deck'
+
+
+def _unique_names(jobs):
+    used = set()
+    for job in jobs:
+        job['name'] = _safe_name(job['name'])
+        name, n = job['name'], 1
+        while name.casefold() in used:
+            n += 1
+            name = f"{job['name']}-{n}"
+        used.add(name.casefold())
+        job['name'] = name
+    return jobs
+
+
+def _read_jobs(source):
+    if os.path.isdir(source):
+        jobs = []
+        for fname in sorted(os.listdir(source)):
+            name, ext = os.path.splitext(fname)
+            if ext.lower() != '.txt':
+                continue
+            overrides = {}
+            for candidate in (f'{name}.yml', f'{name}.yaml'):
+                path = os.path.join(source, candidate)
+                if os.path.exists(path):
+                    with open(path, 'r') as f:
+                        overrides = yaml.safe_load(f) or {}
+                    break
+            jobs.append({
+                'name': name, 'list': os.path.join(source, fname), 'config': overrides,
+            })
+        return jobs
+
+    with open(source, 'r') as f:
+        manifest = yaml.safe_load(f) or {}
+    base = os.path.dirname(source)
+    jobs = []
+    for deck in manifest.get('decks', []):
+        path = os.path.join(base, deck['list'])
+        name = deck.get('name') or os.path.splitext(os.path.basename(path))[0]
+        jobs.append({'name': name, 'list': path, 'config': deck.get('config') or {}})
+    return jobs
+
+
+class SharedResolution:
+    """Engine wrapper answering ``resolve`` from entries resolved up front.
+
+    With *max_entries* only that many resolved entries are kept, least
+    recently used first out.
+    """
+
+    def __init__(self, engine, lang, max_entries=None):
+        self.engine = engine
+        self.lang = lang
+        self.max_entries = max_entries
+        self.resolved = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, card):
+        return deck_manifest.entry_key(card[1], card[2], card[3], self.lang)
+
+    def resolve(self, cards):
+        found = {}
+        missing = {}
+        with self._lock:
+            for card in cards:
+                key = self._key(card)
+                if key in self.resolved:
+                    self.resolved.move_to_end(key)
+                    found[key] = self.resolved[key]
+                else:
+                    missing.setdefault(key, card)
+        if missing:
+            found.update(zip(missing, self.engine.resolve(list(missing.values()))))
+            with self._lock:
+                for key in missing:
+                    self.resolved[key] = found[key]
+                while self.max_entries and len(self.resolved) > self.max_entries:
+                    self.resolved.popitem(last=False)
+        return [found[self._key(c)] for c in cards]
+
+    def iter_fetch(self, cards, resolved, deck_dir=None):
+        return self.engine.iter_fetch(cards, resolved, deck_dir)
+
+
+def _deck_dir(job):
+    return os.path.join(DECKS_DIR, job['name'])
+
+
+def fetch_all(jobs, cfg, engine_name=None):
+    """Update the folder of every deck; returns the fetch time of each."""
+    engine_name = engine_name or cfg.get('fetch-engine', 'threads')
+    fetch_images.configure_rate_limits(cfg)
+    fetch_images.open_bulk_index(cfg)
+    fetch_images.open_image_cache(cfg)
+
+    decks = []
+    engines = {}
+    for job in jobs:
+        lang = {**cfg, **job['config']}.get('language-default', 'es')
+        cards = fetch_images.merge_card_list(fetch_images.parse_card_list(job['list']))
+        deck_dir = _deck_dir(job)
+        os.makedirs(deck_dir, exist_ok=True)
+        if lang not in engines:
+            engines[lang] = SharedResolution(
+                fetch_images._make_engine(engine_name, cfg, lang), lang
+            )
+        decks.append((job, lang, cards, deck_dir))
+
+    # Resolve what every deck still needs in as few collection requests as
+    # possible before fetching deck by deck.
+    for lang, engine in engines.items():
+        pending = []
+        for _, deck_lang, cards, deck_dir in decks:
+            if deck_lang == lang:
+                _, missing = deck_manifest.plan(
+                    deck_manifest.load(deck_dir), cards, lang, deck_dir
+                )
+                pending += missing
+        if pending:
+            engine.resolve(pending)
+
+    timings = {}
+    for job, lang, cards, deck_dir in decks:
+        start = time.perf_counter()
+        print(f"Mazo {job['name']}:")
+        fetch_images.configure_image_variant({**cfg, **job['config']})
+        fetch_images.update_deck(engines[lang], cards, lang, deck_dir)
+        timings[job['name']] = time.perf_counter() - start
+
+    fetch_images._print_rate_limit_summary()
+    if fetch_images._image_cache is not None:
+        fetch_images._image_cache.evict()
+        print(fetch_images._image_cache.summary())
+    return timings
+
+
+def _render_job(job, out_dir):
+    start = time.perf_counter()
+    config = generate_pdf.load_config(overrides=job['config'])
+    paths, _ = generate_pdf.render_deck(
+        config, _deck_dir(job), os.path.join(out_dir, job['name'])
+    )
+    return paths, time.perf_counter() - start
+
+
+def prepare_all(jobs, workers=None):
+    """Resample the images of every deck, once per file and output size.
+
+    Decks share images hardlinked from the image cache; preparing them
+    here, keyed by :func:`prepare_images.source_key`, stops every render
+    process from preparing its own copy.  Returns the number prepared.
+    """
+    groups = {}
+    for job in jobs:
+        config = generate_pdf.load_config(overrides=job['config'])
+        if not config.get('downsample-images'):
+            continue
+        config['GRID'] = generate_pdf.compute_grid(config)
+        cols, rows = config['GRID']
+        pages = generate_pdf.build_pages(
+            generate_pdf.parse_deck(config, _deck_dir(job)), cols, rows
+        )
+        settings = tuple(config.get(k) for k in prepare_images.SETTINGS_KEYS)
+        _, unique = groups.setdefault(settings, (config, {}))
+        for src, width, height in generate_pdf.image_jobs(pages, config):
+            key = (prepare_images.source_key(src), width, height)
+            unique.setdefault(key, (src, width, height))
+    for config, unique in groups.values():
+        prepare_images.prepare_many(
+            list(unique.values()), config, workers or os.cpu_count() or 1
+        )
+    return sum(len(unique) for _, unique in groups.values())
+
+
+def render_all(jobs, out_dir, workers=None):
+    """Render every deck in its own process; returns ``{name: (paths, secs)}``."""
+    os.makedirs(out_dir, exist_ok=True)
+    prepare_all(jobs, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {job['name']: pool.submit(_render_job, job, out_dir) for job in jobs}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def run_batch(source, workers=None, engine=None):
+    jobs = load_jobs(source)
+    if not jobs:
+        print(f"Advertencia: no se encontraron listas de cartas en '{source}'.")
+        return {}
+    cfg = fetch_images.load_config()
+    fetch_times = fetch_all(jobs, cfg, engine)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    out_dir = os.path.join(generate_pdf.RESULTS_DIR, f'batch_{timestamp}')
+    rendered = render_all(jobs, out_dir, workers)
+
+    for job in jobs:
+        paths, seconds = rendered[job['name']]
+        print(
+            f"{job['name']}: descarga {fetch_times[job['name']]:.1f} s, "
+            f"PDF {seconds:.1f} s -> {', '.join(paths)}"
+        )
+    return rendered
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Fetch and render many decklists.')
+    parser.add_argument('decks', help='directory of card lists or a YAML manifest')
+    parser.add_argument(
+        '--workers', type=int,
+        help='processes rendering PDFs at the same time (default: one per CPU)',
+    )
+    parser.add_argument(
+        '--engine', choices=('threads', 'async'),
+        help='fetch with a thread pool (default) or with asyncio and aiohttp',
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    run_batch(args.decks, args.workers, args.engine)
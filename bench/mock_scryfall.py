@@ -0,0 +1,143 @@
+"""Local stand-in for the parts of the Scryfall API used by fetch_images.
+
+Serves ``/cards/collection``, ``/cards/named``, ``/cards/<set>/<number>/<lang>``
+and card images for a synthetic catalogue where every name resolves to a
+card.  Each response is delayed by ``latency`` seconds to mimic the network.
+
+Run it on its own with ``python3 bench/mock_scryfall.py --port 8080`` and set
+``fetch_images.API_URL`` to ``http://127.0.0.1:8080``.
+"""
+import argparse
+import hashlib
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+
+def card_id(name):
+    return hashlib.md5(name.casefold().encode('utf-8')).hexdigest()
+
+
+def make_png(size=(745, 1040)):
+    buf = io.BytesIO()
+    Image.effect_noise(size, 64).convert('RGB').save(buf, 'PNG')
+    return buf.getvalue()
+
+
+class MockScryfall:
+    def __init__(self, latency=0.0, image=None, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.image = image if image is not None else make_png()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def card(self, name, set_code='mock', number=None, lang='en'):
+        ident = card_id(name)
+        return {
+            'object': 'card',
+            'id': ident,
+            'name': name,
+            'lang': lang,
+            'set': set_code,
+            'collector_number': number or ident[:6],
+            'image_uris': {
+                'png': f"{self.url}/images/{ident}.png?1",
+                'large': f"{self.url}/images/{ident}.png?1",
+            },
+        }
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type='application/json'):
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _begin(self):
+                with mock._lock:
+                    mock.requests += 1
+                if mock.latency:
+                    time.sleep(mock.latency)
+                return urlparse(self.path)
+
+            def do_GET(self):
+                url = self._begin()
+                parts = url.path.strip('/').split('/')
+                if parts[0] == 'images':
+                    self._send(200, mock.image, 'image/png')
+                elif parts[:2] == ['cards', 'named']:
+                    query = parse_qs(url.query)
+                    name = (query.get('exact') or query.get('fuzzy') or [''])[0]
+                    lang = query.get('lang', ['en'])[0]
+                    self._send(200, mock.card(name, lang=lang))
+                elif parts[0] == 'cards' and len(parts) == 4:
+                    _, set_code, number, lang = parts
+                    self._send(200, mock.card(f"{set_code} {number}", set_code, number, lang))
+                else:
+                    self._send(404, {'object': 'error'})
+
+            def do_POST(self):
+                url = self._begin()
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if url.path != '/cards/collection':
+                    self._send(404, {'object': 'error'})
+                    return
+                data = []
+                for ident in body.get('identifiers', []):
+                    if 'name' in ident:
+                        data.append(mock.card(ident['name'], ident.get('set', 'mock')))
+                    else:
+                        name = f"{ident['set']} {ident['collector_number']}"
+                        data.append(mock.card(name, ident['set'], ident['collector_number']))
+                self._send(200, {'object': 'list', 'not_found': [], 'data': data})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a mock Scryfall API.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds per response')
+    args = parser.parse_args()
+    mock = MockScryfall(args.latency, port=args.port).start()
+    print(f"Mock Scryfall en {mock.url}")
+    try:
+        mock._thread.join()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == '__main__':
+    main()
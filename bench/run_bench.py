@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Throughput benchmarks for the fetch and render pipelines.
+
+Each case runs in a fresh process inside a temporary directory so that peak
+memory and caches are measured per case::
+
+    python3 bench/run_bench.py                      # 10/100/1000/5000 cards
+    python3 bench/run_bench.py --sizes 100 --latency 0.05
+    python3 bench/run_bench.py --save-baseline      # record current numbers
+
+Results are compared with ``bench/baselines.json``; a case whose throughput
+drops more than ``--tolerance`` below its baseline is reported as a
+regression and the script exits with status 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+BASELINES_FILE = os.path.join(BENCH_DIR, 'baselines.json')
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+
+sys.path.insert(0, REPO_DIR)
+
+
+def _write_config(path, overrides):
+    import yaml
+
+    with open(os.path.join(REPO_DIR, 'config.yml'), 'r') as f:
+        cfg = yaml.safe_load(f)
+    cfg['DEFAULT_BACK'] = os.path.join(REPO_DIR, 'resources', 'back.jpg')
+    cfg.update(overrides)
+    with open(path, 'w') as f:
+        yaml.safe_dump(cfg, f)
+
+
+def _make_deck(deck_dir, cards, unique):
+    """Write *unique* noise images whose quantities add up to *cards*."""
+    from PIL import Image
+
+    os.makedirs(deck_dir, exist_ok=True)
+    unique = min(unique, cards)
+    base, extra = divmod(cards, unique)
+    for i in range(unique):
+        qty = base + (1 if i < extra else 0)
+        img = Image.effect_noise((745, 1040), 64).convert('RGB')
+        img.save(os.path.join(deck_dir, f"{qty} Card {i:05d}.png"))
+
+
+def _peak_rss_mb():
+    import generate_pdf
+
+    return generate_pdf.peak_memory_mb()
+
+
+def bench_render(cards, unique, overrides):
+    import generate_pdf
+
+    _make_deck(generate_pdf.DECK_DIR, cards, unique)
+    _write_config('config.yml', overrides)
+    start = time.perf_counter()
+    config = generate_pdf.load_config()
+    config['GRID'] = generate_pdf.compute_grid(config)
+    deck = generate_pdf.parse_deck(config)
+    pages = generate_pdf.build_pages(deck, *config['GRID'])
+    out = 'bench.pdf'
+    generate_pdf.draw_pages_intercalated(out, pages, config)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'cards_per_sec': len(deck) / elapsed,
+        'pages_per_sec': 2 * len(pages) / elapsed,
+        'output_mb': os.path.getsize(out) / 1024 / 1024,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def bench_fetch(cards, latency, overrides):
+    from mock_scryfall import MockScryfall
+    import fetch_images
+
+    mock = MockScryfall(latency).start()
+    try:
+        fetch_images.API_URL = mock.url
+        cfg = {'scryfall-rate-limit': 0, 'image-rate-limit': 0}
+        cfg.update(overrides)
+        fetch_images.configure_rate_limits(cfg)
+        fetch_images.open_image_cache(cfg)
+        os.makedirs(fetch_images.DECK_DIR, exist_ok=True)
+        entries = [(1, f"Card {i:05d}", None, None) for i in range(cards)]
+        engine = fetch_images._make_engine(cfg.get('fetch-engine', 'threads'), cfg, 'en')
+        start = time.perf_counter()
+        fetch_images.update_deck(engine, entries, 'en')
+        elapsed = time.perf_counter() - start
+    finally:
+        mock.stop()
+    return {
+        'seconds': elapsed,
+        'cards_per_sec': cards / elapsed,
+        'requests': mock.requests,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _run_case(kind, kwargs):
+    sys.path.insert(0, BENCH_DIR)
+    with tempfile.TemporaryDirectory(prefix='mdp-bench-') as tmp:
+        os.chdir(tmp)
+        if kind == 'render':
+            return bench_render(**kwargs)
+        return bench_fetch(**kwargs)
+
+
+def run_case(kind, **kwargs):
+    # A fresh interpreter per case keeps peak RSS and module state separate.
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(_run_case, (kind, kwargs))
+
+
+def load_baselines():
+    try:
+        with open(BASELINES_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark fetch and render throughput.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--unique', type=int, default=200,
+                        help='distinct card images per synthetic deck (default: 200)')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='mock Scryfall latency in seconds (default: 0.02)')
+    parser.add_argument('--only', choices=('render', 'fetch'))
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='config override, e.g. --set image-format=jpeg')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed throughput drop before flagging (default: 0.2)')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    import yaml
+
+    overrides = {k: yaml.safe_load(v) for k, v in (s.split('=', 1) for s in args.set)}
+    baselines = load_baselines()
+    results = {}
+    regressions = []
+
+    print(f"{'case':<14}{'s':>9}{'cards/s':>10}{'pages/s':>9}{'MB out':>8}{'RSS MB':>8}")
+    for size in args.sizes:
+        cases = []
+        if args.only in (None, 'render'):
+            cases.append(('render', {'cards': size, 'unique': args.unique, 'overrides': overrides}))
+        if args.only in (None, 'fetch'):
+            cases.append(('fetch', {'cards': size, 'latency': args.latency, 'overrides': overrides}))
+        for kind, kwargs in cases:
+            name = f"{kind}-{size}"
+            result = run_case(kind, **kwargs)
+            results[name] = result
+            print(
+                f"{name:<14}{result['seconds']:>9.2f}{result['cards_per_sec']:>10.1f}"
+                f"{result.get('pages_per_sec', 0):>9.1f}{result.get('output_mb', 0):>8.1f}"
+                f"{result['peak_rss_mb'] or 0:>8.0f}"
+            )
+            base = baselines.get(name)
+            if base and result['cards_per_sec'] < base['cards_per_sec'] * (1 - args.tolerance):
+                regressions.append(
+                    f"{name}: {result['cards_per_sec']:.1f} cards/s "
+                    f"(baseline {base['cards_per_sec']:.1f})"
+                )
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(BASELINES_FILE, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baselines saved to {BASELINES_FILE}")
+    if regressions:
+        print('Regressions:')
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
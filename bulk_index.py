@@ -0,0 +1,223 @@
+"""Build and query a local SQLite index of Scryfall bulk card data.
+
+Download ``default_cards`` (or ``all_cards`` for every language) from
+https://scryfall.com/docs/api/bulk-data and ingest it with::
+
+    python3 bulk_index.py default-cards.json
+
+``fetch_images.py`` then resolves cards from the index before calling the
+API when ``bulk-index`` is set in ``config.yml``.
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+
+INDEX_FILE = os.path.join('resources', 'scryfall.sqlite')
+
+# Only the fields the fetcher needs are stored for each card.
+CARD_FIELDS = (
+    'id', 'name', 'printed_name', 'lang', 'set', 'collector_number',
+    'layout', 'image_status', 'image_uris',
+)
+FACE_FIELDS = ('name', 'printed_name', 'image_uris')
+
+SCHEMA = """
+CREATE TABLE cards (
+    id TEXT PRIMARY KEY,
+    set_code TEXT NOT NULL,
+    collector TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    released TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE names (
+    name TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    set_code TEXT NOT NULL,
+    released TEXT,
+    card_id TEXT NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE INDEX cards_printing ON cards (set_code, collector, lang);
+CREATE INDEX names_lookup ON names (name, lang, set_code, released);
+"""
+
+
+def normalize_name(name: str) -> str:
+    return re.sub(r'\s+', ' ', name).strip().casefold()
+
+
+def iter_json_array(fp, chunk_size=1 << 20):
+    """Yield the items of a top-level JSON array read from *fp*.
+
+    The file is decoded incrementally, so memory use is bounded by
+    *chunk_size* plus the largest single item.
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if not started and pos < len(buf):
+            if buf[pos] != '[':
+                raise ValueError('expected a JSON array')
+            started = True
+            pos += 1
+            continue
+        if started and pos < len(buf) and buf[pos] == ']':
+            return
+        try:
+            if pos >= len(buf):
+                raise json.JSONDecodeError('need more data', buf, pos)
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError('truncated JSON array')
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        yield item
+        pos = end
+
+
+def compact_card(card):
+    data = {k: card[k] for k in CARD_FIELDS if k in card}
+    if 'card_faces' in card:
+        data['card_faces'] = [
+            {k: face[k] for k in FACE_FIELDS if k in face}
+            for face in card['card_faces']
+        ]
+    return data
+
+
+def _card_names(card):
+    names = {normalize_name(card['name'])}
+    for face in card.get('card_faces', []):
+        names.add(normalize_name(face['name']))
+    return names
+
+
+def build_index(json_path, index_path=INDEX_FILE, batch_size=5000):
+    """Stream *json_path* into a fresh SQLite index at *index_path*.
+
+    Returns the number of cards indexed.
+    """
+    os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+    cards = []
+    names = []
+    total = 0
+
+    def flush():
+        conn.executemany('INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?)', cards)
+        conn.executemany('INSERT INTO names VALUES (?, ?, ?, ?, ?)', names)
+        cards.clear()
+        names.clear()
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        for card in iter_json_array(f):
+            if 'set' not in card or 'collector_number' not in card:
+                continue
+            set_code = card['set'].lower()
+            lang = card.get('lang', 'en')
+            released = card.get('released_at')
+            cards.append((
+                card['id'], set_code, card['collector_number'].lower(), lang,
+                released, json.dumps(compact_card(card), separators=(',', ':')),
+            ))
+            for name in _card_names(card):
+                names.append((name, lang, set_code, released, card['id']))
+            total += 1
+            if len(cards) >= batch_size:
+                flush()
+    flush()
+    conn.executescript(INDEXES)
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, index_path)
+    return total
+
+
+class BulkIndex:
+    """Read-only access to an index built by :func:`build_index`.
+
+    Each thread gets its own SQLite connection.
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def _load(self, row):
+        return json.loads(row[0]) if row else None
+
+    def by_printing(self, set_code, collector, lang):
+        row = self._conn().execute(
+            'SELECT data FROM cards WHERE set_code = ? AND collector = ? AND lang = ?',
+            (set_code.lower(), collector.lower(), lang),
+        ).fetchone()
+        return self._load(row)
+
+    def by_name(self, name, lang, set_code=None):
+        query = (
+            'SELECT c.data FROM names n JOIN cards c ON c.id = n.card_id '
+            'WHERE n.name = ? AND n.lang = ?'
+        )
+        params = [normalize_name(name), lang]
+        if set_code:
+            query += ' AND n.set_code = ?'
+            params.append(set_code.lower())
+        query += ' ORDER BY n.released DESC LIMIT 1'
+        return self._load(self._conn().execute(query, params).fetchone())
+
+    def lookup(self, name, lang, set_code=None, collector=None):
+        """Resolve a card list entry the way the API lookups do.
+
+        The requested language is tried first, then English.  Returns
+        ``None`` when the card is not indexed.
+        """
+        for language in dict.fromkeys((lang, 'en')):
+            if set_code and collector:
+                card = self.by_printing(set_code, collector, language)
+            else:
+                card = self.by_name(name, language, set_code)
+            if card:
+                return card
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Index Scryfall bulk card data.')
+    parser.add_argument('json_path', help='bulk data file (default_cards or all_cards)')
+    parser.add_argument('--index', default=INDEX_FILE, help=f'output file (default: {INDEX_FILE})')
+    args = parser.parse_args(argv)
+    total = build_index(args.json_path, args.index)
+    print(f"Indexadas {total} cartas en {args.index}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,13 +6,15 @@ import re
 DECK_DIR = os.path.join('resources', 'deck')
 
 PATTERN = re.compile(r'^(\d+)\s+')
+# Backs of double-faced cards are counted through their front.
+BACK_PATTERN = re.compile(r'^B\d+\s', re.IGNORECASE)
 
 def count_deck(path=DECK_DIR):
     total = 0
     if not os.path.isdir(path):
         return total
     for fname in os.listdir(path):
-        if fname.startswith('.'):
+        if fname.startswith('.') or BACK_PATTERN.match(fname):
             continue
         m = PATTERN.match(fname)
         if m:
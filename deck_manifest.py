@@ -0,0 +1,134 @@
+"""Manifest of the images fetched into a deck folder.
+
+``fetch_images.py`` records every group of card list entries it fetched
+together with the Scryfall card it resolved to and the files it wrote
+(size, modification time and SHA-256).  On the next run only entries
+that were added or changed are fetched again, and files that no longer
+belong to the list are removed.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = '.manifest.json'
+VERSION = 1
+
+
+def entry_key(name, set_code, collector, lang):
+    return '|'.join((
+        name.casefold(), (set_code or '').lower(), (collector or '').lower(), lang,
+    ))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_record(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': _sha256(path)}
+
+
+def verify_file(path, record):
+    """Return the (possibly refreshed) record of *path*, or ``None`` if invalid.
+
+    Size is checked first; the file is only hashed again when its
+    modification time changed since it was recorded.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if st.st_size != record['size']:
+        return None
+    if st.st_mtime_ns == record['mtime_ns']:
+        return record
+    if _sha256(path) != record['sha256']:
+        return None
+    return dict(record, mtime_ns=st.st_mtime_ns)
+
+
+def load(deck_dir):
+    """Return the units recorded in *deck_dir*, or an empty list."""
+    try:
+        with open(os.path.join(deck_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if data.get('version') != VERSION:
+        return []
+    return data.get('units', [])
+
+
+def save(deck_dir, units):
+    path = os.path.join(deck_dir, MANIFEST_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': VERSION, 'units': units}, f, indent=1)
+    os.replace(tmp, path)
+
+
+def make_unit(sources, lang, card_id, paths, variant='png'):
+    """Build the manifest record for entries fetched together.
+
+    *sources* are the ``(qty, name, set_code, collector)`` entries that were
+    merged into this download and *variant* the Scryfall image size used.
+    """
+    return {
+        'sources': {entry_key(n, s, c, lang): q for q, n, s, c in sources},
+        'id': card_id,
+        'variant': variant,
+        'files': {os.path.basename(p): file_record(p) for p in paths},
+    }
+
+
+def plan(units, cards, lang, deck_dir, variant=None):
+    """Split *cards* into units that are still valid and entries to fetch.
+
+    A unit is kept when every entry it was fetched for is still in the list
+    with the same quantity, it was downloaded in image size *variant* (when
+    given) and all of its files verify.  Returns the kept units and the
+    remaining entries in list order.
+    """
+    current = {entry_key(n, s, c, lang): (q, n, s, c) for q, n, s, c in cards}
+    kept = []
+    for unit in units:
+        sources = unit.get('sources', {})
+        if not sources or any(
+            key not in current or current[key][0] != qty for key, qty in sources.items()
+        ):
+            continue
+        if variant and unit.get('variant', 'png') != variant:
+            continue
+        files = {}
+        for fname, record in unit.get('files', {}).items():
+            checked = verify_file(os.path.join(deck_dir, fname), record)
+            if checked is None:
+                break
+            files[fname] = checked
+        else:
+            kept.append(dict(unit, files=files))
+            for key in sources:
+                del current[key]
+    return kept, list(current.values())
+
+
+def remove_stale(deck_dir, old_units, new_units):
+    """Delete files of *old_units* that no unit in *new_units* still uses."""
+    keep = {fname for unit in new_units for fname in unit['files']}
+    removed = []
+    for unit in old_units:
+        for fname in unit.get('files', {}):
+            if fname in keep:
+                continue
+            path = os.path.join(deck_dir, fname)
+            for candidate in (path, os.path.join(deck_dir, f".{fname}.http")):
+                if os.path.exists(candidate):
+                    os.remove(candidate)
+            keep.add(fname)
+            removed.append(fname)
+    return removed
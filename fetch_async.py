@@ -0,0 +1,274 @@
+"""asyncio fetch engine built on aiohttp.
+
+Selected with ``fetch_images.py --engine async`` or ``fetch-engine: async``.
+Every lookup and image download is scheduled as its own request, so the
+number of requests in flight is bounded by ``async-concurrency`` and the
+rate limits rather than by the number of cards.  Card resolution, file
+names and the image cache are shared with the thread engine in
+``fetch_images``.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import Future
+
+import aiohttp
+
+import fetch_images as fi
+import metrics
+from image_cache import cache_key
+
+DEFAULT_CONCURRENCY = 32
+MAX_RETRIES = 5
+# Failures worth another attempt besides 429/5xx responses.
+RETRY_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+async def _blocking(fn, *args):
+    """Run file system work off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(fn, *args))
+
+
+def _close_synced(f):
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+def _backoff(attempt):
+    return 0.5 * 2 ** attempt
+
+
+class AsyncFetcher:
+    def __init__(self, session, lang):
+        self.session = session
+        self.lang = lang
+        self._inflight = {}
+
+    async def _request(self, method, url, **kwargs):
+        """Send a request, retrying 429/5xx and connection errors with backoff."""
+        for attempt in range(MAX_RETRIES + 1):
+            delay = fi._limiter_for(url).reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                resp = await self.session.request(method, url, **kwargs)
+            except RETRY_ERRORS:
+                if attempt == MAX_RETRIES:
+                    raise
+                await asyncio.sleep(_backoff(attempt))
+                continue
+            if resp.status not in fi.RETRY_STATUSES or attempt == MAX_RETRIES:
+                return resp
+            retry_after = resp.headers.get('Retry-After', '')
+            resp.release()
+            await asyncio.sleep(
+                float(retry_after) if retry_after.isdigit() else _backoff(attempt)
+            )
+
+    async def _json(self, method, url, **kwargs):
+        """Return the decoded body of a 200 response, ``None`` otherwise."""
+        resp = await self._request(method, url, **kwargs)
+        try:
+            if resp.status != 200:
+                return None
+            return await resp.json()
+        finally:
+            resp.release()
+
+    async def resolve(self, cards):
+        """Async counterpart of :func:`fetch_images.resolve_cards`."""
+        identifiers, resolved, batches = fi._plan_resolution(cards, self.lang)
+        bodies = await asyncio.gather(*(
+            self._json('POST', f'{fi.API_URL}/cards/collection', json={'identifiers': batch})
+            for batch in batches
+        ))
+        for batch, body in zip(batches, bodies):
+            matched = fi._match_collection(batch, body) if body else [None] * len(batch)
+            for ident, card_data in zip(batch, matched):
+                resolved[fi._identifier_key(ident)] = card_data
+        return [resolved[fi._identifier_key(i)] for i in identifiers]
+
+    async def lookup(self, name, set_code=None, collector=None):
+        if fi._bulk_index is not None:
+            card_data = fi._bulk_index.lookup(name, self.lang, set_code, collector)
+            if card_data:
+                return card_data
+        for url, params in fi._lookup_requests(name, self.lang, set_code, collector):
+            card_data = await self._json('GET', url, params=params)
+            if card_data:
+                return card_data
+        return None
+
+    async def localize(self, card_data):
+        localized = await self._json('GET', fi._localized_url(card_data, self.lang))
+        return localized or card_data
+
+    async def download(self, url, dest):
+        """Async counterpart of :func:`fetch_images.download_image`.
+
+        Uses the same ``.part`` and ``.<name>.http`` files, so conditional
+        requests and resumed downloads work across both engines.  A
+        connection error or timeout while streaming is retried with
+        backoff, resuming from what was already written.
+        """
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return await self._download(url, dest)
+            except RETRY_ERRORS:
+                if attempt == MAX_RETRIES:
+                    raise
+                await asyncio.sleep(_backoff(attempt))
+
+    async def _download(self, url, dest):
+        part = f"{dest}.part"
+        meta, headers, offset = await _blocking(fi._resume_request, url, dest)
+        resp = await self._request('GET', url, headers=headers)
+        if resp.status == 416 and offset:
+            resp.release()
+            done = await _blocking(
+                fi._finish_unsatisfiable, url, dest, meta, offset, resp.headers
+            )
+            if done:
+                return True
+            meta, headers, offset = await _blocking(fi._resume_request, url, dest)
+            resp = await self._request('GET', url, headers=headers)
+        try:
+            if resp.status == 304:
+                metrics.count('fetch.not_modified')
+                return False
+            if resp.status not in (200, 206):
+                raise IOError(f"HTTP {resp.status} downloading {url}")
+            if resp.status != 206:
+                offset = 0
+            meta['partial'] = dict(
+                fi._validators(resp), url=url,
+                length=fi._full_length(resp.status, resp.headers),
+            )
+            await _blocking(fi._write_meta, dest, meta)
+
+            written = offset
+            f = await _blocking(open, part, 'ab' if offset else 'wb')
+            try:
+                async for chunk in resp.content.iter_chunked(fi.CHUNK_SIZE):
+                    await _blocking(f.write, chunk)
+                    written += len(chunk)
+            finally:
+                await _blocking(_close_synced, f)
+        finally:
+            resp.release()
+
+        length = resp.headers.get('Content-Length')
+        if length is not None and 'Content-Encoding' not in resp.headers:
+            if written - offset != int(length):
+                raise IOError(f"incomplete download of {url}: {written} bytes")
+        await _blocking(os.replace, part, dest)
+        await _blocking(fi._write_meta, dest, dict(fi._validators(resp), url=url))
+        metrics.count('fetch.bytes', written - offset)
+        return True
+
+    async def download_face(self, card_data, face, url, dest):
+        img_url = fi._append_lang(url, self.lang)
+        cache = fi._image_cache
+        if cache is None or 'id' not in card_data:
+            await self.download(img_url, dest)
+            return
+        key = cache_key(
+            card_data['id'], face, card_data.get('lang', self.lang), url, fi._image_variant
+        )
+        if await _blocking(cache.link_cached, key, dest):
+            return
+        # Faces shared by several entries are downloaded by one task; the
+        # others wait for it and link the cached file.
+        task = self._inflight.get(key)
+        if task is not None:
+            await task
+            await _blocking(cache.link_cached, key, dest)
+            return
+        task = self._inflight[key] = asyncio.ensure_future(
+            self._download_to_cache(img_url, cache.path(key))
+        )
+        try:
+            await task
+        finally:
+            del self._inflight[key]
+        await _blocking(cache.add, key, dest)
+
+    async def _download_to_cache(self, url, path):
+        if await _blocking(os.path.exists, path):
+            return
+        await _blocking(functools.partial(os.makedirs, exist_ok=True), os.path.dirname(path))
+        await self.download(url, path)
+
+    async def fetch_card(
+        self, qty, name, set_code=None, collector=None, card_data=None, deck_dir=None
+    ):
+        if card_data is None:
+            card_data = await self.lookup(name, set_code, collector)
+        elif fi._needs_localizing(card_data, self.lang):
+            card_data = await self.localize(card_data)
+        if not fi._check_card(name, self.lang, card_data):
+            return None
+        downloads = fi._plan_downloads(qty, name, card_data, deck_dir)
+        await asyncio.gather(*(
+            self.download_face(card_data, face, url, path)
+            for face, url, path in downloads
+        ))
+        if not downloads:
+            return None
+        return {'id': card_data.get('id'), 'files': [path for _, _, path in downloads]}
+
+
+class AsyncEngine:
+    """Engine for :func:`fetch_images.update_deck` running on asyncio."""
+
+    def __init__(self, lang, concurrency=DEFAULT_CONCURRENCY):
+        self.lang = lang
+        self.concurrency = concurrency
+
+    async def _run(self, work):
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=fi.REQUEST_TIMEOUT)
+        headers = {'User-Agent': fi.USER_AGENT}
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=timeout, headers=headers
+        ) as session:
+            return await work(AsyncFetcher(session, self.lang))
+
+    def resolve(self, cards):
+        return asyncio.run(self._run(lambda fetcher: fetcher.resolve(cards)))
+
+    def iter_fetch(self, cards, resolved, deck_dir=None):
+        """Download *cards* on a background event loop, yielding in order."""
+        futures = [Future() for _ in cards]
+
+        async def one(fetcher, future, card, card_data):
+            try:
+                future.set_result(await fetcher.fetch_card(*card, card_data, deck_dir))
+            except Exception as exc:
+                future.set_exception(exc)
+
+        async def work(fetcher):
+            await asyncio.gather(*(
+                one(fetcher, future, card, card_data)
+                for future, card, card_data in zip(futures, cards, resolved)
+            ))
+
+        def run():
+            try:
+                asyncio.run(self._run(work))
+            except BaseException as exc:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        for future in futures:
+            yield future.result()
+        thread.join()
+
+    def fetch(self, cards, resolved, deck_dir=None):
+        return list(self.iter_fetch(cards, resolved, deck_dir))
@@ -1,24 +1,239 @@
 import os
 import re
+import math
+import json
+import hashlib
+import argparse
 import requests
 import yaml
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from concurrent.futures import ThreadPoolExecutor
 import threading
-from itertools import count
+from rate_limiter import TokenBucket
+from bulk_index import BulkIndex
+from image_cache import ImageCache, cache_key
+import deck_manifest
+import metrics
 
 CONFIG_FILE = 'config.yml'
 RESOURCES_DIR = 'resources'
 DECK_DIR = os.path.join(RESOURCES_DIR, 'deck')
 CARD_LIST_FILE = 'card-list.txt'
 
-_pair_counter = count(1)
-_counter_lock = threading.Lock()
+API_URL = 'https://api.scryfall.com'
+COLLECTION_BATCH_SIZE = 75
 
+DEFAULT_WORKERS = 8
+REQUEST_TIMEOUT = 30
+CHUNK_SIZE = 64 * 1024
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+USER_AGENT = 'magic-deck-printer/1.0'
 
-def _next_pair_id():
-    with _counter_lock:
-        return next(_pair_counter)
+# Scryfall asks for no more than 10 requests per second to the API.
+DEFAULT_API_RATE = 10
+DEFAULT_IMAGE_RATE = 50
+
+# Double-faced cards are saved as ``F<id>``/``B<id>`` pairs; ids are taken
+# from a hash of the printing (see ``_pair_key``), modulo this many values.
+PAIR_ID_DIGITS = 6
+
+# Width in pixels of each image size Scryfall serves.  ``border_crop``
+# trims the card border and is only used when asked for explicitly.
+IMAGE_VARIANTS = {'normal': 488, 'large': 672, 'png': 745, 'border_crop': 480}
+AUTO_VARIANTS = ('normal', 'large', 'png')
+CARD_WIDTH_IN = 2.5
+
+_image_variant = 'png'
+
+_pair_ids = {}
+_used_pair_ids = set()
+_pair_lock = threading.Lock()
+
+_session = None
+_session_lock = threading.Lock()
+
+_bulk_index = None
+_image_cache = None
+
+_limiters = {
+    'api': TokenBucket(DEFAULT_API_RATE),
+    'images': TokenBucket(DEFAULT_IMAGE_RATE),
+}
+
+
+def _pair_key(card_data, name=''):
+    """Return the key :func:`_pair_id` hashes for *card_data*.
+
+    Cards are keyed by printing (set and collector number) rather than by
+    Scryfall id: resolution may return the English card and the download
+    its localized printing, which has another id but the same printing.
+    """
+    if card_data.get('set') and card_data.get('collector_number'):
+        return f"{card_data['set']}/{card_data['collector_number']}"
+    return card_data.get('id') or name.casefold()
+
+
+def _pair_id(key):
+    """Return the ``F``/``B`` id of the double-faced card *key*.
+
+    *key* comes from :func:`_pair_key`, so a card gets the same id on every
+    run; if the hashed id is taken the next free one is used.
+    """
+    space = 10 ** PAIR_ID_DIGITS
+    with _pair_lock:
+        ident = _pair_ids.get(key)
+        if ident is None:
+            n = int(hashlib.sha1(key.encode('utf-8')).hexdigest(), 16) % space
+            while n in _used_pair_ids:
+                n = (n + 1) % space
+            _used_pair_ids.add(n)
+            ident = _pair_ids[key] = f"{n:0{PAIR_ID_DIGITS}d}"
+        return ident
+
+
+def _seed_pair_ids(units, resolved=()):
+    """Reserve the pair ids used by *units* and assign ids for *resolved*.
+
+    Ids for the double-faced cards in *resolved* are handed out in
+    :func:`_pair_key` order, so collisions are settled the same way on every run.
+    """
+    used = {
+        int(m.group(1))
+        for unit in units
+        for fname in unit['files']
+        for m in [re.match(r'^(?:\d+\s+)?[FB](\d+)\s', fname)]
+        if m
+    }
+    with _pair_lock:
+        _pair_ids.clear()
+        _used_pair_ids.clear()
+        _used_pair_ids.update(used)
+    double_faced = {
+        _pair_key(d) for d in resolved
+        if d and 'id' in d and 'image_uris' not in d and 'card_faces' in d
+    }
+    for key in sorted(double_faced):
+        _pair_id(key)
+
+
+def _new_session(pool_size):
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'POST']),
+        raise_on_status=False,
+    )
+    # One pool per host (api.scryfall.com, cards.scryfall.io) with as many
+    # keep-alive connections as there are fetch threads.
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def _get_session(pool_size=DEFAULT_WORKERS):
+    """Return the process-wide HTTP session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _new_session(pool_size)
+        return _session
+
+
+def configure_rate_limits(cfg):
+    """Replace the request budgets with the ones set in *cfg*."""
+    _limiters['api'] = TokenBucket(cfg.get('scryfall-rate-limit', DEFAULT_API_RATE))
+    _limiters['images'] = TokenBucket(cfg.get('image-rate-limit', DEFAULT_IMAGE_RATE))
+
+
+def _limiter_for(url):
+    if urlparse(url).netloc == urlparse(API_URL).netloc:
+        return _limiters['api']
+    return _limiters['images']
+
+
+def _http_get(url, params=None, **kwargs):
+    with metrics.span('http.rate_limit'):
+        _limiter_for(url).acquire()
+    return _get_session().get(url, params=params, timeout=REQUEST_TIMEOUT, **kwargs)
+
+
+def _http_post(url, json=None, **kwargs):
+    with metrics.span('http.rate_limit'):
+        _limiter_for(url).acquire()
+    return _get_session().post(url, json=json, timeout=REQUEST_TIMEOUT, **kwargs)
+
+
+def _print_rate_limit_summary():
+    for label, key in (('API', 'api'), ('imágenes', 'images')):
+        limiter = _limiters[key]
+        print(
+            f"Peticiones {label}: {limiter.acquired}, "
+            f"espera por límite: {limiter.waited:.2f} s"
+        )
+
+
+def open_bulk_index(cfg):
+    """Use the local bulk-data index named by ``bulk-index`` in *cfg*."""
+    global _bulk_index
+    path = cfg.get('bulk-index')
+    _bulk_index = None
+    if not path:
+        return None
+    try:
+        _bulk_index = BulkIndex(path)
+    except FileNotFoundError:
+        print(
+            f"Advertencia: no existe el índice local '{path}'. "
+            "Se usará la API de Scryfall."
+        )
+    return _bulk_index
+
+
+def open_image_cache(cfg):
+    """Use the shared image cache configured by ``image-cache-dir``."""
+    global _image_cache
+    root = cfg.get('image-cache-dir', os.path.join(RESOURCES_DIR, 'cache', 'images'))
+    max_mb = cfg.get('image-cache-max-mb')
+    _image_cache = None
+    if root:
+        _image_cache = ImageCache(root, max_mb * 1024 * 1024 if max_mb else None)
+    return _image_cache
+
+
+def choose_image_variant(cfg):
+    """Return the Scryfall image size to download for *cfg*.
+
+    ``image-variant`` may name any of :data:`IMAGE_VARIANTS`.  With
+    ``auto`` (the default) the smallest image that still covers the card
+    width at ``DPI`` is used, except that PNG is kept when the renderer
+    writes lossless PNGs, so no JPEG artifacts end up in them.
+    """
+    variant = cfg.get('image-variant', 'auto')
+    if variant in IMAGE_VARIANTS:
+        return variant
+    if variant != 'auto':
+        print(
+            f"Advertencia: image-variant '{variant}' no es válido. Se usará 'auto'."
+        )
+    if cfg.get('downsample-images', True) and cfg.get('image-format', 'png') == 'png':
+        return 'png'
+    needed = math.ceil(CARD_WIDTH_IN * cfg.get('DPI', 300))
+    for name in AUTO_VARIANTS:
+        if IMAGE_VARIANTS[name] >= needed:
+            return name
+    return 'png'
+
+
+def configure_image_variant(cfg):
+    global _image_variant
+    _image_variant = choose_image_variant(cfg)
+    return _image_variant
 
 
 def load_config():
@@ -27,7 +242,21 @@ def load_config():
 
 
 def parse_card_list(path=CARD_LIST_FILE):
-    """Parse a card list file.
+    """Parse a card list file; see :func:`parse_card_lines`."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_card_lines(f)
+
+
+CARD_LINE = re.compile(
+    r"^(\d+)\s+(.*?)(?:\s+(?:\(([^)]+)\)|\[([^\]]+)\])(?:\s+([^\s]+))?)?(?:\s+\*F\*)?$",
+    re.IGNORECASE,
+)
+
+
+def parse_card_lines(lines):
+    """Parse the lines of a card list.
 
     Accepted formats:
         ``1 Card Name``
@@ -36,37 +265,217 @@ def parse_card_list(path=CARD_LIST_FILE):
         ``1 Card Name (SET) ABC-123``
     A trailing ``*F*`` flag is ignored, e.g. ``1 Card Name (SET) 123 *F*``.
     """
-
     cards = []
-    if not os.path.exists(path):
-        return cards
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        m = CARD_LINE.match(line)
+        if not m:
+            continue
+        qty = int(m.group(1))
+        name = m.group(2).strip()
+        set_code = m.group(3) or m.group(4)
+        collector = m.group(5)
+        cards.append((qty, name, set_code, collector))
+    return cards
 
-    line_re = re.compile(
-        r"^(\d+)\s+(.*?)(?:\s+(?:\(([^)]+)\)|\[([^\]]+)\])(?:\s+([^\s]+))?)?(?:\s+\*F\*)?$",
-        re.IGNORECASE,
-    )
 
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                continue
-            m = line_re.match(line)
-            if not m:
-                continue
-            qty = int(m.group(1))
-            name = m.group(2).strip()
-            set_code = m.group(3) or m.group(4)
-            collector = m.group(5)
-            cards.append((qty, name, set_code, collector))
-    return cards
+def _meta_path(dest):
+    head, tail = os.path.split(dest)
+    return os.path.join(head, f".{tail}.http")
+
+
+def _read_meta(dest):
+    try:
+        with open(_meta_path(dest), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
 
+def _write_meta(dest, meta):
+    tmp = f"{_meta_path(dest)}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, _meta_path(dest))
+
+
+def _validators(resp):
+    return {
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+    }
+
+
+def _full_length(status, headers):
+    """Return the size of the whole image a response is part of, if known."""
+    total = headers.get('Content-Range', '').rpartition('/')[2]
+    if total.isdigit():
+        return int(total)
+    length = headers.get('Content-Length')
+    if status == 200 and length and 'Content-Encoding' not in headers:
+        return int(length)
+    return None
+
+
+def _resume_request(url, dest):
+    """Return ``(meta, headers, offset)`` for downloading *url* to *dest*.
+
+    Asks for a 304 when *dest* already holds *url*, and for the rest of a
+    matching ``.part`` file with Range/If-Range.
+    """
+    meta = _read_meta(dest)
+    part = f"{dest}.part"
+    headers = {}
+    offset = 0
+    if meta.get('url') == url and os.path.exists(dest):
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+    partial = meta.get('partial') or {}
+    if partial.get('url') == url and os.path.exists(part):
+        validator = partial.get('etag') or partial.get('last_modified')
+        if validator:
+            offset = os.path.getsize(part)
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = validator
+    return meta, headers, offset
+
+
+def _finish_unsatisfiable(url, dest, meta, offset, headers):
+    """Handle a 416 answer to a Range request resuming *dest*.
+
+    Nothing is left after the ``.part`` file: it is either the whole image,
+    left behind before the rename, or stale.  A complete file is renamed
+    into place and ``True`` returned; otherwise it is deleted with its
+    partial meta so the download can start over.
+    """
+    partial = meta.get('partial') or {}
+    part = f"{dest}.part"
+    if offset == (_full_length(416, headers) or partial.get('length')):
+        os.replace(part, dest)
+        _write_meta(dest, {
+            'etag': partial.get('etag'),
+            'last_modified': partial.get('last_modified'),
+            'url': url,
+        })
+        return True
+    os.remove(part)
+    meta.pop('partial', None)
+    _write_meta(dest, meta)
+    return False
+
+
+def merge_card_list(cards):
+    """Collapse entries naming the same printing, summing their quantities.
+
+    Entries are matched by case-insensitive name, set and collector number;
+    the first spelling and position of each printing are kept.
+    """
+    merged = {}
+    for qty, name, set_code, collector in cards:
+        key = (name.casefold(), (set_code or '').lower(), (collector or '').lower())
+        if key in merged:
+            merged[key][0] += qty
+        else:
+            merged[key] = [qty, name, set_code, collector]
+    return [tuple(entry) for entry in merged.values()]
+
+
+def merge_resolved(cards, resolved):
+    """Merge entries that resolved to the same Scryfall card.
+
+    *cards* and *resolved* are aligned lists as returned by
+    :func:`resolve_cards`.  Unresolved entries are kept as they are.
+    Returns the merged entries, their card data and, for each, the list of
+    original entries it combines.
+    """
+    merged = {}
+    for i, (card, card_data) in enumerate(zip(cards, resolved)):
+        if card_data and 'id' in card_data:
+            key = (card_data['id'], card_data.get('lang'))
+        else:
+            key = i
+        if key in merged:
+            entry, data, sources = merged[key]
+            merged[key] = ((entry[0] + card[0],) + entry[1:], data, sources + [card])
+        else:
+            merged[key] = (card, card_data, [card])
+    values = list(merged.values())
+    return [v[0] for v in values], [v[1] for v in values], [v[2] for v in values]
+
+
+@metrics.timed('fetch.download')
 def download_image(url, dest):
-    resp = requests.get(url)
-    resp.raise_for_status()
-    with open(dest, 'wb') as f:
-        f.write(resp.content)
+    """Stream *url* to *dest* and replace it atomically.
+
+    The body is written in chunks to ``dest + '.part'``, checked against
+    ``Content-Length``, fsynced and renamed over *dest*, so an interrupted
+    run never leaves a truncated image behind.  ETag and Last-Modified are
+    kept in a hidden ``.<name>.http`` file: later downloads of the same URL
+    send a conditional request and keep the existing file on 304, and an
+    interrupted ``.part`` file is resumed with a Range request.
+
+    Returns ``False`` when the existing file was still current.
+    """
+    part = f"{dest}.part"
+    meta, headers, offset = _resume_request(url, dest)
+    resp = _http_get(url, headers=headers, stream=True)
+    if resp.status_code == 416 and offset:
+        resp.close()
+        if _finish_unsatisfiable(url, dest, meta, offset, resp.headers):
+            return True
+        meta, headers, offset = _resume_request(url, dest)
+        resp = _http_get(url, headers=headers, stream=True)
+    try:
+        if resp.status_code == 304:
+            metrics.count('fetch.not_modified')
+            return False
+        resp.raise_for_status()
+        if resp.status_code != 206:
+            offset = 0
+        meta['partial'] = dict(
+            _validators(resp), url=url, length=_full_length(resp.status_code, resp.headers)
+        )
+        _write_meta(dest, meta)
+
+        written = offset
+        with open(part, 'ab' if offset else 'wb') as f:
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                written += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    finally:
+        resp.close()
+
+    length = resp.headers.get('Content-Length')
+    if length is not None and 'Content-Encoding' not in resp.headers:
+        if written - offset != int(length):
+            raise IOError(f"incomplete download of {url}: {written} bytes")
+    os.replace(part, dest)
+    _write_meta(dest, dict(_validators(resp), url=url))
+    metrics.count('fetch.bytes', written - offset)
+    return True
+
+
+@metrics.timed('fetch.download')
+def download_bytes(url):
+    """Return the body of *url* without writing it to disk."""
+    resp = _http_get(url)
+    try:
+        resp.raise_for_status()
+        data = resp.content
+    finally:
+        resp.close()
+    length = resp.headers.get('Content-Length')
+    if length is not None and 'Content-Encoding' not in resp.headers:
+        if len(data) != int(length):
+            raise IOError(f"incomplete download of {url}: {len(data)} bytes")
+    metrics.count('fetch.bytes', len(data))
+    return data
 
 
 INVALID_CHARS = r'[<>:"/\\|?*]'
@@ -88,94 +497,445 @@ def _append_lang(url: str, lang: str) -> str:
     return urlunparse(parsed._replace(query=new_query))
 
 
-def _fetch_single_card(qty, name, lang, set_code=None, collector=None):
-    card_data = None
-
+def _lookup_requests(name, lang, set_code=None, collector=None):
+    """Yield the ``(url, params)`` per-card lookups to try, in order."""
     if set_code and collector:
-        url = f"https://api.scryfall.com/cards/{set_code}/{collector}/{lang}"
-        r = requests.get(url)
-        if r.status_code == 200:
-            card_data = r.json()
-    else:
+        yield f"{API_URL}/cards/{set_code}/{collector}/{lang}", None
+        return
+    for mode in ('exact', 'fuzzy'):
         for language in (lang, 'en'):
-            params = {'exact': name, 'lang': language}
+            params = {mode: name, 'lang': language}
             if set_code:
                 params['set'] = set_code
-            r = requests.get(
-                'https://api.scryfall.com/cards/named',
-                params=params,
-            )
-            if r.status_code == 200:
-                card_data = r.json()
-                break
-        if not card_data:
-            for language in (lang, 'en'):
-                params = {'fuzzy': name, 'lang': language}
-                if set_code:
-                    params['set'] = set_code
-                r = requests.get(
-                    'https://api.scryfall.com/cards/named',
-                    params=params,
-                )
-                if r.status_code == 200:
-                    card_data = r.json()
-                    break
+            yield f'{API_URL}/cards/named', params
+
+
+@metrics.timed('fetch.lookup')
+def _lookup_card(name, lang, set_code=None, collector=None):
+    """Resolve one card from the local index or the per-card endpoints."""
+    if _bulk_index is not None:
+        card_data = _bulk_index.lookup(name, lang, set_code, collector)
+        if card_data:
+            return card_data
+
+    for url, params in _lookup_requests(name, lang, set_code, collector):
+        r = _http_get(url, params=params)
+        if r.status_code == 200:
+            return r.json()
+    return None
+
+
+def _collection_identifier(name, set_code=None, collector=None):
+    if set_code and collector:
+        return {'set': set_code.lower(), 'collector_number': collector}
+    if set_code:
+        return {'name': name, 'set': set_code.lower()}
+    return {'name': name}
+
+
+@metrics.timed('fetch.resolve_batch')
+def _resolve_batch(identifiers):
+    """Resolve up to ``COLLECTION_BATCH_SIZE`` identifiers in one request.
+
+    Returns a list aligned with *identifiers* holding the card data or
+    ``None`` for identifiers Scryfall reported as not found.
+    """
+    r = _http_post(f'{API_URL}/cards/collection', json={'identifiers': identifiers})
+    if r.status_code != 200:
+        return [None] * len(identifiers)
+    return _match_collection(identifiers, r.json())
+
+
+def _match_collection(identifiers, body):
+    found = iter(body.get('data', []))
+    not_found = body.get('not_found', [])
+    if len(body.get('data', [])) + len(not_found) != len(identifiers):
+        # Unexpected answer; let the per-card lookups sort it out.
+        return [None] * len(identifiers)
+    return [None if ident in not_found else next(found) for ident in identifiers]
+
+
+def _localized_url(card_data, lang):
+    return f"{API_URL}/cards/{card_data['set']}/{card_data['collector_number']}/{lang}"
+
+
+@metrics.timed('fetch.localize')
+def _localize(card_data, lang):
+    """Return the *lang* printing of *card_data* when Scryfall has one."""
+    r = _http_get(_localized_url(card_data, lang))
+    if r.status_code == 200:
+        return r.json()
+    return card_data
+
+
+def _identifier_key(ident):
+    return tuple(sorted(ident.items()))
+
+
+def resolve_cards(cards, lang):
+    """Resolve parsed card list entries with ``/cards/collection``.
+
+    Entries found in the local bulk index are resolved from it; the
+    remaining distinct entries are sent in batches of
+    ``COLLECTION_BATCH_SIZE``.  Returns a list aligned with *cards* holding
+    the card data, or ``None`` for entries that need the per-card (fuzzy)
+    lookups.  The collection endpoint has no language filter, so other
+    languages are localized later by ``_fetch_single_card``.
+    """
+    identifiers, resolved, batches = _plan_resolution(cards, lang)
+    for batch in batches:
+        for ident, card_data in zip(batch, _resolve_batch(batch)):
+            resolved[_identifier_key(ident)] = card_data
+    return [resolved[_identifier_key(i)] for i in identifiers]
+
+
+def _plan_resolution(cards, lang):
+    """Split *cards* into local index hits and ``/cards/collection`` batches.
+
+    Returns the identifier of each entry, a mapping of already resolved
+    identifier keys to card data, and the batches still to be sent.
+    """
+    identifiers = [
+        _collection_identifier(name, set_code, collector)
+        for _, name, set_code, collector in cards
+    ]
+    resolved = {}
+    if _bulk_index is not None:
+        for ident, (_, name, set_code, collector) in zip(identifiers, cards):
+            card_data = _bulk_index.lookup(name, lang, set_code, collector)
+            if card_data:
+                resolved[_identifier_key(ident)] = card_data
+
+    unique = [
+        ident for key, ident in {_identifier_key(i): i for i in identifiers}.items()
+        if key not in resolved
+    ]
+    batches = [
+        unique[i:i + COLLECTION_BATCH_SIZE]
+        for i in range(0, len(unique), COLLECTION_BATCH_SIZE)
+    ]
+    return identifiers, resolved, batches
+
+
+def _download_face(card_data, face, url, dest, lang):
+    """Download one face of *card_data* to *dest*, using the cache if enabled."""
+    img_url = _append_lang(url, lang)
+    if _image_cache is None or 'id' not in card_data:
+        download_image(img_url, dest)
+        return
+    key = cache_key(card_data['id'], face, card_data.get('lang', lang), url, _image_variant)
+    _image_cache.fetch(key, dest, lambda tmp: download_image(img_url, tmp))
+
+
+def _needs_localizing(card_data, lang):
+    return card_data.get('lang') != lang and 'collector_number' in card_data
+
+
+def _check_card(name, lang, card_data):
+    """Warn about missing cards or languages; return whether to continue."""
     if not card_data:
         print(
             f"Advertencia: no se encontró la carta '{name}' en Scryfall. "
             "Por favor añádela manualmente."
         )
-        return
+        return False
 
     if card_data.get('lang') != lang:
         print(
             f"Advertencia: la carta '{name}' no está disponible en idioma "
             f"{lang}. Se descargará la versión en {card_data.get('lang')}."
         )
+    return True
+
+
+def _card_for_entry(name, lang, set_code=None, collector=None, card_data=None):
+    """Return the card data to download for one entry, or ``None``.
+
+    Entries without *card_data* are looked up one by one; resolved cards in
+    another language are localized when possible.
+    """
+    if card_data is None:
+        card_data = _lookup_card(name, lang, set_code, collector)
+    elif _needs_localizing(card_data, lang):
+        card_data = _localize(card_data, lang)
+    return card_data if _check_card(name, lang, card_data) else None
+
+
+def _image_url(image_uris):
+    return (
+        image_uris.get(_image_variant) or image_uris.get('png') or image_uris.get('large')
+    )
 
+
+def _image_ext(url):
+    return os.path.splitext(urlparse(url).path)[1].lower() or '.png'
+
+
+def face_urls(card_data):
+    """Return the image URL of each printed face of *card_data*.
+
+    One URL for single-faced cards, front and back for cards with two
+    faces, and an empty list when Scryfall has no image.
+    """
+    if 'image_uris' in card_data:
+        return [_image_url(card_data['image_uris'])]
+    faces = card_data.get('card_faces') or []
+    if len(faces) >= 2:
+        return [_image_url(face['image_uris']) for face in faces[:2]]
+    return []
+
+
+def _plan_downloads(qty, name, card_data, deck_dir=None):
+    """Return the ``(face, url, path)`` downloads that store *card_data*.
+
+    Single-faced cards are saved as ``<qty> <name>.png`` in *deck_dir*
+    (``DECK_DIR`` by default).  Cards with two faces are saved once as
+    ``<qty> F<id> <front>.png`` and ``B<id> <back>.png``; the quantity on
+    the front stands for every copy.  The extension follows the image size
+    chosen by :func:`configure_image_variant` (``.jpg`` for all but PNG).
+    """
+    deck_dir = deck_dir or DECK_DIR
     if 'image_uris' in card_data:
-        img_url = card_data['image_uris'].get('png') or card_data['image_uris'].get('large')
-        img_url = _append_lang(img_url, lang)
+        img_url = _image_url(card_data['image_uris'])
         card_name = card_data.get('printed_name') or card_data['name']
         card_name = sanitize_filename(card_name)
-        fname = f"{qty} {card_name}.png"
-        path = os.path.join(DECK_DIR, fname)
-        download_image(img_url, path)
-    elif 'card_faces' in card_data and len(card_data['card_faces']) >= 2:
+        fname = f"{qty} {card_name}{_image_ext(img_url)}"
+        return [(0, img_url, os.path.join(deck_dir, fname))]
+    if 'card_faces' in card_data and len(card_data['card_faces']) >= 2:
         front = card_data['card_faces'][0]
         back = card_data['card_faces'][1]
-        for _ in range(qty):
-            ident = f"{_next_pair_id():02d}"
-            front_name = front.get('printed_name') or front['name']
-            back_name = back.get('printed_name') or back['name']
-            front_name = sanitize_filename(front_name)
-            back_name = sanitize_filename(back_name)
-            fpath = os.path.join(DECK_DIR, f"F{ident} {front_name}.png")
-            bpath = os.path.join(DECK_DIR, f"B{ident} {back_name}.png")
-            front_url = front['image_uris'].get('png') or front['image_uris'].get('large')
-            back_url = back['image_uris'].get('png') or back['image_uris'].get('large')
-            download_image(_append_lang(front_url, lang), fpath)
-            download_image(_append_lang(back_url, lang), bpath)
-    else:
-        print(
-            f"Advertencia: no se encontró imagen para la carta '{name}'. "
-            "Por favor añádela manualmente."
-        )
+        front_name = sanitize_filename(front.get('printed_name') or front['name'])
+        back_name = sanitize_filename(back.get('printed_name') or back['name'])
+        front_url = _image_url(front['image_uris'])
+        back_url = _image_url(back['image_uris'])
+        ident = _pair_id(_pair_key(card_data, name))
+        front_file = f"{qty} F{ident} {front_name}{_image_ext(front_url)}"
+        back_file = f"B{ident} {back_name}{_image_ext(back_url)}"
+        return [
+            (0, front_url, os.path.join(deck_dir, front_file)),
+            (1, back_url, os.path.join(deck_dir, back_file)),
+        ]
+    _warn_missing_image(name)
+    return []
+
+
+def _warn_missing_image(name):
+    print(
+        f"Advertencia: no se encontró imagen para la carta '{name}'. "
+        "Por favor añádela manualmente."
+    )
+
+
+def _plan_card(qty, name, lang, set_code=None, collector=None, card_data=None,
+               deck_dir=None):
+    """Return ``(card_data, downloads)`` for one entry, or ``None``.
+
+    See :func:`_card_for_entry` and :func:`_plan_downloads`.
+    """
+    card_data = _card_for_entry(name, lang, set_code, collector, card_data)
+    if card_data is None:
+        return None
+    downloads = _plan_downloads(qty, name, card_data, deck_dir)
+    return (card_data, downloads) if downloads else None
+
+
+def _card_result(card_data, downloads):
+    return {'id': card_data.get('id'), 'files': [path for _, _, path in downloads]}
+
+
+@metrics.timed('fetch.card')
+def _fetch_single_card(
+    qty, name, lang, set_code=None, collector=None, card_data=None, deck_dir=None
+):
+    """Resolve (unless *card_data* is given) and download one entry.
+
+    Returns ``{'id': ..., 'files': [...]}`` describing what was written, or
+    ``None`` when the card or its image could not be found.  Faces are
+    downloaded one after the other; :class:`ThreadEngine` spreads them over
+    its pool instead.
+    """
+    planned = _plan_card(qty, name, lang, set_code, collector, card_data, deck_dir)
+    if planned is None:
+        return None
+    card_data, downloads = planned
+    for face, url, path in downloads:
+        _download_face(card_data, face, url, path, lang)
+    return _card_result(card_data, downloads)
+
+
+@metrics.timed('fetch.card')
+def _start_card(executor, card, card_data, lang, deck_dir=None):
+    """Plan one entry and download its first face; the others go to *executor*.
+
+    Returns ``(card_data, downloads, futures)`` with the futures of the
+    faces left to the pool, or ``None``.
+    """
+    qty, name, set_code, collector = card
+    planned = _plan_card(qty, name, lang, set_code, collector, card_data, deck_dir)
+    if planned is None:
+        return None
+    card_data, downloads = planned
+    futures = [
+        executor.submit(_download_face, card_data, face, url, path, lang)
+        for face, url, path in downloads[1:]
+    ]
+    face, url, path = downloads[0]
+    _download_face(card_data, face, url, path, lang)
+    return card_data, downloads, futures
+
+
+class ThreadEngine:
+    """Resolve with ``/cards/collection`` and download on a thread pool."""
+
+    def __init__(self, lang, workers=DEFAULT_WORKERS):
+        self.lang = lang
+        self.workers = workers
+
+    def resolve(self, cards):
+        _get_session(self.workers)
+        return resolve_cards(cards, self.lang)
+
+    def iter_fetch(self, cards, resolved, deck_dir=None):
+        """Download *cards* and yield each result, in order, once it is ready.
+
+        The faces of a double-faced card are separate tasks on the pool, so
+        they download at the same time.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(_start_card, executor, card, card_data, self.lang, deck_dir)
+                for card, card_data in zip(cards, resolved)
+            ]
+            for f in futures:
+                started = f.result()
+                if started is None:
+                    yield None
+                    continue
+                card_data, downloads, faces = started
+                for face in faces:
+                    face.result()
+                yield _card_result(card_data, downloads)
+
+    def fetch(self, cards, resolved, deck_dir=None):
+        return list(self.iter_fetch(cards, resolved, deck_dir))
 
 
-def fetch_images():
+def _make_engine(name, cfg, lang):
+    if name == 'async':
+        # aiohttp is only required by the async engine.
+        import fetch_async
+        concurrency = cfg.get('async-concurrency', fetch_async.DEFAULT_CONCURRENCY)
+        return fetch_async.AsyncEngine(lang, concurrency)
+    return ThreadEngine(lang, cfg.get('fetch-workers', DEFAULT_WORKERS))
+
+
+def update_deck(engine, cards, lang, deck_dir=None):
+    """Bring *deck_dir* (``DECK_DIR`` by default) in line with *cards*.
+
+    Entries whose files are recorded in the deck manifest and still verify
+    are left alone; the rest are resolved and downloaded with *engine*, and
+    files no longer used by the list are removed.  Returns the new manifest
+    units.
+    """
+    return list(iter_update_deck(engine, cards, lang, deck_dir))
+
+
+def iter_update_deck(engine, cards, lang, deck_dir=None):
+    """Generator form of :func:`update_deck`.
+
+    Yields each manifest unit as soon as its files are on disk: units kept
+    from the last run first, then fetched ones in list order.  The manifest
+    is saved and stale files removed once the generator is exhausted.
+    """
+    deck_dir = deck_dir or DECK_DIR
+    with metrics.span('fetch.plan'):
+        old_units = deck_manifest.load(deck_dir)
+        kept, pending = deck_manifest.plan(old_units, cards, lang, deck_dir, _image_variant)
+    with metrics.span('fetch.resolve'):
+        resolved = engine.resolve(pending) if pending else []
+
+    # A changed entry may now resolve to a card kept from the last run.
+    # Fetch them together so the printing ends up in a single file.
+    ids = {d['id'] for d in resolved if d and 'id' in d}
+    clashing = [u for u in kept if u.get('id') in ids]
+    if clashing:
+        keys = {key for unit in clashing for key in unit['sources']}
+        extra = [
+            c for c in cards if deck_manifest.entry_key(c[1], c[2], c[3], lang) in keys
+        ]
+        kept = [u for u in kept if u not in clashing]
+        pending += extra
+        with metrics.span('fetch.resolve'):
+            resolved += engine.resolve(extra)
+
+    _seed_pair_ids(kept, resolved)
+    merged, merged_data, sources = merge_resolved(pending, resolved)
+    yield from kept
+    fetched = []
+    if merged:
+        results = engine.iter_fetch(merged, merged_data, deck_dir)
+        for src, result in zip(sources, results):
+            if result:
+                unit = deck_manifest.make_unit(
+                    src, lang, result['id'], result['files'], _image_variant
+                )
+                fetched.append(unit)
+                yield unit
+    with metrics.span('fetch.manifest'):
+        units = kept + fetched
+        removed = deck_manifest.remove_stale(deck_dir, old_units, units)
+        deck_manifest.save(deck_dir, units)
+    print(
+        f"Cartas sin cambios: {len(kept)}, descargadas: {len(fetched)}, "
+        f"archivos eliminados: {len(removed)}"
+    )
+
+
+def fetch_images(engine=None, profile=False, trace=None):
     cfg = load_config()
+    trace = trace or cfg.get('profile-trace')
+    with metrics.profiling(profile or cfg.get('profile'), trace):
+        _fetch_deck(cfg, engine or cfg.get('fetch-engine', 'threads'))
+
+
+def _fetch_deck(cfg, engine, card_list=CARD_LIST_FILE, deck_dir=None):
+    """Fetch *card_list* into *deck_dir* with the settings in *cfg*.
+
+    Unlike :func:`fetch_images` this does not start a profiling session, so
+    callers already inside one (``generate_pdf.py --watch``) can use it.
+    """
+    deck_dir = deck_dir or DECK_DIR
     lang = cfg.get('language-default', 'es')
-    cards = parse_card_list()
-    os.makedirs(DECK_DIR, exist_ok=True)
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(_fetch_single_card, qty, name, lang, set_code, collector)
-            for qty, name, set_code, collector in cards
-        ]
-        for f in futures:
-            f.result()
+    cards = merge_card_list(parse_card_list(card_list))
+    os.makedirs(deck_dir, exist_ok=True)
+    configure_rate_limits(cfg)
+    configure_image_variant(cfg)
+    open_bulk_index(cfg)
+    open_image_cache(cfg)
+    update_deck(_make_engine(engine, cfg, lang), cards, lang, deck_dir)
+    _print_rate_limit_summary()
+    if _image_cache is not None:
+        _image_cache.evict()
+        print(_image_cache.summary())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Download card images from Scryfall.')
+    parser.add_argument(
+        '--engine', choices=('threads', 'async'),
+        help='fetch with a thread pool (default) or with asyncio and aiohttp',
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='print how long lookups and downloads took',
+    )
+    parser.add_argument(
+        '--profile-trace', metavar='FILE',
+        help='also write a Chrome trace of the run to FILE (implies --profile)',
+    )
+    return parser.parse_args(argv)
 
 
 if __name__ == '__main__':
-    fetch_images()
+    args = parse_args()
+    fetch_images(args.engine, args.profile, args.profile_trace)
\ No newline at end of file
@@ -1,12 +1,26 @@
 import os
 import re
+import sys
 import math
+import argparse
 import yaml
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 from datetime import datetime
 from PIL import Image
+from reportlab import rl_config
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4, LETTER
 from reportlab.lib.utils import ImageReader
+import metrics
+from image_store import StoredImage
+from prepare_images import open_rgb, prepare_for_config, prepare_many
+from prepare_images import prune as prune_prepared
 
 CONFIG_FILE = 'config.yml'
 RESOURCES_DIR = 'resources'
@@ -14,7 +28,7 @@ DECK_DIR = os.path.join(RESOURCES_DIR, 'deck')
 RESULTS_DIR = 'results'
 
 CARD_PATTERN = re.compile(
-    r'^(?:(\d+)\s+)?(?:([FB])(\d{2})\s+)?(.*)\.(?:jpg|png)$',
+    r'^(?:(\d+)\s+)?(?:([FB])(\d{2,})\s+)?(.*)\.(?:jpg|png)$',
     re.IGNORECASE,
 )
 
@@ -30,9 +44,15 @@ def mm_to_pt(mm: float) -> float:
     return mm * 72 / 25.4
 
 
-def load_config():
-    with open(CONFIG_FILE, 'r') as f:
+def load_config(path=None, overrides=None):
+    with open(path or CONFIG_FILE, 'r') as f:
         cfg = yaml.safe_load(f)
+    cfg.update(overrides or {})
+    return layout_config(cfg)
+
+
+def layout_config(cfg):
+    """Fill in defaults and the point sizes derived from the settings in *cfg*."""
     page_size = PAGE_SIZES.get(cfg.get('PAGE_SIZE', 'A4').upper(), A4)
     cfg['page_size'] = page_size
     cfg['margin_pt'] = mm_to_pt(cfg.get('MARGIN_MM', 0))
@@ -47,50 +67,83 @@ def load_config():
     cfg.setdefault('guided-lines', True)
     cfg.setdefault('cross-calibrator', False)
     cfg.setdefault('blank-back', False)
+    cfg.setdefault('DPI', 300)
+    cfg.setdefault('downsample-images', True)
+    cfg.setdefault('image-format', 'png')
+    cfg.setdefault('jpeg-quality', 90)
     return cfg
 
 
-def parse_deck(config):
-    cards = []
-    backs = {}
+def iter_deck(config, deck_dir=None):
+    """Yield one ``{'front', 'back'}`` record per card copy in *deck_dir*.
+
+    *deck_dir* defaults to ``DECK_DIR``.  Only file names are held in
+    memory; records are produced lazily.
+    """
+    deck_dir = deck_dir or DECK_DIR
     entries = []
-    for fname in sorted(os.listdir(DECK_DIR)):
+    backs = {}
+    for fname in sorted(os.listdir(deck_dir)):
         match = CARD_PATTERN.match(fname)
         if not match:
             continue
         qty = int(match.group(1)) if match.group(1) else 1
         fb = match.group(2).upper() if match.group(2) else ''
         ident = match.group(3)
-        name = match.group(4)
-        path = os.path.join(DECK_DIR, fname)
-        entries.append({'qty': qty, 'fb': fb, 'id': ident, 'name': name, 'path': path})
-
-    for e in entries:
-        if e['fb'] == 'B' and e['id']:
-            backs[e['id']] = e['path']
-
-    for e in entries:
-        if e['fb'] == 'B':
+        path = os.path.join(deck_dir, fname)
+        if fb == 'B':
+            if ident:
+                backs[ident] = path
             continue
+        entries.append((qty, fb, ident, path))
+
+    for qty, fb, ident, path in entries:
         back = None
-        if e['fb'] == 'F' and e['id'] and e['id'] in backs:
-            back = backs[e['id']]
+        if fb == 'F' and ident and ident in backs:
+            back = backs[ident]
         if not back:
             if config.get('blank-back'):
                 back = None
             else:
                 back = config.get('DEFAULT_BACK')
-        for _ in range(e['qty']):
-            cards.append({'front': e['path'], 'back': back})
-    return cards
+        for _ in range(qty):
+            yield {'front': path, 'back': back}
 
 
-def build_pages(cards, cols, rows):
+@metrics.timed('render.parse_deck')
+def parse_deck(config, deck_dir=None):
+    return list(iter_deck(config, deck_dir))
+
+
+def iter_pages(cards, cols, rows):
+    """Group any iterable of *cards* into pages of ``cols * rows``."""
     cards_per_page = cols * rows
-    pages = []
-    for i in range(0, len(cards), cards_per_page):
-        pages.append(cards[i:i + cards_per_page])
-    return pages
+    page = []
+    for card in cards:
+        page.append(card)
+        if len(page) == cards_per_page:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def build_pages(cards, cols, rows):
+    return list(iter_pages(cards, cols, rows))
+
+
+def image_jobs(pages, config):
+    """Return ``(path, width, height)`` for every distinct image drawn."""
+    cell_w = config['card_width_pt']
+    cell_h = config['card_height_pt']
+    oversize = config.get('back_oversize_pt', 0)
+    jobs = {}
+    for page in pages:
+        for card in page:
+            jobs[(card['front'], cell_w, cell_h)] = None
+            if card['back']:
+                jobs[(card['back'], cell_w + oversize, cell_h + oversize)] = None
+    return list(jobs)
 
 
 def compute_grid(config):
@@ -105,6 +158,106 @@ def compute_grid(config):
     return cols, rows
 
 
+class ImageRegistry:
+    """Decode each distinct image once and reuse its reader for every slot.
+
+    Images are keyed by resolved path, modification time and size so the
+    same file placed many times (the default back, repeated basic lands)
+    is only opened once per document.  ReportLab then emits a single image
+    XObject for all placements of the same reader.
+
+    When ``downsample-images`` is enabled each image is first resampled to
+    the configured ``DPI`` for the size it is drawn at.  The default back
+    prepared by :func:`prepare_default_back` is reused as-is, and so are
+    :class:`image_store.StoredImage` records, read from memory.  Readers are
+    never shared between registries built in different threads: a reader
+    holds one file handle that ReportLab seeks and reads while embedding.
+
+    Readers of a *previous* registry are reused for images that have not
+    changed since, so redrawing a document does not decode them again.
+    """
+
+    def __init__(self, config=None, previous=None):
+        self.config = config or {}
+        self._readers = {}
+        self._prepared = {}
+        self._previous = previous._readers if previous is not None else {}
+        self.placed = 0
+        self._seen = set()
+        self._back_key = self._back_image = None
+        back = self.config.get('_default_back')
+        if back:
+            path, width, height, source, image = back
+            if self.config.get('downsample-images'):
+                self._prepared[(path, width, height)] = source
+            self._back_key = self._key(source)
+            self._back_image = image
+
+    @staticmethod
+    def _key(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return (path, None, None)
+        return (os.path.realpath(path), st.st_mtime_ns, st.st_size)
+
+    def _prepare(self, path, width, height):
+        key = (path, width, height)
+        prepared = self._prepared.get(key)
+        if prepared is None:
+            with metrics.span('render.prepare'):
+                prepared = prepare_for_config(path, width, height, self.config)
+            self._prepared[key] = prepared
+        return prepared
+
+    def _stored(self, image):
+        # Stored images were prepared for their slot when they were loaded.
+        key = ('stored', image.key)
+        reader = self._readers.get(key)
+        if reader is None:
+            with metrics.span('render.open_image'):
+                reader = ImageReader(image.open())
+            self._readers[key] = reader
+        return reader
+
+    def place(self, image):
+        """Count one placement of *image*, a path or stored image."""
+        self._seen.add(image.key if isinstance(image, StoredImage) else image)
+        self.placed += 1
+
+    def get(self, path, width, height):
+        """Return the reader for *path* drawn at this size and count it placed."""
+        reader = self.reader(path, width, height)
+        self.place(path)
+        return reader
+
+    def reader(self, path, width, height):
+        """Return the reader for *path* drawn at this size."""
+        if isinstance(path, StoredImage):
+            return self._stored(path)
+        prepared = self.config.get('downsample-images')
+        if prepared:
+            path = self._prepare(path, width, height)
+        key = self._key(path)
+        reader = self._readers.get(key) or self._previous.get(key)
+        if reader is None:
+            # Prepared files are passed by path so ReportLab can embed
+            # JPEGs as-is instead of decoding and recompressing them.
+            with metrics.span('render.open_image'):
+                if key == self._back_key:
+                    reader = ImageReader(self._back_image)
+                elif prepared:
+                    reader = ImageReader(path)
+                else:
+                    reader = ImageReader(Image.open(path))
+        self._readers[key] = reader
+        return reader
+
+    @property
+    def unique(self):
+        return len(self._seen)
+
+
 def _draw_guides(canvas_obj, config, x_origin, y_top, cols, rows, front):
     if not front or not config.get('guided-lines', True):
         return
@@ -159,14 +312,113 @@ def _draw_crosses(canvas_obj, config, front, x_offset=0, y_offset=0):
     canvas_obj.restoreState()
 
 
-def _draw_single_page(canvas_obj, page, config, front):
-    page_size = config['page_size']
+# Settings that change the prepared default back.
+DEFAULT_BACK_KEYS = (
+    'DEFAULT_BACK', 'blank-back', 'card_width_pt', 'card_height_pt',
+    'back_oversize_pt', 'DPI', 'downsample-images', 'image-format', 'jpeg-quality',
+)
+
+
+def prepare_default_back(config):
+    """Decode and scale ``DEFAULT_BACK`` once for the whole run.
+
+    The back is resampled to the oversized back slot at ``DPI`` (or only
+    decoded and flattened to RGB when ``downsample-images`` is off) and kept
+    in ``config['_default_back']``, where every :class:`ImageRegistry`
+    picks it up, so separate fronts/backs files and streamed parts share it.
+    Each registry makes its own reader from it.  Returns the prepared path
+    or decoded image.
+    """
+    path = config.get('DEFAULT_BACK')
+    if not path or config.get('blank-back'):
+        return None
+    oversize = config.get('back_oversize_pt', 0)
+    width = config['card_width_pt'] + oversize
+    height = config['card_height_pt'] + oversize
+    with metrics.span('render.default_back'):
+        if config.get('downsample-images'):
+            source = image = prepare_for_config(path, width, height, config)
+        else:
+            source = path
+            image = open_rgb(path)
+    config['_default_back'] = (path, width, height, source, image)
+    return image
+
+
+BACK_FORM = 'default_back_sheet'
+
+
+def _grid_origin(config):
+    """Return the x of the first column and the y of the top row."""
     margin = config['margin_pt']
     gap = config['gap_pt']
     cols, rows = config['GRID']
-    page_width, page_height = page_size
+    page_width, page_height = config['page_size']
+    grid_w = cols * config['card_width_pt'] + (cols - 1) * gap
+    grid_h = rows * config['card_height_pt'] + (rows - 1) * gap
+
+    extra_x = max(0, page_width - 2 * margin - grid_w)
+    extra_y = max(0, page_height - 2 * margin - grid_h)
+    return margin + extra_x / 2, page_height - margin - extra_y / 2
+
+
+def _slot_rect(config, idx, x_origin, y_top, front):
+    """Return ``(x, y, width, height)`` of grid slot *idx* on either side."""
+    gap = config['gap_pt']
+    cols, _ = config['GRID']
     cell_width = config['card_width_pt']
     cell_height = config['card_height_pt']
+    oversize = config.get('back_oversize_pt', 0) if not front else 0
+    col = idx % cols
+    row = idx // cols
+    if front:
+        x = x_origin + col * (cell_width + gap)
+    else:
+        x = x_origin + (cols - 1 - col) * (cell_width + gap) + config.get('back_offset_pt', 0)
+    x -= oversize / 2
+    y = y_top - cell_height - row * (cell_height + gap)
+    if not front:
+        y += config.get('vertical_back_offset_pt', 0)
+    y -= oversize / 2
+    return x, y, cell_width + oversize, cell_height + oversize
+
+
+def _back_template(canvas_obj, page, config, images):
+    """Return the form holding a sheet of default backs, if *page* can use it.
+
+    Full back pages are stamped with one Form XObject that has the default
+    back in every slot, drawn once per document; only custom ``B##`` backs
+    are then drawn over it.  The last, partial page is drawn slot by slot.
+    """
+    back = config.get('DEFAULT_BACK')
+    cols, rows = config['GRID']
+    if not back or config.get('blank-back') or len(page) != cols * rows:
+        return None
+    if not any(card['back'] == back for card in page):
+        return None
+    if not canvas_obj.hasForm(BACK_FORM):
+        page_width, page_height = config['page_size']
+        x_origin, y_top = _grid_origin(config)
+        with metrics.span('render.back_template'):
+            # Generous bounding box so offsets and rotation never clip it.
+            canvas_obj.beginForm(
+                BACK_FORM, -page_width, -page_height, 2 * page_width, 2 * page_height
+            )
+            for idx in range(cols * rows):
+                x, y, width, height = _slot_rect(config, idx, x_origin, y_top, False)
+                # Not placements: the form is only stamped by the pages.
+                reader = images.reader(back, width, height)
+                canvas_obj.drawImage(reader, x, y, width=width, height=height)
+            canvas_obj.endForm()
+    return BACK_FORM
+
+
+@metrics.timed('render.page')
+def _draw_single_page(canvas_obj, page, config, front, images=None):
+    if images is None:
+        images = ImageRegistry(config)
+    cols, rows = config['GRID']
+    page_width, page_height = config['page_size']
     angle = float(config.get('page_rotation_deg', 0)) if not front else 0
 
     # ReportLab rotates counter-clockwise for positive values.  The
@@ -177,50 +429,31 @@ def _draw_single_page(canvas_obj, page, config, front):
     if angle < 0:
         angle = 360 - angle
 
+    # Define the back sheet before this page's transforms so the form
+    # content stays in plain page coordinates.
+    template = None if front else _back_template(canvas_obj, page, config, images)
+
     canvas_obj.saveState()
     canvas_obj.translate(page_width/2, page_height/2)
     if angle:
         canvas_obj.rotate(angle)
     canvas_obj.translate(-page_width/2, -page_height/2)
 
-    oversize = config.get('back_oversize_pt', 0) if not front else 0
-
-    grid_w = cols * cell_width + (cols - 1) * gap
-    grid_h = rows * cell_height + (rows - 1) * gap
-
-    extra_x = max(0, page_width - 2 * margin - grid_w)
-    extra_y = max(0, page_height - 2 * margin - grid_h)
-
-    x_origin = margin + extra_x / 2
-    right_margin = x_origin
-    y_top = page_height - margin - extra_y / 2
+    x_origin, y_top = _grid_origin(config)
+    if template:
+        canvas_obj.doForm(template)
 
     for idx, card in enumerate(page):
-        col = idx % cols
-        row = idx // cols
-        if front:
-            x = x_origin + col * (cell_width + gap)
-        else:
-            x = right_margin + (cols - 1 - col) * (cell_width + gap) + config.get('back_offset_pt', 0)
-        x -= oversize / 2
-        y = y_top - cell_height - row * (cell_height + gap)
-        if not front:
-            y += config.get('vertical_back_offset_pt', 0)
-        y -= oversize / 2
+        x, y, width, height = _slot_rect(config, idx, x_origin, y_top, front)
         img_path = card['front'] if front else card['back']
+        if template and img_path == config['DEFAULT_BACK']:
+            images.place(img_path)
+            continue
         if img_path:
-            img = Image.open(img_path)
-            img_reader = ImageReader(img)
-            if front:
-                width = cell_width
-                height = cell_height
-            else:
-                width = cell_width + oversize
-                height = cell_height + oversize
-            canvas_obj.drawImage(img_reader, x, y, width=width, height=height)
+            img_reader = images.get(img_path, width, height)
+            with metrics.span('render.draw_image'):
+                canvas_obj.drawImage(img_reader, x, y, width=width, height=height)
         else:
-            width = cell_width if front else cell_width + oversize
-            height = cell_height if front else cell_height + oversize
             canvas_obj.saveState()
             canvas_obj.setFillColorRGB(1, 1, 1)
             canvas_obj.rect(x, y, width, height, fill=1, stroke=0)
@@ -236,39 +469,356 @@ def _draw_single_page(canvas_obj, page, config, front):
 
 def draw_pages(pdf_path, pages, config, front=True):
     c = canvas.Canvas(pdf_path, pagesize=config['page_size'])
+    images = ImageRegistry(config)
     for page in pages:
-        _draw_single_page(c, page, config, front)
+        _draw_single_page(c, page, config, front, images)
         c.showPage()
-    c.save()
+    with metrics.span('render.save'):
+        c.save()
+    return images
 
 
 def draw_pages_intercalated(pdf_path, pages, config):
     c = canvas.Canvas(pdf_path, pagesize=config['page_size'])
+    images = ImageRegistry(config)
     for page in pages:
-        _draw_single_page(c, page, config, front=True)
+        _draw_single_page(c, page, config, True, images)
         c.showPage()
-        _draw_single_page(c, page, config, front=False)
+        _draw_single_page(c, page, config, False, images)
         c.showPage()
-    c.save()
+    with metrics.span('render.save'):
+        c.save()
+    return images
+
+
+@contextmanager
+def _binary_streams():
+    """Write PDF streams without ASCII85 while the block runs.
+
+    pypdf must decode ASCII85 in pure Python before it can compare streams,
+    which made merging page PDFs take longer than drawing them.
+    """
+    saved = rl_config.useA85
+    rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = saved
+
+
+def draw_pages_incremental(pdf_path, sequence, config, cache):
+    """Write the ``(page, front)`` items of *sequence* using a page cache.
+
+    Only pages missing from *cache* are drawn; each goes to its own
+    single-page PDF that is reused by later builds.
+    """
+    images = ImageRegistry(config)
+
+    def render_page(path, page, front):
+        placed = images.placed
+        with _binary_streams():
+            c = canvas.Canvas(path, pagesize=config['page_size'])
+            _draw_single_page(c, page, config, front, images)
+            c.showPage()
+            with metrics.span('render.save'):
+                c.save()
+        # counted() has already counted this page's slots.
+        images.placed = placed
+
+    def counted():
+        for page, front in sequence:
+            for card in page:
+                image = card['front'] if front else card['back']
+                if image:
+                    images.place(image)
+            yield page, front
+
+    cache.build(pdf_path, counted(), config, render_page)
+    return images
+
+
+def draw_pages_streaming(base_path, pages, config, pages_per_part, sides=(True, False)):
+    """Draw *pages* into part files of at most *pages_per_part* sheets.
+
+    *pages* may be any iterable, such as :func:`iter_pages`.  Each sheet is
+    drawn once per entry of *sides*.  Every part is saved and released
+    before the next one starts, so memory use does not grow with the number
+    of cards.  Returns the part paths and their image registries.
+    """
+    paths = []
+    registries = []
+    c = None
+    for i, page in enumerate(pages):
+        if i % pages_per_part == 0:
+            if c is not None:
+                with metrics.span('render.save'):
+                    c.save()
+            path = f"{base_path}_part{len(paths) + 1:02d}.pdf"
+            c = canvas.Canvas(path, pagesize=config['page_size'])
+            images = ImageRegistry(config)
+            paths.append(path)
+            registries.append(images)
+        for front in sides:
+            _draw_single_page(c, page, config, front, images)
+            c.showPage()
+    if c is not None:
+        with metrics.span('render.save'):
+            c.save()
+    return paths, registries
+
+
+def draw_outputs(base, pages, config, sides=(True, False), previous=None):
+    """Draw *pages* to ``<base>.pdf``, or to ``_fronts``/``_backs`` files.
+
+    Follows ``pages-intercalation``.  *pages* may be any iterable; each page
+    is drawn into every output as soon as it is produced.  Only outputs
+    holding one of *sides* (``True`` for fronts) are written, and
+    *previous* may map their paths to the registries of an earlier draw to
+    reuse.  Returns the written paths and their image registries.
+    """
+    targets = _output_targets(base, config, sides)
+    previous = previous or {}
+    outputs = [
+        (
+            canvas.Canvas(path, pagesize=config['page_size']), target_sides,
+            ImageRegistry(config, previous.get(path)),
+        )
+        for path, target_sides in targets
+    ]
+    for page in pages:
+        for c, target_sides, images in outputs:
+            for front in target_sides:
+                _draw_single_page(c, page, config, front, images)
+                c.showPage()
+    for c, _, _ in outputs:
+        with metrics.span('render.save'):
+            c.save()
+    return [path for path, _ in targets], [images for _, _, images in outputs]
 
 
-def main():
-    config = load_config()
+def _output_targets(base, config, sides=(True, False)):
+    if config.get('pages-intercalation', True):
+        targets = [(f'{base}.pdf', (True, False))]
+    else:
+        targets = [(f'{base}_fronts.pdf', (True,)), (f'{base}_backs.pdf', (False,))]
+    return [t for t in targets if set(t[1]) & set(sides)]
+
+
+# Image counts of a registry drawn in another process.
+ImageCounts = namedtuple('ImageCounts', 'unique placed')
+
+
+def _draw_shard(job):
+    base, pages, config = job
+    with _binary_streams():
+        paths, registries = draw_outputs(base, pages, config)
+    return paths, [ImageCounts(r.unique, r.placed) for r in registries]
+
+
+def merge_pdfs(paths, dest):
+    """Concatenate *paths* into *dest* and delete them.  Requires pypdf."""
+    from pypdf import PdfReader, PdfWriter
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(PdfReader(path))
+    if hasattr(writer, 'compress_identical_objects'):
+        # Every part embeds its own copy of shared images such as the
+        # default back; merge them again.
+        writer.compress_identical_objects()
+    with open(dest, 'wb') as f:
+        writer.write(f)
+    for path in paths:
+        os.remove(path)
+
+
+def draw_outputs_parallel(base, pages, config, workers):
+    """Draw like :func:`draw_outputs`, splitting the pages between processes.
+
+    Each of up to *workers* processes draws a contiguous range of pages
+    into its own part files, which are then merged in order with pypdf.
+    Returns the written paths and the :class:`ImageCounts` of every part.
+    """
+    pages = list(pages)
+    shards = min(workers, len(pages))
+    if shards < 2:
+        return draw_outputs(base, pages, config)
+    size = math.ceil(len(pages) / shards)
+    jobs = [
+        (f'{base}.shard{i:02d}', pages[start:start + size], config)
+        for i, start in enumerate(range(0, len(pages), size))
+    ]
+    with metrics.span('render.shards'):
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(_draw_shard, jobs))
+    targets = _output_targets(base, config)
+    with metrics.span('render.merge'):
+        for i, (path, _) in enumerate(targets):
+            merge_pdfs([paths[i] for paths, _ in results], path)
+    return [path for path, _ in targets], [c for _, counts in results for c in counts]
+
+
+def render_deck(config, deck_dir, base):
+    """Render the cards in *deck_dir* next to *base*; see :func:`draw_outputs`."""
     config['GRID'] = compute_grid(config)
+    prepare_default_back(config)
+    cols, rows = config['GRID']
+    pages = build_pages(parse_deck(config, deck_dir), cols, rows)
+    return draw_outputs(base, pages, config)
+
+
+def peak_memory_mb():
+    """Return the peak resident set size of this process in MiB, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    if sys.platform == 'darwin':
+        return peak / 1024 / 1024
+    return peak / 1024
+
+
+def _print_image_summary(registries):
+    unique = sum(r.unique for r in registries)
+    placed = sum(r.placed for r in registries)
+    print(f"Imágenes: {unique} únicas, {placed} colocadas")
+
+
+def render_streaming(config, pages_per_part, workers=1):
+    """Render the deck without holding all cards or pages in memory."""
+    cols, rows = config['GRID']
+
+    def pages():
+        return iter_pages(iter_deck(config), cols, rows)
+
+    if workers > 1 and config.get('downsample-images'):
+        with metrics.span('render.prepare_many'):
+            prepare_many(image_jobs(pages(), config), config, workers)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    base = os.path.join(RESULTS_DIR, f'deck_{timestamp}')
+    if config.get('pages-intercalation', True):
+        paths, registries = draw_pages_streaming(base, pages(), config, pages_per_part)
+    else:
+        paths, registries = draw_pages_streaming(
+            f'{base}_fronts', pages(), config, pages_per_part, sides=(True,)
+        )
+        back_paths, back_registries = draw_pages_streaming(
+            f'{base}_backs', pages(), config, pages_per_part, sides=(False,)
+        )
+        paths += back_paths
+        registries += back_registries
+    _print_image_summary(registries)
+    peak = peak_memory_mb()
+    print(f"Archivos generados: {len(paths)}")
+    if peak is not None:
+        print(f"Memoria máxima: {peak:.1f} MiB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate printable deck PDFs.')
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help='processes used to prepare images and draw pages '
+             '(default: 1; more than one requires pypdf)',
+    )
+    layout = parser.add_mutually_exclusive_group()
+    layout.add_argument(
+        '--incremental', action='store_true',
+        help='reuse pages rendered by previous runs (requires pypdf)',
+    )
+    layout.add_argument(
+        '--pages-per-part', type=int, metavar='N',
+        help='stream the deck into numbered part files of N sheets each',
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='print how long each phase of the build took',
+    )
+    parser.add_argument(
+        '--profile-trace', metavar='FILE',
+        help='also write a Chrome trace of the build to FILE (implies --profile)',
+    )
+    parser.add_argument(
+        '--watch', action='store_true',
+        help='stay running and redraw results/deck_watch*.pdf when inputs change',
+    )
+    args = parser.parse_args(argv)
+    if args.pages_per_part is not None and args.pages_per_part < 1:
+        parser.error('--pages-per-part must be at least 1')
+    if args.watch and (args.incremental or args.pages_per_part):
+        parser.error('--watch cannot be combined with --incremental or --pages-per-part')
+    return args
+
+
+def _render(args, config):
+    config['GRID'] = compute_grid(config)
+    prepare_default_back(config)
+    if args.workers > 1 and not config.get('downsample-images') and (
+        args.incremental or args.pages_per_part
+    ):
+        print(
+            "Advertencia: con downsample-images desactivado, --workers no "
+            "acelera --incremental ni --pages-per-part."
+        )
+    if args.pages_per_part:
+        render_streaming(config, args.pages_per_part, args.workers)
+        return
     cards = parse_deck(config)
     cols, rows = config['GRID']
     pages = build_pages(cards, cols, rows)
 
+    if args.workers > 1 and config.get('downsample-images'):
+        # Fill the prepared-image cache in parallel; drawing then only
+        # reads finished files, so the output matches the serial path.
+        with metrics.span('render.prepare_many'):
+            prepare_many(image_jobs(pages, config), config, args.workers)
+
     os.makedirs(RESULTS_DIR, exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    if config.get('pages-intercalation', True):
-        pdf_path = os.path.join(RESULTS_DIR, f'deck_{timestamp}.pdf')
-        draw_pages_intercalated(pdf_path, pages, config)
+    if args.incremental:
+        # pypdf is only required for incremental and parallel builds.
+        import page_cache
+        cache = page_cache.PageCache()
+        if config.get('pages-intercalation', True):
+            outputs = [(
+                os.path.join(RESULTS_DIR, f'deck_{timestamp}.pdf'),
+                [(page, front) for page in pages for front in (True, False)],
+            )]
+        else:
+            outputs = [
+                (os.path.join(RESULTS_DIR, f'deck_{timestamp}_fronts.pdf'),
+                 [(page, True) for page in pages]),
+                (os.path.join(RESULTS_DIR, f'deck_{timestamp}_backs.pdf'),
+                 [(page, False) for page in pages]),
+            ]
+        registries = [
+            draw_pages_incremental(path, sequence, config, cache)
+            for path, sequence in outputs
+        ]
+        cache.prune()
+        print(cache.summary())
     else:
-        fronts_pdf = os.path.join(RESULTS_DIR, f'deck_{timestamp}_fronts.pdf')
-        backs_pdf = os.path.join(RESULTS_DIR, f'deck_{timestamp}_backs.pdf')
-        draw_pages(fronts_pdf, pages, config, front=True)
-        draw_pages(backs_pdf, pages, config, front=False)
+        base = os.path.join(RESULTS_DIR, f'deck_{timestamp}')
+        if args.workers > 1:
+            _, registries = draw_outputs_parallel(base, pages, config, args.workers)
+        else:
+            _, registries = draw_outputs(base, pages, config)
+    _print_image_summary(registries)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config()
+    trace = args.profile_trace or config.get('profile-trace')
+    with metrics.profiling(args.profile or config.get('profile'), trace):
+        if args.watch:
+            import watch
+            watch.Watcher().run()
+        else:
+            _render(args, config)
+            if config.get('downsample-images'):
+                prune_prepared()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,156 @@
+"""Persistent image cache shared by every deck fetched on this machine."""
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+CACHE_DIR = os.path.join('resources', 'cache', 'images')
+
+
+def image_version(url: str) -> str:
+    """Return the version stamp Scryfall appends to image URLs (``?1562736365``)."""
+    for part in urlparse(url).query.split('&'):
+        if part and '=' not in part:
+            return part
+    return '0'
+
+
+def cache_key(card_id, face, lang, url, variant='png') -> str:
+    """Return the cache key for one face of one printing in one image size."""
+    ext = os.path.splitext(urlparse(url).path)[1] or '.png'
+    size = '' if variant == 'png' else f"{variant}_"
+    key = f"{card_id}_{face}_{lang}_{size}{image_version(url)}{ext}"
+    return re.sub(r'[^\w.-]', '', key)
+
+
+def link_or_copy(src, dest):
+    """Make *dest* a hardlink to *src*, copying when links are not possible."""
+    tmp = f"{dest}.{threading.get_ident()}.link"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class ImageCache:
+    """Store downloaded images under *root* and link them into deck folders.
+
+    Files are named by :func:`cache_key`, so a printing whose image has not
+    changed is never downloaded twice.  Cached files are hardlinked into
+    deck folders, so their own mtime must stay put: the last use is recorded
+    on an empty ``.<name>.used`` marker next to each file instead, and
+    :meth:`evict` removes the least recently used files once the cache
+    exceeds ``max_bytes``.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    @staticmethod
+    def _marker(path):
+        head, tail = os.path.split(path)
+        return os.path.join(head, f".{tail}.used")
+
+    def _touch(self, path):
+        marker = self._marker(path)
+        with open(marker, 'a'):
+            pass
+        os.utime(marker)
+
+    def link_cached(self, key, dest):
+        """Link the cached image for *key* to *dest*; return ``False`` on a miss."""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return False
+        with self._lock:
+            self.hits += 1
+        self._touch(path)
+        link_or_copy(path, dest)
+        return True
+
+    def add(self, key, dest):
+        """Record a newly downloaded ``path(key)`` and link it to *dest*."""
+        with self._lock:
+            self.misses += 1
+        link_or_copy(self.path(key), dest)
+
+    def fetch(self, key, dest, download):
+        """Place the image for *key* at *dest*.
+
+        ``download(path)`` is called to populate the cache on a miss and
+        must write *path* atomically.  Concurrent misses for the same key
+        share a single download.
+        """
+        path = self.path(key)
+        if self.link_cached(key, dest):
+            return path
+        with self._lock:
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = Future()
+        if not owner:
+            pending.result()
+            self.link_cached(key, dest)
+            return path
+        try:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                download(path)
+            pending.set_result(path)
+        except BaseException as exc:
+            pending.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+        self.add(key, dest)
+        return path
+
+    def evict(self):
+        """Delete least recently used files until the cache fits ``max_bytes``.
+
+        Returns the number of files removed.
+        """
+        if not self.max_bytes or not os.path.isdir(self.root):
+            return 0
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for fname in filenames:
+                if fname.startswith('.'):
+                    continue
+                path = os.path.join(dirpath, fname)
+                st = os.stat(path)
+                try:
+                    used = os.path.getmtime(self._marker(path))
+                except OSError:
+                    used = 0
+                entries.append((max(st.st_mtime, used), st.st_size, path))
+                total += st.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            head, tail = os.path.split(path)
+            for sidecar in (os.path.join(head, f".{tail}.http"), self._marker(path)):
+                if os.path.exists(sidecar):
+                    os.remove(sidecar)
+            total -= size
+            removed += 1
+        return removed
+
+    def summary(self):
+        return f"Caché de imágenes: {self.hits} aciertos, {self.misses} descargas"
@@ -0,0 +1,110 @@
+"""In-memory store of prepared card images.
+
+Used by ``pipeline.py --in-memory`` and the print service: downloaded
+images are resampled for the slot they are printed in and kept as encoded
+bytes in a bounded LRU, keyed by card id, face, language, image size and
+pixel size.  Card records then hold :class:`StoredImage` objects instead of
+paths and :class:`generate_pdf.ImageRegistry` hands their bytes to ReportLab
+without touching the disk; JPEG data is embedded as-is.
+"""
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_MAX_MB = 512
+
+
+class StoredImage:
+    """Prepared image bytes standing in for a file path in card records."""
+
+    __slots__ = ('key', 'data')
+
+    def __init__(self, key, data):
+        self.key = key
+        self.data = data
+
+    def open(self):
+        # BytesIO shares the bytes object until written to, so no copy is made.
+        return io.BytesIO(self.data)
+
+    def __repr__(self):
+        return f"StoredImage({self.key!r}, {len(self.data)} bytes)"
+
+
+class ImageStore:
+    """Bounded LRU of :class:`StoredImage` objects.
+
+    Concurrent requests for a missing key run the loader once; the others
+    wait for its result.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key, data):
+        item = StoredImage(key, data)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old.data)
+            self._items[key] = item
+            self.size += len(data)
+            self._evict()
+        return item
+
+    def _evict(self):
+        # The newest item is kept even when it alone exceeds the limit.
+        while self.max_bytes and self.size > self.max_bytes and len(self._items) > 1:
+            _, item = self._items.popitem(last=False)
+            self.size -= len(item.data)
+
+    def get_or_load(self, key, load):
+        """Return the item for *key*, calling ``load()`` for its bytes on a miss."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+                self.misses += 1
+        if not owner:
+            return future.result()
+        try:
+            item = self.put(key, load())
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(item)
+            return item
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+    def summary(self):
+        return (
+            f"Imágenes en memoria: {len(self._items)} "
+            f"({self.size / 1024 / 1024:.1f} MiB), {self.hits} reutilizadas, "
+            f"{self.misses} descargadas"
+        )
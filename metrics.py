@@ -0,0 +1,175 @@
+"""Timing spans and counters for profiling a run.
+
+Enabled with ``--profile`` (or ``profile: true`` in ``config.yml``) on
+``fetch_images.py`` and ``generate_pdf.py``.  Spans are aggregated by name
+into a table printed at the end of the run.  With ``--profile-trace FILE``
+(or ``profile-trace``) every span is also written to a Chrome trace that can
+be opened in ``chrome://tracing`` or https://ui.perfetto.dev; the file holds
+the aggregated table too under ``metrics``.
+
+When profiling is off ``span`` returns a shared no-op context manager and
+``count`` returns immediately, so instrumented code pays one flag check.
+Work done in other processes (``--workers``) is not recorded.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+_NULL = nullcontext()
+
+_enabled = False
+_tracing = False
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_spans = {}
+_counters = {}
+_events = []
+
+
+def enable(trace=False):
+    """Start recording, discarding anything recorded before."""
+    global _enabled, _tracing, _origin
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _events.clear()
+        _origin = time.perf_counter()
+        _tracing = trace
+        _enabled = True
+
+
+def disable():
+    global _enabled, _tracing
+    _enabled = False
+    _tracing = False
+
+
+def enabled():
+    return _enabled
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        elapsed = end - self.start
+        with _lock:
+            stats = _spans.get(self.name)
+            if stats is None:
+                _spans[self.name] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+            if _tracing:
+                _events.append((self.name, self.start, elapsed, threading.get_ident()))
+        return False
+
+
+def span(name):
+    """Return a context manager timing its block under *name*."""
+    if not _enabled:
+        return _NULL
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator recording every call of the function as a *name* span."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Add *value* to the counter *name*."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def snapshot():
+    """Return the aggregated spans and counters as plain data."""
+    with _lock:
+        spans = {
+            name: {'count': n, 'total_s': total, 'max_s': peak}
+            for name, (n, total, peak) in _spans.items()
+        }
+        return {'spans': spans, 'counters': dict(_counters)}
+
+
+def summary_lines():
+    data = snapshot()
+    lines = [f"{'fase':<28}{'llamadas':>10}{'total s':>10}{'media ms':>10}{'máx ms':>10}"]
+    ordered = sorted(data['spans'].items(), key=lambda item: item[1]['total_s'], reverse=True)
+    for name, stats in ordered:
+        mean = stats['total_s'] / stats['count'] * 1000
+        lines.append(
+            f"{name:<28}{stats['count']:>10}{stats['total_s']:>10.3f}"
+            f"{mean:>10.2f}{stats['max_s'] * 1000:>10.2f}"
+        )
+    for name, value in sorted(data['counters'].items()):
+        lines.append(f"{name:<28}{value:>10}")
+    return lines
+
+
+def print_summary():
+    for line in summary_lines():
+        print(line)
+
+
+def write_trace(path):
+    """Write the recorded spans as Chrome trace events to *path*."""
+    pid = os.getpid()
+    with _lock:
+        events = [
+            {
+                'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': (start - _origin) * 1e6, 'dur': elapsed * 1e6,
+            }
+            for name, start, elapsed, tid in _events
+        ]
+    data = {'traceEvents': events, 'displayTimeUnit': 'ms', 'metrics': snapshot()}
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def profiling(active, trace_path=None, name='total'):
+    """Record the enclosed block when *active* or a *trace_path* is given.
+
+    On exit the summary is printed and the trace, if any, written.
+    """
+    if not active and not trace_path:
+        yield
+        return
+    enable(trace=bool(trace_path))
+    try:
+        with _Span(name):
+            yield
+    finally:
+        print_summary()
+        if trace_path:
+            write_trace(trace_path)
+            print(f"Traza guardada en {trace_path}")
+        disable()
@@ -0,0 +1,119 @@
+"""Cache of rendered PDF pages for incremental rebuilds.
+
+Each page is rendered to its own single-page PDF named after a fingerprint
+of everything that affects it: the content hash of every image on it, their
+grid order, the side and the layout settings.  ``generate_pdf.py
+--incremental`` only renders pages whose fingerprint is not cached and
+splices the rest from disk.  Requires `pypdf <https://pypi.org/project/pypdf/>`_.
+"""
+import hashlib
+import json
+import os
+import time
+
+from pypdf import PdfReader, PdfWriter
+
+import deck_manifest
+
+CACHE_DIR = os.path.join('results', '.page-cache')
+
+# Bump when the drawing code changes in a way that alters rendered pages
+# (3: pages are written without ASCII85).
+RENDER_VERSION = 3
+
+# Config keys that affect how a page is drawn.
+LAYOUT_KEYS = (
+    'page_size', 'margin_pt', 'gap_pt', 'card_width_pt', 'card_height_pt',
+    'GRID', 'back_offset_pt', 'vertical_back_offset_pt', 'back_oversize_pt',
+    'page_rotation_deg', 'guided-lines', 'cross-calibrator', 'blank-back',
+    'DPI', 'downsample-images', 'image-format', 'jpeg-quality',
+)
+
+
+class PageCache:
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+        self._hashes_path = os.path.join(root, 'hashes.json')
+        self._hashes = self._load_hashes()
+        self.reused = 0
+        self.rendered = 0
+
+    def _load_hashes(self):
+        try:
+            with open(self._hashes_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_hashes(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self._hashes_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._hashes, f)
+        os.replace(tmp, self._hashes_path)
+
+    def image_hash(self, path):
+        """Return the SHA-256 of *path*, rehashing only files that changed."""
+        if not path:
+            return None
+        key = os.path.realpath(path)
+        record = self._hashes.get(key)
+        checked = deck_manifest.verify_file(path, record) if record else None
+        if checked is None:
+            checked = deck_manifest.file_record(path)
+        self._hashes[key] = checked
+        return checked['sha256']
+
+    def fingerprint(self, page, config, front):
+        layout = {k: config.get(k) for k in LAYOUT_KEYS}
+        images = [
+            self.image_hash(card['front'] if front else card['back'])
+            for card in page
+        ]
+        data = json.dumps(
+            [RENDER_VERSION, front, images, layout], sort_keys=True, default=str
+        )
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def build(self, pdf_path, sequence, config, render_page):
+        """Write *pdf_path* from the ``(page, front)`` items of *sequence*.
+
+        ``render_page(path, page, front)`` is called to render pages that
+        are not cached yet.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        writer = PdfWriter()
+        for page, front in sequence:
+            path = os.path.join(self.root, f"{self.fingerprint(page, config, front)}.pdf")
+            if os.path.exists(path):
+                self.reused += 1
+                os.utime(path)
+            else:
+                tmp = f"{path}.{os.getpid()}.tmp"
+                render_page(tmp, page, front)
+                os.replace(tmp, path)
+                self.rendered += 1
+            writer.append(PdfReader(path))
+        if hasattr(writer, 'compress_identical_objects'):
+            # Pages rendered separately each embed their own copy of shared
+            # images such as the default back; merge them again.
+            writer.compress_identical_objects()
+        with open(pdf_path, 'wb') as f:
+            writer.write(f)
+        self._save_hashes()
+
+    def prune(self, max_age_days=30):
+        """Delete cached pages not used in the last *max_age_days* days."""
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for fname in os.listdir(self.root):
+            path = os.path.join(self.root, fname)
+            if fname.endswith('.pdf') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def summary(self):
+        return f"Páginas: {self.rendered} generadas, {self.reused} reutilizadas"
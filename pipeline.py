@@ -0,0 +1,217 @@
+"""Fetch the card list and render the PDF in a single run.
+
+``python3 pipeline.py`` does the work of ``fetch_images.py`` followed by
+``generate_pdf.py``, but without waiting for every download to finish:
+each card goes to the page builder as soon as its images are on disk, so
+pages are drawn while later cards are still downloading.  Cards are taken
+straight from the fetch results instead of being read back from file names
+in ``resources/deck/``; cards kept from the previous run come first.
+
+With ``--in-memory`` fetched images skip the deck folder altogether: they
+are downloaded into memory, resampled there and handed to ReportLab from an
+:class:`image_store.ImageStore`.  Either way, images added to the deck
+folder by hand are printed after the fetched cards, as ``generate_pdf.py``
+would print them.
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import deck_manifest
+import fetch_images
+import generate_pdf
+import metrics
+from image_store import DEFAULT_MAX_MB, ImageStore
+from prepare_images import prepare_bytes, pt_to_px
+
+
+def unit_cards(unit, config, deck_dir=None):
+    """Yield the ``{'front', 'back'}`` records of a deck manifest unit.
+
+    A unit with one file is a single-faced card printed once per copy with
+    the default back; otherwise its files are front/back pairs shared by
+    all copies (older decks have one pair per copy).
+    """
+    deck_dir = deck_dir or fetch_images.DECK_DIR
+    paths = [os.path.join(deck_dir, fname) for fname in unit['files']]
+    qty = sum(unit['sources'].values())
+    if len(paths) == 1:
+        back = None if config.get('blank-back') else config.get('DEFAULT_BACK')
+        pairs = [(paths[0], back)]
+    else:
+        pairs = list(zip(paths[::2], paths[1::2]))
+    for front, back in pairs:
+        for _ in range(max(1, qty // len(pairs))):
+            yield {'front': front, 'back': back}
+
+
+def iter_cards(units, config, deck_dir=None):
+    for unit in units:
+        yield from unit_cards(unit, config, deck_dir)
+
+
+def manual_cards(config, deck_dir=None):
+    """Yield the records of the images in *deck_dir* not fetched from the list.
+
+    Files recorded in the deck manifest are skipped; everything else is read
+    the way :func:`generate_pdf.iter_deck` reads it.  The manifest is only
+    read once iteration starts, so this can follow a fetch that updates it.
+    """
+    deck_dir = deck_dir or fetch_images.DECK_DIR
+    if not os.path.isdir(deck_dir):
+        return
+    fetched = {fname for unit in deck_manifest.load(deck_dir) for fname in unit['files']}
+    for card in generate_pdf.iter_deck(config, deck_dir):
+        if os.path.basename(card['front']) not in fetched:
+            yield card
+
+
+def _store_key(card_id, face, lang, width_pt, height_pt, config):
+    key = (card_id, face, lang, fetch_images._image_variant)
+    if not config.get('downsample-images'):
+        return key + ('original',)
+    dpi = config.get('DPI', 300)
+    return key + (
+        pt_to_px(width_pt, dpi), pt_to_px(height_pt, dpi),
+        config.get('image-format', 'png').lower(), config.get('jpeg-quality', 90),
+    )
+
+
+def _load_image(url, lang, width_pt, height_pt, config):
+    data = fetch_images.download_bytes(fetch_images._append_lang(url, lang))
+    if not config.get('downsample-images'):
+        return data
+    dpi = config.get('DPI', 300)
+    with metrics.span('render.prepare'):
+        return prepare_bytes(
+            data,
+            (pt_to_px(width_pt, dpi), pt_to_px(height_pt, dpi)),
+            fmt=config.get('image-format', 'png'),
+            quality=config.get('jpeg-quality', 90),
+        )
+
+
+def memory_cards(entry, card_data, lang, config, store):
+    """Return the card records of one merged entry, loading images into *store*.
+
+    Single-faced cards get the default back; cards with two faces are
+    printed with their own back, resampled to the oversized back slot.
+    """
+    qty, name, set_code, collector = entry
+    card_data = fetch_images._card_for_entry(name, lang, set_code, collector, card_data)
+    if card_data is None:
+        return []
+    urls = fetch_images.face_urls(card_data)
+    if not urls:
+        fetch_images._warn_missing_image(name)
+        return []
+
+    card_id = card_data.get('id') or name.casefold()
+    card_lang = card_data.get('lang', lang)
+    width = config['card_width_pt']
+    height = config['card_height_pt']
+    oversize = config.get('back_oversize_pt', 0)
+    images = []
+    for face, url in enumerate(urls):
+        w, h = (width + oversize, height + oversize) if face else (width, height)
+        images.append(store.get_or_load(
+            _store_key(card_id, face, card_lang, w, h, config),
+            lambda url=url, w=w, h=h: _load_image(url, lang, w, h, config),
+        ))
+    if len(images) == 1:
+        back = None if config.get('blank-back') else config.get('DEFAULT_BACK')
+        images.append(back)
+    return [{'front': images[0], 'back': images[1]} for _ in range(qty)]
+
+
+def iter_memory_cards(engine, cards, lang, config, store, workers=None):
+    """Yield the card records of *cards* in list order, without a deck folder.
+
+    Entries are resolved with *engine* and their images loaded on a pool of
+    *workers* threads; images already in *store* are not downloaded again.
+    """
+    resolved = engine.resolve(cards) if cards else []
+    merged, merged_data, _ = fetch_images.merge_resolved(cards, resolved)
+    workers = workers or fetch_images.DEFAULT_WORKERS
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(memory_cards, entry, card_data, lang, config, store)
+            for entry, card_data in zip(merged, merged_data)
+        ]
+        for f in futures:
+            yield from f.result()
+
+
+def run_pipeline(engine=None, in_memory=False):
+    cfg = fetch_images.load_config()
+    config = generate_pdf.load_config()
+    lang = cfg.get('language-default', 'es')
+    engine = engine or cfg.get('fetch-engine', 'threads')
+
+    cards = fetch_images.merge_card_list(fetch_images.parse_card_list())
+    fetch_images.configure_rate_limits(cfg)
+    fetch_images.configure_image_variant(cfg)
+    fetch_images.open_bulk_index(cfg)
+
+    config['GRID'] = generate_pdf.compute_grid(config)
+    generate_pdf.prepare_default_back(config)
+    cols, rows = config['GRID']
+
+    engine = fetch_images._make_engine(engine, cfg, lang)
+    store = None
+    if in_memory:
+        store = ImageStore(cfg.get('memory-cache-mb', DEFAULT_MAX_MB) * 1024 * 1024)
+        records = iter_memory_cards(
+            engine, cards, lang, config, store, cfg.get('fetch-workers')
+        )
+    else:
+        os.makedirs(fetch_images.DECK_DIR, exist_ok=True)
+        fetch_images.open_image_cache(cfg)
+        records = iter_cards(fetch_images.iter_update_deck(engine, cards, lang), config)
+    records = itertools.chain(records, manual_cards(config))
+    pages = generate_pdf.iter_pages(records, cols, rows)
+
+    os.makedirs(generate_pdf.RESULTS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    base = os.path.join(generate_pdf.RESULTS_DIR, f'deck_{timestamp}')
+    paths, registries = generate_pdf.draw_outputs(base, pages, config)
+
+    fetch_images._print_rate_limit_summary()
+    if fetch_images._image_cache is not None:
+        fetch_images._image_cache.evict()
+        print(fetch_images._image_cache.summary())
+    if store is not None:
+        print(store.summary())
+    generate_pdf._print_image_summary(registries)
+    return paths
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Download card images and generate the deck PDFs in one run.'
+    )
+    parser.add_argument(
+        '--engine', choices=('threads', 'async'),
+        help='fetch with a thread pool (default) or with asyncio and aiohttp',
+    )
+    parser.add_argument(
+        '--in-memory', action='store_true',
+        help='keep images in memory instead of writing them to resources/deck/',
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='print how long each phase took',
+    )
+    parser.add_argument(
+        '--profile-trace', metavar='FILE',
+        help='also write a Chrome trace of the run to FILE (implies --profile)',
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    with metrics.profiling(args.profile, args.profile_trace):
+        run_pipeline(args.engine, args.in_memory)
@@ -0,0 +1,161 @@
+"""Resample card images to print resolution before they are embedded."""
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+RESOURCES_DIR = 'resources'
+PREPARED_DIR = os.path.join(RESOURCES_DIR, 'cache', 'prepared')
+
+# Config keys that affect prepared output; only these are sent to workers.
+SETTINGS_KEYS = ('DPI', 'image-format', 'jpeg-quality')
+
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'jpg': ('JPEG', 'jpg'),
+    'png': ('PNG', 'png'),
+}
+
+
+def pt_to_px(pt: float, dpi: float) -> int:
+    return max(1, int(round(pt * dpi / 72)))
+
+
+def source_key(src):
+    """Identify the contents of *src* by file rather than by path.
+
+    Hardlinked copies of an image, such as the same card linked from the
+    image cache into several decks, share one key and so one prepared file.
+    """
+    st = os.stat(src)
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _cache_path(src, size, fmt, quality, cache_dir):
+    key = '|'.join(str(part) for part in source_key(src) + (
+        size[0], size[1], fmt, quality,
+    ))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.{FORMATS[fmt][1]}")
+
+
+def _flatten(img):
+    """Return an RGB copy of *img* with any transparency composited on white."""
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        rgba = img.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.split()[-1])
+        return background
+    return img.convert('RGB')
+
+
+def open_rgb(src):
+    """Decode *src* into an RGB image with any transparency flattened."""
+    with Image.open(src) as img:
+        return _flatten(img)
+
+
+def prepare_image(src, size, fmt='png', quality=90, cache_dir=PREPARED_DIR):
+    """Return the path of *src* resampled to ``size`` pixels.
+
+    Images are only ever shrunk; each dimension already smaller than
+    *size* keeps its resolution.  Results are cached under *cache_dir* keyed
+    by :func:`source_key` and the output settings, so repeated renders reuse
+    them; see :func:`prune` for their expiry.
+    """
+    fmt = fmt.lower()
+    dest = _cache_path(src, size, fmt, quality, cache_dir)
+    if os.path.exists(dest):
+        os.utime(dest)
+        return dest
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with Image.open(src) as img:
+        tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        _save(_resample(img, size), tmp, fmt, quality)
+    os.replace(tmp, dest)
+    return dest
+
+
+def _resample(img, size):
+    out = _flatten(img)
+    target = (min(out.size[0], size[0]), min(out.size[1], size[1]))
+    if target != out.size:
+        out = out.resize(target, Image.LANCZOS)
+    return out
+
+
+def _save(img, fp, fmt, quality):
+    pil_format = FORMATS[fmt][0]
+    if pil_format == 'JPEG':
+        img.save(fp, pil_format, quality=quality, optimize=True)
+    else:
+        img.save(fp, pil_format, optimize=True)
+
+
+def prepare_bytes(data, size, fmt='png', quality=90):
+    """Like :func:`prepare_image` for encoded image *data*; returns bytes."""
+    fmt = fmt.lower()
+    buf = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as img:
+        _save(_resample(img, size), buf, fmt, quality)
+    return buf.getvalue()
+
+
+def prepare_for_config(src, width_pt, height_pt, config):
+    """Prepare *src* for a ``width_pt`` x ``height_pt`` slot using *config*."""
+    dpi = config.get('DPI', 300)
+    size = (pt_to_px(width_pt, dpi), pt_to_px(height_pt, dpi))
+    return prepare_image(
+        src,
+        size,
+        fmt=config.get('image-format', 'png'),
+        quality=config.get('jpeg-quality', 90),
+    )
+
+
+def prune(max_age_days=30, cache_dir=PREPARED_DIR):
+    """Delete prepared images not used in the last *max_age_days* days.
+
+    Entries are keyed by the source's mtime, so every re-downloaded or
+    edited image leaves the old one behind until it expires here.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for fname in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, fname)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _prepare_job(job):
+    src, width_pt, height_pt, settings = job
+    return prepare_for_config(src, width_pt, height_pt, settings)
+
+
+def prepare_many(jobs, config, workers=1):
+    """Prepare every ``(src, width_pt, height_pt)`` in *jobs*.
+
+    With ``workers > 1`` decoding, resampling and encoding run in a process
+    pool.  Returns a mapping of each job to its prepared path.
+    """
+    jobs = list(dict.fromkeys(jobs))
+    settings = {k: config[k] for k in SETTINGS_KEYS if k in config}
+    args = [(src, w, h, settings) for src, w, h in jobs]
+    if workers > 1 and len(jobs) > 1:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_prepare_job, args, chunksize=chunksize))
+    else:
+        results = [_prepare_job(a) for a in args]
+    return dict(zip(jobs, results))
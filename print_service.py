@@ -0,0 +1,320 @@
+"""Long-running HTTP service that turns decklists into PDFs.
+
+``python3 print_service.py`` reads ``config.yml`` once and keeps the HTTP
+session to Scryfall, the rate limiters, the bulk index, resolved cards and
+an in-memory store of prepared images warm between jobs.  Jobs run on a
+bounded pool of worker threads through the ``pipeline.py --in-memory`` path.
+
+API (JSON unless noted)::
+
+    POST /jobs                    {"decklist": "4 Island\\n...", "config": {...}}
+                                  -> 202 {"id": ..., "status": "queued", ...}
+    GET  /jobs/<id>               -> status, progress and output files
+    GET  /jobs/<id>/files/<name>  -> one of the PDFs (application/pdf)
+
+``config`` overrides the settings in ``OVERRIDE_KEYS`` (layout settings and
+``language-default``) for one job; any other key is rejected with 400.
+Download settings and ``DEFAULT_BACK`` are taken from ``config.yml`` when
+the service starts.
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import batch
+import fetch_images
+import generate_pdf
+import pipeline
+from image_store import DEFAULT_MAX_MB, ImageStore
+
+SERVICE_DIR = os.path.join(generate_pdf.RESULTS_DIR, 'service')
+DEFAULT_WORKERS = 2
+MAX_QUEUED = 100
+MAX_FINISHED = 200
+# Resolved cards kept per language, and prepared default backs kept.
+MAX_RESOLVED = 20000
+MAX_BACKS = 8
+MAX_BODY = 1024 * 1024
+# Settings a job may override.  Paths such as DEFAULT_BACK are left out so
+# clients cannot make the service read files of their choice.
+OVERRIDE_KEYS = frozenset((
+    'PAGE_SIZE', 'DPI', 'MARGIN_MM', 'GAP_MM', 'blank-back', 'language-default',
+    'pages-intercalation', 'horizontal-back-offset', 'vertical-back-offset',
+    'back-oversize', 'page-rotation-degrees', 'guided-lines', 'cross-calibrator',
+    'downsample-images', 'image-format', 'jpeg-quality',
+))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    """A decklist being printed and its progress."""
+
+    def __init__(self, cards, overrides):
+        self.id = uuid.uuid4().hex
+        self.cards = cards
+        self.overrides = overrides
+        self.status = 'queued'
+        self.error = None
+        self.paths = []
+        self.total = sum(card[0] for card in cards)
+        self.done = 0
+        self.pages = 0
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def count_cards(self, records):
+        for record in records:
+            self.done += 1
+            yield record
+
+    def count_pages(self, pages):
+        for page in pages:
+            self.pages += 1
+            yield page
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'progress': {'cards': self.done, 'total': self.total, 'pages': self.pages},
+            'files': [os.path.basename(p) for p in self.paths],
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class PrintService:
+    """Queue of print jobs sharing one set of caches."""
+
+    def __init__(self, cfg, out_dir=SERVICE_DIR, workers=DEFAULT_WORKERS,
+                 max_queued=MAX_QUEUED):
+        self.cfg = cfg
+        self.out_dir = out_dir
+        self.max_queued = max_queued
+        self.store = ImageStore(cfg.get('memory-cache-mb', DEFAULT_MAX_MB) * 1024 * 1024)
+        self.jobs = OrderedDict()
+        self._engines = {}
+        self._backs = OrderedDict()
+        self._lock = threading.Lock()
+        self._back_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+        fetch_images.configure_rate_limits(cfg)
+        fetch_images.configure_image_variant(cfg)
+        fetch_images.open_bulk_index(cfg)
+        self._default_back(generate_pdf.layout_config(dict(cfg)))
+
+    def submit(self, decklist, overrides=None):
+        """Queue *decklist* (the text of a card list) and return its job."""
+        unknown = set(overrides or {}) - OVERRIDE_KEYS
+        if unknown:
+            raise ValueError(f"opciones no permitidas: {', '.join(sorted(unknown))}")
+        cards = fetch_images.merge_card_list(
+            fetch_images.parse_card_lines(decklist.splitlines())
+        )
+        if not cards:
+            raise ValueError('la lista no contiene cartas')
+        job = Job(cards, dict(overrides or {}))
+        with self._lock:
+            queued = sum(1 for j in self.jobs.values() if j.status == 'queued')
+            if queued >= self.max_queued:
+                raise QueueFull(f'hay {queued} trabajos en cola')
+            self.jobs[job.id] = job
+            self._forget_finished()
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _forget_finished(self):
+        finished = [j for j in self.jobs.values() if j.status in ('done', 'failed')]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED)]:
+            del self.jobs[job.id]
+            shutil.rmtree(os.path.join(self.out_dir, job.id), ignore_errors=True)
+
+    def _engine(self, lang):
+        with self._lock:
+            engine = self._engines.get(lang)
+            if engine is None:
+                # Cards resolved for one job are reused by every later job.
+                engine = self._engines[lang] = batch.SharedResolution(
+                    fetch_images._make_engine(
+                        self.cfg.get('fetch-engine', 'threads'), self.cfg, lang
+                    ),
+                    lang,
+                    MAX_RESOLVED,
+                )
+            return engine
+
+    def _default_back(self, config):
+        """Prepare the default back once per set of back settings.
+
+        The back for ``config.yml`` is prepared when the service starts; jobs
+        overriding the back settings prepare theirs on first use.  Only the
+        prepared image is shared: every job's documents read it with their
+        own ``ImageReader``.
+        """
+        key = tuple(config.get(k) for k in generate_pdf.DEFAULT_BACK_KEYS)
+        with self._back_lock:
+            if key not in self._backs:
+                generate_pdf.prepare_default_back(config)
+                self._backs[key] = config.get('_default_back')
+                while len(self._backs) > MAX_BACKS:
+                    self._backs.popitem(last=False)
+            self._backs.move_to_end(key)
+            back = self._backs[key]
+        if back:
+            config['_default_back'] = back
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            job.paths = self.render(job)
+        except Exception as exc:
+            job.error = str(exc) or type(exc).__name__
+            job.status = 'failed'
+        else:
+            job.status = 'done'
+        job.finished = time.time()
+
+    def render(self, job):
+        config = generate_pdf.layout_config({**self.cfg, **job.overrides})
+        config['GRID'] = generate_pdf.compute_grid(config)
+        self._default_back(config)
+        cols, rows = config['GRID']
+        lang = config.get('language-default', 'es')
+
+        records = pipeline.iter_memory_cards(
+            self._engine(lang), job.cards, lang, config, self.store,
+            self.cfg.get('fetch-workers'),
+        )
+        pages = generate_pdf.iter_pages(job.count_cards(records), cols, rows)
+        job_dir = os.path.join(self.out_dir, job.id)
+        os.makedirs(job_dir, exist_ok=True)
+        paths, _ = generate_pdf.draw_outputs(
+            os.path.join(job_dir, 'deck'), job.count_pages(pages), config
+        )
+        return paths
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, content_type='application/json', headers=()):
+            if isinstance(body, dict):
+                body = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, status, message):
+            self._send(status, {'error': message})
+
+        def do_POST(self):
+            if urlparse(self.path).path.rstrip('/') != '/jobs':
+                return self._error(404, 'ruta desconocida')
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY:
+                return self._error(413, 'la petición es demasiado grande')
+            try:
+                request = json.loads(self.rfile.read(length) or b'{}')
+                decklist = request['decklist']
+                overrides = request.get('config') or {}
+                if not isinstance(decklist, str) or not isinstance(overrides, dict):
+                    raise TypeError
+            except (ValueError, KeyError, TypeError):
+                return self._error(
+                    400, "se esperaba JSON con 'decklist' (texto) y 'config' opcional"
+                )
+            try:
+                job = service.submit(decklist, overrides)
+            except ValueError as exc:
+                return self._error(400, str(exc))
+            except QueueFull as exc:
+                return self._error(503, str(exc))
+            self._send(202, job.to_dict(), headers=[('Location', f'/jobs/{job.id}')])
+
+        def do_GET(self):
+            parts = urlparse(self.path).path.strip('/').split('/')
+            if len(parts) < 2 or parts[0] != 'jobs':
+                return self._error(404, 'ruta desconocida')
+            job = service.get(parts[1])
+            if job is None:
+                return self._error(404, 'trabajo desconocido')
+            if len(parts) == 2:
+                return self._send(200, job.to_dict())
+            if len(parts) == 4 and parts[2] == 'files':
+                for path in job.paths:
+                    if os.path.basename(path) == parts[3]:
+                        with open(path, 'rb') as f:
+                            return self._send(200, f.read(), 'application/pdf')
+            return self._error(404, 'archivo desconocido')
+
+    return Handler
+
+
+def make_server(service, host='127.0.0.1', port=0):
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Serve deck PDFs over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument(
+        '--workers', type=int, default=DEFAULT_WORKERS,
+        help='jobs rendered at the same time',
+    )
+    parser.add_argument(
+        '--api-url', help='Scryfall API to use, e.g. a bench/mock_scryfall.py server',
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.api_url:
+        fetch_images.API_URL = args.api_url.rstrip('/')
+    service = PrintService(fetch_images.load_config(), workers=args.workers)
+    server = make_server(service, args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Servicio de impresión escuchando en http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Thread-safe token bucket used to keep requests under Scryfall's limits."""
+import threading
+import time
+
+
+class TokenBucket:
+    """Allow ``rate`` operations per second with bursts of up to ``burst``.
+
+    Callers reserve a token and sleep for the returned delay, so waiting
+    threads are served in the order they asked.  A ``rate`` of 0 or less
+    disables limiting.  ``waited`` and ``acquired`` keep running totals for
+    the end-of-run summary.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate or 0)
+        self.capacity = float(burst if burst is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+        self.acquired = 0
+
+    def reserve(self):
+        """Take a token and return the seconds to wait before using it."""
+        with self._lock:
+            self.acquired += 1
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            elapsed = now - self._last
+            self._last = now
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += delay
+            return delay
+
+    def acquire(self):
+        """Block until a token is available and return the time waited."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
@@ -0,0 +1,143 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+from test_fetch_images import FakeEngine, fi  # noqa: F401
+from test_generate_pdf import stub_dependencies
+
+
+@pytest.fixture
+def batch(monkeypatch, fi):
+    stub_dependencies(monkeypatch)
+    for name in ('generate_pdf', 'batch'):
+        if name in sys.modules:
+            del sys.modules[name]
+    mod = importlib.import_module('batch')
+    monkeypatch.setattr(mod, 'fetch_images', fi)
+    # JSON is valid YAML, which is enough for these tests.
+    monkeypatch.setattr(mod.yaml, 'safe_load', json.load, raising=False)
+    return mod
+
+
+def test_load_jobs_from_directory(batch, tmp_path):
+    (tmp_path / 'elves.txt').write_text('4 Llanowar Elves\n')
+    (tmp_path / 'burn.txt').write_text('4 Lightning Bolt\n')
+    (tmp_path / 'burn.yml').write_text('{"language-default": "es"}')
+    (tmp_path / 'notes.md').write_text('')
+
+    jobs = batch.load_jobs(str(tmp_path))
+
+    assert [j['name'] for j in jobs] == ['burn', 'elves']
+    assert jobs[0]['config'] == {'language-default': 'es'}
+    assert jobs[1]['config'] == {}
+
+
+def test_load_jobs_from_manifest(batch, tmp_path):
+    manifest = tmp_path / 'decks.yml'
+    manifest.write_text(json.dumps({'decks': [
+        {'list': 'lists/elves.txt'},
+        {'name': 'burn-es', 'list': 'lists/burn.txt', 'config': {'blank-back': True}},
+    ]}))
+
+    jobs = batch.load_jobs(str(manifest))
+
+    assert jobs == [
+        {'name': 'elves', 'list': str(tmp_path / 'lists' / 'elves.txt'), 'config': {}},
+        {'name': 'burn-es', 'list': str(tmp_path / 'lists' / 'burn.txt'),
+         'config': {'blank-back': True}},
+    ]
+
+
+def test_load_jobs_makes_names_unique(batch, tmp_path):
+    manifest = tmp_path / 'decks.yml'
+    manifest.write_text(json.dumps({'decks': [
+        {'list': 'modern/burn.txt'},
+        {'list': 'legacy/burn.txt'},
+        {'name': 'Burn', 'list': 'pauper/burn.txt'},
+    ]}))
+
+    jobs = batch.load_jobs(str(manifest))
+
+    assert [j['name'] for j in jobs] == ['burn', 'burn-2', 'Burn-3']
+
+
+def test_load_jobs_keeps_names_inside_their_folders(batch, tmp_path):
+    manifest = tmp_path / 'decks.yml'
+    manifest.write_text(json.dumps({'decks': [
+        {'name': '../x', 'list': 'a.txt'},
+        {'name': '..', 'list': 'b.txt'},
+        {'name': 'sub\\..\\y', 'list': 'c.txt'},
+    ]}))
+
+    jobs = batch.load_jobs(str(manifest))
+
+    assert [j['name'] for j in jobs] == ['x', 'deck', 'sub..y']
+
+
+def test_prepare_all_prepares_hardlinked_images_once(monkeypatch, batch, tmp_path):
+    monkeypatch.setattr(batch, 'DECKS_DIR', str(tmp_path / 'decks'))
+    jobs = [{'name': n, 'list': '', 'config': {}} for n in ('a', 'b')]
+    for job in jobs:
+        (tmp_path / 'decks' / job['name']).mkdir(parents=True)
+    island = tmp_path / 'decks' / 'a' / '4 Island.png'
+    island.write_text('')
+    os.link(island, tmp_path / 'decks' / 'b' / '2 Island.png')
+    (tmp_path / 'decks' / 'b' / '1 Swamp.png').write_text('')
+    config = {'downsample-images': True, 'DPI': 300}
+    monkeypatch.setattr(batch.generate_pdf, 'load_config', lambda overrides: dict(config))
+    monkeypatch.setattr(batch.generate_pdf, 'compute_grid', lambda config: (3, 3))
+    monkeypatch.setattr(batch.generate_pdf, 'image_jobs', lambda pages, config: [
+        (card['front'], 1, 2) for page in pages for card in page
+    ])
+    prepared = []
+    monkeypatch.setattr(
+        batch.prepare_images, 'prepare_many',
+        lambda jobs, config, workers: prepared.extend(jobs),
+    )
+
+    assert batch.prepare_all(jobs) == 2
+    assert sorted(os.path.basename(src) for src, _, _ in prepared) == [
+        '1 Swamp.png', '4 Island.png'
+    ]
+
+
+def test_fetch_all_resolves_union_once(monkeypatch, batch, fi, tmp_path):
+    lists = tmp_path / 'lists'
+    lists.mkdir()
+    (lists / 'a.txt').write_text('4 Island\n2 Swamp\n')
+    (lists / 'b.txt').write_text('3 Island\n1 Forest\n')
+    monkeypatch.setattr(batch, 'DECKS_DIR', str(tmp_path / 'decks'))
+
+    data = {'Island': {'id': 'i'}, 'Swamp': {'id': 's'}, 'Forest': {'id': 'f'}}
+    engine = FakeEngine(fi, data)
+    monkeypatch.setattr(fi, '_make_engine', lambda *a: engine)
+
+    cfg = {'language-default': 'en', 'image-cache-dir': None}
+    timings = batch.fetch_all(batch.load_jobs(str(lists)), cfg)
+
+    assert sorted(timings) == ['a', 'b']
+    assert sorted(name for _, name, _, _ in engine.resolved) == ['Forest', 'Island', 'Swamp']
+    assert sorted(p.name for p in (tmp_path / 'decks' / 'a').iterdir()) == [
+        '.manifest.json', '2 Swamp.png', '4 Island.png'
+    ]
+    assert sorted(p.name for p in (tmp_path / 'decks' / 'b').iterdir()) == [
+        '.manifest.json', '1 Forest.png', '3 Island.png'
+    ]
+
+
+def test_shared_resolution_keeps_max_entries(batch, fi):
+    engine = FakeEngine(fi, {'A': {'id': 'a'}, 'B': {'id': 'b'}, 'C': {'id': 'c'}})
+    shared = batch.SharedResolution(engine, 'en', max_entries=2)
+    card = {name: (1, name, None, None) for name in 'ABC'}
+
+    assert shared.resolve([card['A'], card['B']]) == [{'id': 'a'}, {'id': 'b'}]
+    shared.resolve([card['A']])
+    assert shared.resolve([card['C'], card['A']]) == [{'id': 'c'}, {'id': 'a'}]
+
+    assert len(shared.resolved) == 2
+    assert [name for _, name, _, _ in engine.resolved] == ['A', 'B', 'C']
+    shared.resolve([card['B']])
+    assert [name for _, name, _, _ in engine.resolved] == ['A', 'B', 'C', 'B']
@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+
+import bulk_index
+
+
+CARDS = [
+    {
+        'id': 'a1', 'name': 'Island', 'lang': 'en', 'set': 'M20',
+        'collector_number': '264', 'released_at': '2019-07-12',
+        'image_uris': {'png': 'http://img/island-m20.png'}, 'prices': {'usd': '0.1'},
+    },
+    {
+        'id': 'a2', 'name': 'Island', 'lang': 'en', 'set': 'dmu',
+        'collector_number': '265', 'released_at': '2022-09-09',
+        'image_uris': {'png': 'http://img/island-dmu.png'},
+    },
+    {
+        'id': 'a3', 'name': 'Island', 'printed_name': 'Isla', 'lang': 'es',
+        'set': 'dmu', 'collector_number': '265', 'released_at': '2022-09-09',
+        'image_uris': {'png': 'http://img/isla-dmu.png'},
+    },
+    {
+        'id': 'b1', 'name': 'Delver of Secrets // Insectile Aberration',
+        'lang': 'en', 'set': 'isd', 'collector_number': '51',
+        'released_at': '2011-09-30',
+        'card_faces': [
+            {'name': 'Delver of Secrets', 'image_uris': {'png': 'http://img/f.png'}},
+            {'name': 'Insectile Aberration', 'image_uris': {'png': 'http://img/b.png'}},
+        ],
+    },
+]
+
+
+def test_iter_json_array_small_chunks():
+    text = json.dumps(CARDS, indent=2)
+    items = list(bulk_index.iter_json_array(io.StringIO(text), chunk_size=7))
+    assert items == CARDS
+
+
+def test_iter_json_array_truncated():
+    text = json.dumps(CARDS)[:-20]
+    with pytest.raises(ValueError):
+        list(bulk_index.iter_json_array(io.StringIO(text), chunk_size=64))
+
+
+@pytest.fixture
+def index(tmp_path):
+    src = tmp_path / 'default-cards.json'
+    src.write_text(json.dumps(CARDS))
+    path = tmp_path / 'index.sqlite'
+    assert bulk_index.build_index(str(src), str(path), batch_size=2) == 4
+    return bulk_index.BulkIndex(str(path))
+
+
+def test_lookup_by_printing(index):
+    card = index.lookup('Island', 'es', 'DMU', '265')
+    assert card['printed_name'] == 'Isla'
+    assert 'prices' not in card
+
+
+def test_lookup_by_printing_falls_back_to_english(index):
+    card = index.lookup('Island', 'es', 'm20', '264')
+    assert card['id'] == 'a1'
+
+
+def test_lookup_by_name_prefers_newest(index):
+    assert index.lookup('island', 'en')['id'] == 'a2'
+    assert index.lookup('Island', 'en', 'm20')['id'] == 'a1'
+
+
+def test_lookup_by_face_name(index):
+    card = index.lookup('Delver of Secrets', 'en')
+    assert len(card['card_faces']) == 2
+
+
+def test_lookup_missing(index):
+    assert index.lookup('Black Lotus', 'en') is None
@@ -0,0 +1,77 @@
+import os
+
+import deck_manifest
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_verify_file(tmp_path):
+    path = write(tmp_path / '1 Island.png', b'abc')
+    record = deck_manifest.file_record(path)
+    assert deck_manifest.verify_file(path, record) == record
+
+    os.utime(path, ns=(1, 1))
+    refreshed = deck_manifest.verify_file(path, record)
+    assert refreshed['mtime_ns'] == 1
+
+    write(tmp_path / '1 Island.png', b'xyz')
+    assert deck_manifest.verify_file(path, refreshed) is None
+    assert deck_manifest.verify_file(str(tmp_path / 'missing.png'), record) is None
+
+
+def test_plan_keeps_unchanged_entries(tmp_path):
+    island = write(tmp_path / '2 Island.png', b'i')
+    swamp = write(tmp_path / '1 Swamp.png', b's')
+    units = [
+        deck_manifest.make_unit([(2, 'Island', None, None)], 'en', 'i', [island]),
+        deck_manifest.make_unit([(1, 'Swamp', None, None)], 'en', 's', [swamp]),
+    ]
+    cards = [(2, 'Island', None, None), (3, 'Swamp', None, None), (1, 'Forest', None, None)]
+
+    kept, pending = deck_manifest.plan(units, cards, 'en', str(tmp_path))
+
+    assert [u['id'] for u in kept] == ['i']
+    assert pending == [(3, 'Swamp', None, None), (1, 'Forest', None, None)]
+
+
+def test_plan_refetches_damaged_files(tmp_path):
+    island = write(tmp_path / '2 Island.png', b'i')
+    units = [deck_manifest.make_unit([(2, 'Island', None, None)], 'en', 'i', [island])]
+    os.remove(island)
+
+    kept, pending = deck_manifest.plan(units, [(2, 'Island', None, None)], 'en', str(tmp_path))
+
+    assert kept == []
+    assert pending == [(2, 'Island', None, None)]
+
+
+
+def test_plan_refetches_other_image_size(tmp_path):
+    island = write(tmp_path / '2 Island.png', b'i')
+    units = [deck_manifest.make_unit([(2, 'Island', None, None)], 'en', 'i', [island])]
+    cards = [(2, 'Island', None, None)]
+
+    assert deck_manifest.plan(units, cards, 'en', str(tmp_path), 'png')[0] == units
+    kept, pending = deck_manifest.plan(units, cards, 'en', str(tmp_path), 'normal')
+    assert kept == []
+    assert pending == cards
+
+def test_remove_stale_and_roundtrip(tmp_path):
+    old = write(tmp_path / '1 Swamp.png', b's')
+    (tmp_path / '.1 Swamp.png.http').write_text('{}')
+    kept = write(tmp_path / '2 Island.png', b'i')
+    old_units = [
+        deck_manifest.make_unit([(1, 'Swamp', None, None)], 'en', 's', [old]),
+        deck_manifest.make_unit([(2, 'Island', None, None)], 'en', 'i', [kept]),
+    ]
+    new_units = old_units[1:]
+
+    removed = deck_manifest.remove_stale(str(tmp_path), old_units, new_units)
+    deck_manifest.save(str(tmp_path), new_units)
+
+    assert removed == ['1 Swamp.png']
+    assert sorted(os.listdir(tmp_path)) == ['.manifest.json', '2 Island.png']
+    assert deck_manifest.load(str(tmp_path)) == new_units
@@ -0,0 +1,174 @@
+import asyncio
+import importlib
+import sys
+import types
+
+import pytest
+
+from test_fetch_images import fi  # noqa: F401
+
+
+class FakeContent:
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+
+class FakeResp:
+    def __init__(self, status, data=None, body=b''):
+        self.status = status
+        self.data = data
+        self.headers = {'Content-Length': str(len(body))} if body else {}
+        self.content = FakeContent(body)
+
+    async def json(self):
+        return self.data
+
+    def release(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+
+    async def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        for prefix, resp in self.routes:
+            if url.startswith(prefix):
+                return resp() if callable(resp) else resp
+        return FakeResp(404)
+
+
+@pytest.fixture
+def fa(monkeypatch, fi):
+    aiohttp = types.ModuleType('aiohttp')
+    aiohttp.ClientError = type('ClientError', (Exception,), {})
+    monkeypatch.setitem(sys.modules, 'aiohttp', aiohttp)
+    if 'fetch_async' in sys.modules:
+        del sys.modules['fetch_async']
+    mod = importlib.import_module('fetch_async')
+    monkeypatch.setattr(mod, 'fi', fi)
+    return mod
+
+
+def test_fetch_card_downloads_both_faces(fa, fi, tmp_path, monkeypatch):
+    monkeypatch.setattr(fi, 'DECK_DIR', str(tmp_path))
+    data = {
+        'lang': 'en',
+        'name': 'Delver of Secrets // Insectile Aberration',
+        'card_faces': [
+            {'name': 'Delver of Secrets', 'image_uris': {'png': 'http://img/front.png'}},
+            {'name': 'Insectile Aberration', 'image_uris': {'png': 'http://img/back.png'}},
+        ],
+    }
+    session = FakeSession([
+        ('http://img/front.png', lambda: FakeResp(200, body=b'front')),
+        ('http://img/back.png', lambda: FakeResp(200, body=b'back')),
+    ])
+    fetcher = fa.AsyncFetcher(session, 'en')
+
+    asyncio.run(fetcher.fetch_card(1, 'Delver of Secrets', card_data=data))
+
+    ident = fi._pair_id('delver of secrets')
+    files = sorted(p.name for p in tmp_path.iterdir() if not p.name.startswith('.'))
+    assert files == [f'1 F{ident} Delver of Secrets.png', f'B{ident} Insectile Aberration.png']
+    assert (tmp_path / f'1 F{ident} Delver of Secrets.png').read_bytes() == b'front'
+
+
+def test_resolve_uses_collection(fa, fi):
+    body = {'data': [{'name': 'Island', 'lang': 'en'}], 'not_found': [{'name': 'Nope'}]}
+    session = FakeSession([
+        (f'{fi.API_URL}/cards/collection', FakeResp(200, body)),
+    ])
+    fetcher = fa.AsyncFetcher(session, 'en')
+
+    resolved = asyncio.run(fetcher.resolve([(1, 'Island', None, None), (1, 'Nope', None, None)]))
+
+    assert resolved == [{'name': 'Island', 'lang': 'en'}, None]
+    assert session.calls == [('POST', f'{fi.API_URL}/cards/collection')]
+
+
+def test_request_retries_rate_limited(fa, fi, monkeypatch):
+    responses = [FakeResp(429), FakeResp(200, {'ok': True})]
+    session = FakeSession([('http://api', lambda: responses.pop(0))])
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(fa.asyncio, 'sleep', fake_sleep)
+    fetcher = fa.AsyncFetcher(session, 'en')
+
+    assert asyncio.run(fetcher._json('GET', 'http://api/x')) == {'ok': True}
+    assert len(session.calls) == 2
+
+
+class ScriptedSession:
+    """Returns the queued responses in order and records request headers."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.headers = []
+
+    async def request(self, method, url, headers=None, **kwargs):
+        self.headers.append(dict(headers or {}))
+        resp = self.responses.pop(0)
+        if isinstance(resp, Exception):
+            raise resp
+        return resp
+
+
+def image_resp(status, body, headers):
+    resp = FakeResp(status, body=body)
+    resp.headers = dict(headers, **{'Content-Length': str(len(body))})
+    return resp
+
+
+class BrokenContent:
+    def __init__(self, body, exc):
+        self.body = body
+        self.exc = exc
+
+    async def iter_chunked(self, size):
+        yield self.body
+        raise self.exc
+
+
+def test_download_is_conditional(fa, tmp_path):
+    session = ScriptedSession([
+        image_resp(200, b'image', {'ETag': '"v1"'}),
+        FakeResp(304),
+    ])
+    fetcher = fa.AsyncFetcher(session, 'en')
+    dest = str(tmp_path / '1 Island.png')
+
+    assert asyncio.run(fetcher.download('http://img/a.png', dest)) is True
+    assert asyncio.run(fetcher.download('http://img/a.png', dest)) is False
+    assert session.headers[1]['If-None-Match'] == '"v1"'
+    assert (tmp_path / '1 Island.png').read_bytes() == b'image'
+
+
+def test_download_retries_and_resumes_after_connection_error(fa, tmp_path, monkeypatch):
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(fa.asyncio, 'sleep', no_sleep)
+    broken = image_resp(200, b'', {'ETag': '"v1"'})
+    broken.headers['Content-Length'] = '11'
+    broken.content = BrokenContent(b'image', fa.aiohttp.ClientError('reset'))
+    session = ScriptedSession([
+        fa.aiohttp.ClientError('refused'),
+        broken,
+        image_resp(206, b'-bytes', {'ETag': '"v1"'}),
+    ])
+    fetcher = fa.AsyncFetcher(session, 'en')
+    dest = str(tmp_path / '1 Island.png')
+
+    assert asyncio.run(fetcher.download('http://img/a.png', dest)) is True
+    assert session.headers[2]['Range'] == 'bytes=5-'
+    assert (tmp_path / '1 Island.png').read_bytes() == b'image-bytes'
@@ -1,3 +1,4 @@
+import os
 import types
 import importlib
 import sys
@@ -7,9 +8,21 @@ import pytest
 
 @pytest.fixture
 def fi(monkeypatch):
-    # Provide minimal requests module before import
-    req_mod = types.SimpleNamespace(get=lambda *a, **k: None)
+    # Provide minimal requests/urllib3 modules before import
+    req_mod = types.ModuleType('requests')
+    req_mod.get = lambda *a, **k: None
+    req_mod.Session = lambda: types.SimpleNamespace(headers={}, mount=lambda *a: None)
+    req_mod.adapters = types.ModuleType('requests.adapters')
+    req_mod.adapters.HTTPAdapter = lambda **k: k
     monkeypatch.setitem(sys.modules, 'requests', req_mod)
+    monkeypatch.setitem(sys.modules, 'requests.adapters', req_mod.adapters)
+    urllib3 = types.ModuleType('urllib3')
+    urllib3.util = types.ModuleType('urllib3.util')
+    urllib3.util.retry = types.ModuleType('urllib3.util.retry')
+    urllib3.util.retry.Retry = lambda **k: k
+    monkeypatch.setitem(sys.modules, 'urllib3', urllib3)
+    monkeypatch.setitem(sys.modules, 'urllib3.util', urllib3.util)
+    monkeypatch.setitem(sys.modules, 'urllib3.util.retry', urllib3.util.retry)
     yaml_mod = types.ModuleType('yaml')
     yaml_mod.safe_load = lambda s: {}
     monkeypatch.setitem(sys.modules, 'yaml', yaml_mod)
@@ -18,6 +31,11 @@ def fi(monkeypatch):
     return importlib.import_module('fetch_images')
 
 
+def use_get(monkeypatch, fi, fake_get):
+    session = types.SimpleNamespace(get=fake_get)
+    monkeypatch.setattr(fi, '_get_session', lambda *a: session)
+
+
 class DummyResp:
     def __init__(self, data):
         self.data = data
@@ -44,7 +62,7 @@ def test_fetch_single_card_lang(monkeypatch, fi, tmp_path):
         'printed_name': 'Isla',
     }
 
-    def fake_get(url, params=None):
+    def fake_get(url, params=None, **kwargs):
         assert params['lang'] in ('es', 'en')
         return DummyResp(data)
 
@@ -56,7 +74,7 @@ def test_fetch_single_card_lang(monkeypatch, fi, tmp_path):
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_text('')
 
-    monkeypatch.setattr(fi.requests, 'get', fake_get)
+    use_get(monkeypatch, fi, fake_get)
     monkeypatch.setattr(fi, 'download_image', fake_download)
 
     fi._fetch_single_card(1, 'Island', 'es')
@@ -127,12 +145,12 @@ def test_fetch_single_card_with_set_and_collector(monkeypatch, fi, tmp_path):
 
     called = {}
 
-    def fake_get(url, params=None):
+    def fake_get(url, params=None, **kwargs):
         called['url'] = url
         called['params'] = params
         return DummyResp(data)
 
-    monkeypatch.setattr(fi.requests, 'get', fake_get)
+    use_get(monkeypatch, fi, fake_get)
     monkeypatch.setattr(fi, 'download_image', lambda u, d: None)
 
     fi._fetch_single_card(1, 'Island', 'en', set_code='m20', collector='123')
@@ -154,7 +172,7 @@ def test_fetch_single_card_fuzzy(monkeypatch, fi, tmp_path):
 
     calls = []
 
-    def fake_get(url, params=None):
+    def fake_get(url, params=None, **kwargs):
         calls.append(params)
         if params and 'exact' in params:
             return types.SimpleNamespace(status_code=404)
@@ -168,7 +186,7 @@ def test_fetch_single_card_fuzzy(monkeypatch, fi, tmp_path):
         path.parent.mkdir(parents=True, exist_ok=True)
         path.write_text('')
 
-    monkeypatch.setattr(fi.requests, 'get', fake_get)
+    use_get(monkeypatch, fi, fake_get)
     monkeypatch.setattr(fi, 'download_image', fake_download)
     monkeypatch.setattr(fi, 'DECK_DIR', str(tmp_path))
 
@@ -176,3 +194,398 @@ def test_fetch_single_card_fuzzy(monkeypatch, fi, tmp_path):
 
     assert any('fuzzy' in c for c in calls if c)
     assert downloaded
+
+
+def test_session_shared_and_sized(fi):
+    created = []
+
+    def fake_session():
+        s = types.SimpleNamespace(headers={}, adapters={})
+        s.mount = lambda prefix, adapter: s.adapters.__setitem__(prefix, adapter)
+        created.append(s)
+        return s
+
+    fi.requests.Session = fake_session
+
+    first = fi._get_session(16)
+    second = fi._get_session(4)
+
+    assert first is second
+    assert len(created) == 1
+    adapter = first.adapters['https://']
+    assert adapter['pool_maxsize'] == 16
+    assert 429 in adapter['max_retries']['status_forcelist']
+
+
+def test_resolve_cards_batches(monkeypatch, fi):
+    posts = []
+
+    def fake_post(url, json=None, **kwargs):
+        posts.append((url, json['identifiers']))
+        data = [
+            {'name': i['name'], 'lang': 'en'}
+            for i in json['identifiers'] if i['name'] != 'Missing'
+        ]
+        not_found = [i for i in json['identifiers'] if i['name'] == 'Missing']
+        return DummyResp({'data': data, 'not_found': not_found})
+
+    session = types.SimpleNamespace(post=fake_post)
+    monkeypatch.setattr(fi, '_get_session', lambda *a: session)
+
+    cards = [(1, f'Card {i}', None, None) for i in range(99)]
+    cards.append((1, 'Missing', None, None))
+    cards.append((2, 'Card 0', None, None))
+
+    resolved = fi.resolve_cards(cards, 'en')
+
+    assert len(posts) == 2
+    assert all(url.endswith('/cards/collection') for url, _ in posts)
+    assert len(posts[0][1]) == 75
+    assert resolved[0]['name'] == 'Card 0'
+    assert resolved[99] is None
+    assert resolved[100] is resolved[0]
+
+
+def test_collection_identifier(fi):
+    assert fi._collection_identifier('Island', 'M20', '123') == {
+        'set': 'm20', 'collector_number': '123'
+    }
+    assert fi._collection_identifier('Beast', 'tfdn') == {'name': 'Beast', 'set': 'tfdn'}
+    assert fi._collection_identifier('Swamp') == {'name': 'Swamp'}
+
+
+def test_limiter_for_hosts(fi):
+    fi.configure_rate_limits({'scryfall-rate-limit': 5, 'image-rate-limit': 0})
+    api = fi._limiter_for('https://api.scryfall.com/cards/named')
+    img = fi._limiter_for('https://cards.scryfall.io/png/front/a.png')
+    assert api.rate == 5
+    assert img.rate == 0
+    assert api is not img
+
+
+def test_fetch_single_card_uses_image_cache(monkeypatch, fi, tmp_path):
+    data = {
+        'id': 'abc',
+        'lang': 'en',
+        'image_uris': {'png': 'http://img/island.png?123'},
+        'name': 'Island',
+    }
+    downloads = []
+
+    def fake_download(url, dest):
+        downloads.append(url)
+        with open(dest, 'w') as f:
+            f.write('png')
+
+    monkeypatch.setattr(fi, 'download_image', fake_download)
+    monkeypatch.setattr(fi, 'DECK_DIR', str(tmp_path / 'deck'))
+    (tmp_path / 'deck').mkdir()
+    fi.open_image_cache({'image-cache-dir': str(tmp_path / 'cache')})
+
+    fi._fetch_single_card(1, 'Island', 'en', card_data=data)
+    fi._fetch_single_card(2, 'Island', 'en', card_data=data)
+
+    assert len(downloads) == 1
+    assert (tmp_path / 'deck' / '2 Island.png').read_text() == 'png'
+    assert fi._image_cache.hits == 1
+
+
+class StreamResp:
+    def __init__(self, status, body=b'', headers=None):
+        self.status_code = status
+        self.body = body
+        self.headers = headers if headers is not None else {'Content-Length': str(len(body))}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise IOError(self.status_code)
+
+    def iter_content(self, size):
+        for i in range(0, len(self.body), 3):
+            yield self.body[i:i + 3]
+
+    def close(self):
+        pass
+
+
+def test_download_image_conditional(monkeypatch, fi, tmp_path):
+    requests_seen = []
+    responses = [
+        StreamResp(200, b'image-bytes', {'Content-Length': '11', 'ETag': '"v1"'}),
+        StreamResp(304, headers={}),
+    ]
+
+    def fake_get(url, params=None, headers=None, **kwargs):
+        requests_seen.append(headers)
+        return responses.pop(0)
+
+    use_get(monkeypatch, fi, fake_get)
+    dest = tmp_path / '1 Island.png'
+
+    assert fi.download_image('http://img/a.png', str(dest)) is True
+    assert dest.read_bytes() == b'image-bytes'
+    assert not (tmp_path / '1 Island.png.part').exists()
+
+    assert fi.download_image('http://img/a.png', str(dest)) is False
+    assert requests_seen[1]['If-None-Match'] == '"v1"'
+    assert dest.read_bytes() == b'image-bytes'
+
+
+def test_download_image_truncated_then_resumed(monkeypatch, fi, tmp_path):
+    requests_seen = []
+    responses = [
+        StreamResp(200, b'image', {'Content-Length': '11', 'ETag': '"v1"'}),
+        StreamResp(206, b'-bytes', {'Content-Length': '6', 'ETag': '"v1"'}),
+    ]
+
+    def fake_get(url, params=None, headers=None, **kwargs):
+        requests_seen.append(headers)
+        return responses.pop(0)
+
+    use_get(monkeypatch, fi, fake_get)
+    dest = tmp_path / '1 Island.png'
+
+    with pytest.raises(IOError):
+        fi.download_image('http://img/a.png', str(dest))
+    assert not dest.exists()
+
+    assert fi.download_image('http://img/a.png', str(dest)) is True
+    assert requests_seen[1]['Range'] == 'bytes=5-'
+    assert dest.read_bytes() == b'image-bytes'
+
+
+def test_download_image_finishes_complete_part_on_416(monkeypatch, fi, tmp_path):
+    requests_seen = []
+    responses = [
+        StreamResp(416, headers={'Content-Range': 'bytes */11'}),
+    ]
+
+    def fake_get(url, params=None, headers=None, **kwargs):
+        requests_seen.append(dict(headers))
+        return responses.pop(0)
+
+    use_get(monkeypatch, fi, fake_get)
+    dest = tmp_path / '1 Island.png'
+    (tmp_path / '1 Island.png.part').write_bytes(b'image-bytes')
+    fi._write_meta(str(dest), {'partial': {'url': 'http://img/a.png', 'etag': '"v1"'}})
+
+    assert fi.download_image('http://img/a.png', str(dest)) is True
+    assert requests_seen[0]['Range'] == 'bytes=11-'
+    assert dest.read_bytes() == b'image-bytes'
+    assert not (tmp_path / '1 Island.png.part').exists()
+    assert fi._read_meta(str(dest)) == {
+        'etag': '"v1"', 'last_modified': None, 'url': 'http://img/a.png',
+    }
+
+
+def test_download_image_restarts_stale_part_on_416(monkeypatch, fi, tmp_path):
+    requests_seen = []
+    responses = [
+        StreamResp(416, headers={'Content-Range': 'bytes */5'}),
+        StreamResp(200, b'image', {'Content-Length': '5', 'ETag': '"v2"'}),
+    ]
+
+    def fake_get(url, params=None, headers=None, **kwargs):
+        requests_seen.append(dict(headers))
+        return responses.pop(0)
+
+    use_get(monkeypatch, fi, fake_get)
+    dest = tmp_path / '1 Island.png'
+    (tmp_path / '1 Island.png.part').write_bytes(b'image-bytes')
+    fi._write_meta(str(dest), {'partial': {'url': 'http://img/a.png', 'etag': '"v1"'}})
+
+    assert fi.download_image('http://img/a.png', str(dest)) is True
+    assert 'Range' not in requests_seen[1]
+    assert dest.read_bytes() == b'image'
+
+
+def test_merge_card_list(fi):
+    cards = [
+        (1, 'Island', None, None),
+        (2, 'Swamp', None, None),
+        (3, 'island', None, None),
+        (1, 'Island', 'M20', '264'),
+    ]
+    assert fi.merge_card_list(cards) == [
+        (4, 'Island', None, None),
+        (2, 'Swamp', None, None),
+        (1, 'Island', 'M20', '264'),
+    ]
+
+
+def test_merge_resolved_same_printing(fi):
+    cards = [(1, 'Island', None, None), (2, 'Island', 'M20', '264'), (1, 'Nope', None, None)]
+    island = {'id': 'x', 'lang': 'en'}
+    merged, data, sources = fi.merge_resolved(cards, [island, island, None])
+    assert merged == [(3, 'Island', None, None), (1, 'Nope', None, None)]
+    assert data == [island, None]
+    assert sources == [cards[:2], cards[2:]]
+
+
+class FakeEngine:
+    def __init__(self, fi, data):
+        self.fi = fi
+        self.data = data
+        self.resolved = []
+        self.fetched = []
+
+    def resolve(self, cards):
+        self.resolved.extend(cards)
+        return [self.data.get(name) for _, name, _, _ in cards]
+
+    def iter_fetch(self, cards, resolved, deck_dir=None):
+        for (qty, name, _, _), card_data in zip(cards, resolved):
+            self.fetched.append((qty, name))
+            path = f"{deck_dir or self.fi.DECK_DIR}/{qty} {name}.png"
+            with open(path, 'w') as f:
+                f.write(name)
+            yield {'id': card_data['id'], 'files': [path]}
+
+
+def test_update_deck_is_incremental(monkeypatch, fi, tmp_path):
+    monkeypatch.setattr(fi, 'DECK_DIR', str(tmp_path))
+    data = {'Island': {'id': 'i'}, 'Swamp': {'id': 's'}, 'Forest': {'id': 'f'}}
+
+    first = FakeEngine(fi, data)
+    fi.update_deck(first, [(2, 'Island', None, None), (1, 'Swamp', None, None)], 'en')
+    assert first.fetched == [(2, 'Island'), (1, 'Swamp')]
+
+    second = FakeEngine(fi, data)
+    fi.update_deck(second, [(2, 'Island', None, None), (1, 'Forest', None, None)], 'en')
+
+    assert second.resolved == [(1, 'Forest', None, None)]
+    assert second.fetched == [(1, 'Forest')]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        '.manifest.json', '1 Forest.png', '2 Island.png'
+    ]
+
+
+def test_update_deck_merges_with_kept_printing(monkeypatch, fi, tmp_path):
+    monkeypatch.setattr(fi, 'DECK_DIR', str(tmp_path))
+    data = {'Island': {'id': 'i'}, 'Isla': {'id': 'i'}}
+
+    fi.update_deck(FakeEngine(fi, data), [(2, 'Island', None, None)], 'en')
+    engine = FakeEngine(fi, data)
+    fi.update_deck(engine, [(2, 'Island', None, None), (1, 'Isla', None, None)], 'en')
+
+    assert engine.fetched == [(3, 'Isla')]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['.manifest.json', '3 Isla.png']
+
+
+def test_pair_ids_are_stable_and_probe_on_collision(fi):
+    fi._seed_pair_ids([])
+    first = fi._pair_id('card-a')
+    fi._seed_pair_ids([])
+    assert fi._pair_id('card-a') == first
+    assert len(first) == fi.PAIR_ID_DIGITS
+
+    unit = {'files': {f'2 F{first} Front.png': {}, f'B{first} Back.png': {}}}
+    fi._seed_pair_ids([unit])
+    assert fi._pair_id('card-a') == f"{int(first) + 1:0{fi.PAIR_ID_DIGITS}d}"
+
+
+def test_pair_ids_seeded_from_english_match_localized_download(fi, tmp_path):
+    faces = [
+        {'name': 'Delver of Secrets', 'image_uris': {'png': 'http://img/front.png'}},
+        {'name': 'Insectile Aberration', 'image_uris': {'png': 'http://img/back.png'}},
+    ]
+    english = {'id': 'en-1', 'lang': 'en', 'set': 'isd', 'collector_number': '51',
+               'card_faces': faces}
+    other = {'id': 'en-2', 'lang': 'en', 'set': 'isd', 'collector_number': '52',
+             'card_faces': faces}
+    spanish = dict(english, id='es-1', lang='es')
+    fi._seed_pair_ids([], [english, other])
+    expected = fi._pair_id('isd/51')
+    used = set(fi._used_pair_ids)
+
+    downloads = fi._plan_downloads(1, 'Delver of Secrets', spanish, str(tmp_path))
+
+    assert os.path.basename(downloads[0][2]) == f'1 F{expected} Delver of Secrets.png'
+    assert fi._used_pair_ids == used
+
+
+def test_double_faced_copies_share_one_download_per_face(monkeypatch, fi, tmp_path):
+    monkeypatch.setattr(fi, 'DECK_DIR', str(tmp_path))
+    monkeypatch.setattr(fi, '_image_cache', None)
+    fetched = []
+
+    def fake_download(url, dest):
+        fetched.append(url)
+        with open(dest, 'w') as f:
+            f.write(url)
+
+    monkeypatch.setattr(fi, 'download_image', fake_download)
+    data = {
+        'id': 'dfc-1',
+        'lang': 'en',
+        'name': 'Delver of Secrets // Insectile Aberration',
+        'card_faces': [
+            {'name': 'Delver of Secrets', 'image_uris': {'png': 'http://img/front.png'}},
+            {'name': 'Insectile Aberration', 'image_uris': {'png': 'http://img/back.png'}},
+        ],
+    }
+    fi._seed_pair_ids([], [data])
+
+    result = fi._fetch_single_card(4, 'Delver of Secrets', 'en', card_data=data)
+
+    ident = fi._pair_id('dfc-1')
+    assert sorted(fetched) == ['http://img/back.png?lang=en', 'http://img/front.png?lang=en']
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        f'4 F{ident} Delver of Secrets.png', f'B{ident} Insectile Aberration.png'
+    ]
+    assert result['id'] == 'dfc-1'
+
+
+def test_thread_engine_downloads_both_faces_at_once(monkeypatch, fi, tmp_path):
+    import threading
+
+    both = threading.Barrier(2, timeout=5)
+    fetched = []
+
+    def fake_download(card_data, face, url, path, lang):
+        both.wait()
+        fetched.append((face, threading.get_ident()))
+
+    monkeypatch.setattr(fi, '_download_face', fake_download)
+    data = {
+        'id': 'dfc-1',
+        'lang': 'en',
+        'name': 'Delver of Secrets // Insectile Aberration',
+        'card_faces': [
+            {'name': 'Delver of Secrets', 'image_uris': {'png': 'http://img/front.png'}},
+            {'name': 'Insectile Aberration', 'image_uris': {'png': 'http://img/back.png'}},
+        ],
+    }
+    fi._seed_pair_ids([], [data])
+    engine = fi.ThreadEngine('en', workers=2)
+
+    results = engine.fetch([(4, 'Delver of Secrets', None, None)], [data], str(tmp_path))
+
+    assert sorted(face for face, _ in fetched) == [0, 1]
+    assert fetched[0][1] != fetched[1][1]
+    assert [len(r['files']) for r in results] == [2]
+
+
+def test_choose_image_variant(fi):
+    jpeg = {'image-format': 'jpeg'}
+    assert fi.choose_image_variant(dict(jpeg, DPI=150)) == 'normal'
+    assert fi.choose_image_variant(dict(jpeg, DPI=200)) == 'large'
+    assert fi.choose_image_variant(dict(jpeg, DPI=300)) == 'png'
+    assert fi.choose_image_variant({'image-format': 'png', 'DPI': 150}) == 'png'
+    assert fi.choose_image_variant({'downsample-images': False, 'DPI': 150}) == 'normal'
+    assert fi.choose_image_variant({'image-variant': 'border_crop'}) == 'border_crop'
+
+
+def test_plan_downloads_uses_variant_extension(monkeypatch, fi, tmp_path):
+    monkeypatch.setattr(fi, '_image_variant', 'large')
+    data = {
+        'name': 'Island',
+        'image_uris': {
+            'png': 'https://img/png/front/i.png?1',
+            'large': 'https://img/large/front/i.jpg?1',
+        },
+    }
+
+    downloads = fi._plan_downloads(2, 'Island', data, str(tmp_path))
+
+    assert downloads == [(0, 'https://img/large/front/i.jpg?1', str(tmp_path / '2 Island.jpg'))]
@@ -52,6 +52,14 @@ def stub_dependencies(monkeypatch):
             pass
         def line(self, *a, **k):
             pass
+        def hasForm(self, name):
+            return False
+        def beginForm(self, *a, **k):
+            pass
+        def endForm(self, *a, **k):
+            pass
+        def doForm(self, *a, **k):
+            pass
 
     rl.pdfgen.canvas = types.SimpleNamespace(Canvas=DummyCanvas)
     rl.lib = types.ModuleType('lib')
@@ -59,6 +67,8 @@ def stub_dependencies(monkeypatch):
     rl.lib.utils = types.ModuleType('utils')
     rl.lib.utils.ImageReader = lambda img: img
 
+    rl.rl_config = types.SimpleNamespace(useA85=1)
+
     monkeypatch.setitem(sys.modules, 'reportlab', rl)
     monkeypatch.setitem(sys.modules, 'reportlab.pdfgen', rl.pdfgen)
     monkeypatch.setitem(sys.modules, 'reportlab.pdfgen.canvas', rl.pdfgen.canvas)
@@ -605,3 +615,406 @@ def test_page_rotation_front_unchanged(monkeypatch, gp):
     gp.draw_pages('dummy.pdf', pages, cfg, front=True)
 
     assert not any(call[0] == 'rotate' for call in calls if isinstance(call, tuple))
+
+
+def test_image_registry_decodes_once(monkeypatch, gp, tmp_path):
+    opened = []
+
+    def fake_open(path):
+        opened.append(path)
+        return path
+
+    monkeypatch.setattr(gp.Image, 'open', fake_open)
+
+    back = tmp_path / 'back.jpg'
+    back.write_text('')
+    front = tmp_path / '1 Island.png'
+    front.write_text('')
+
+    cfg = {
+        'page_size': (34, 100),
+        'margin_pt': 5,
+        'gap_pt': 0,
+        'card_width_pt': 10,
+        'card_height_pt': 20,
+        'GRID': (2, 1),
+    }
+    card = {'front': str(front), 'back': str(back)}
+    pages = [[card, card], [card]]
+
+    images = gp.draw_pages_intercalated('dummy.pdf', pages, cfg)
+
+    assert opened == [str(front), str(back)]
+    assert images.unique == 2
+    assert images.placed == 6
+
+
+
+def test_default_back_prepared_once(monkeypatch, gp, tmp_path):
+    prepared = []
+    readers = []
+
+    def fake_prepare(path, w, h, config):
+        prepared.append((path, w, h))
+        return str(tmp_path / f'{path}-prepared.jpg')
+
+    def fake_reader(src):
+        readers.append(src)
+        return object()
+
+    monkeypatch.setattr(gp, 'prepare_for_config', fake_prepare)
+    monkeypatch.setattr(gp, 'ImageReader', fake_reader)
+
+    cfg = {
+        'page_size': (34, 100),
+        'margin_pt': 5,
+        'gap_pt': 0,
+        'card_width_pt': 10,
+        'card_height_pt': 20,
+        'back_oversize_pt': 1,
+        'GRID': (2, 1),
+        'DEFAULT_BACK': 'back.jpg',
+        'downsample-images': True,
+    }
+    image = gp.prepare_default_back(cfg)
+    pages = [[{'front': 'a', 'back': 'back.jpg'}, {'front': 'b', 'back': 'back.jpg'}]]
+
+    fronts = gp.draw_pages('f.pdf', pages, cfg, front=True)
+    backs = gp.draw_pages('b.pdf', pages, cfg, front=False)
+
+    assert image == str(tmp_path / 'back.jpg-prepared.jpg')
+    assert prepared.count(('back.jpg', 11, 21)) == 1
+    assert readers.count(image) == 1
+    assert backs.placed == 2
+    assert fronts.placed == 2
+    assert backs.get('back.jpg', 11, 21) is backs.get('back.jpg', 11, 21)
+
+
+def test_default_back_skipped_for_blank_back(gp):
+    cfg = {'DEFAULT_BACK': 'back.jpg', 'blank-back': True}
+    assert gp.prepare_default_back(cfg) is None
+    assert '_default_back' not in cfg
+
+def test_image_jobs(gp):
+    cfg = {
+        'card_width_pt': 10,
+        'card_height_pt': 20,
+        'back_oversize_pt': 2,
+    }
+    pages = [
+        [{'front': 'f1', 'back': 'b'}, {'front': 'f1', 'back': 'b'}],
+        [{'front': 'f2', 'back': None}],
+    ]
+
+    assert gp.image_jobs(pages, cfg) == [
+        ('f1', 10, 20),
+        ('b', 12, 22),
+        ('f2', 10, 20),
+    ]
+
+
+def test_iter_pages_is_lazy(gp):
+    def cards():
+        for i in range(5):
+            yield {'front': f'f{i}', 'back': None}
+
+    pages = gp.iter_pages(cards(), 2, 1)
+    assert next(pages) == [{'front': 'f0', 'back': None}, {'front': 'f1', 'back': None}]
+    assert [len(p) for p in pages] == [2, 1]
+
+
+def test_draw_pages_streaming_parts(monkeypatch, gp):
+    saved = []
+
+    class RecCanvas:
+        def __init__(self, path, **k):
+            self.path = path
+            self.pages = 0
+        def drawImage(self, *a, **k):
+            pass
+        def showPage(self):
+            self.pages += 1
+        def saveState(self):
+            pass
+        def translate(self, *a, **k):
+            pass
+        def rotate(self, *a, **k):
+            pass
+        def restoreState(self):
+            pass
+        def save(self):
+            saved.append((self.path, self.pages))
+        def setStrokeGray(self, *a, **k):
+            pass
+        def setLineWidth(self, *a, **k):
+            pass
+        def line(self, *a, **k):
+            pass
+
+    monkeypatch.setattr(gp.canvas, 'Canvas', RecCanvas)
+
+    cfg = {
+        'page_size': (10, 10),
+        'margin_pt': 0,
+        'gap_pt': 0,
+        'card_width_pt': 1,
+        'card_height_pt': 1,
+        'GRID': (1, 1),
+    }
+    pages = iter([[{'front': f'f{i}', 'back': 'b'}] for i in range(5)])
+
+    paths, registries = gp.draw_pages_streaming('out/deck', pages, cfg, 2)
+
+    assert paths == ['out/deck_part01.pdf', 'out/deck_part02.pdf', 'out/deck_part03.pdf']
+    assert saved == [(paths[0], 4), (paths[1], 4), (paths[2], 2)]
+    assert len(registries) == 3
+
+
+def test_draw_pages_records_profile(gp):
+    import metrics
+
+    cfg = {
+        'page_size': (10, 10),
+        'margin_pt': 0,
+        'gap_pt': 0,
+        'card_width_pt': 1,
+        'card_height_pt': 1,
+        'GRID': (1, 1),
+    }
+    pages = [[{'front': 'f', 'back': 'b'}], [{'front': 'g', 'back': 'b'}]]
+
+    metrics.enable()
+    try:
+        gp.draw_pages_intercalated('out.pdf', pages, cfg)
+        spans = metrics.snapshot()['spans']
+    finally:
+        metrics.disable()
+
+    assert spans['render.page']['count'] == 4
+    assert spans['render.draw_image']['count'] == 4
+    assert spans['render.open_image']['count'] == 3
+    assert spans['render.save']['count'] == 1
+
+
+def test_back_pages_stamp_default_back_form(monkeypatch, gp):
+    class FormCanvas:
+        def __init__(self, *a, **k):
+            self.forms = set()
+            self.ops = []
+        def hasForm(self, name):
+            return name in self.forms
+        def beginForm(self, name, *a, **k):
+            self.ops.append(('beginForm', name))
+            self._form = name
+        def endForm(self):
+            self.forms.add(self._form)
+            self.ops.append(('endForm',))
+        def doForm(self, name):
+            self.ops.append(('doForm', name))
+        def drawImage(self, img, x, y, width=None, height=None):
+            self.ops.append(('draw', img, x))
+        def showPage(self):
+            self.ops.append(('showPage',))
+        def saveState(self):
+            pass
+        def translate(self, *a, **k):
+            pass
+        def rotate(self, *a, **k):
+            pass
+        def restoreState(self):
+            pass
+        def save(self):
+            pass
+        def setFillColorRGB(self, *a, **k):
+            pass
+        def rect(self, *a, **k):
+            pass
+
+    created = []
+
+    def make_canvas(*a, **k):
+        created.append(FormCanvas())
+        return created[-1]
+
+    monkeypatch.setattr(gp.canvas, 'Canvas', make_canvas)
+
+    cfg = {
+        'page_size': (34, 100),
+        'margin_pt': 5,
+        'gap_pt': 0,
+        'card_width_pt': 10,
+        'card_height_pt': 20,
+        'GRID': (2, 1),
+        'DEFAULT_BACK': 'back',
+    }
+    pages = [
+        [{'front': 'a', 'back': 'back'}, {'front': 'b', 'back': 'B01'}],
+        [{'front': 'c', 'back': 'back'}, {'front': 'd', 'back': 'back'}],
+        [{'front': 'e', 'back': 'back'}],
+    ]
+
+    images = gp.draw_pages('backs.pdf', pages, cfg, front=False)
+    ops = created[0].ops
+
+    assert ops[:4] == [
+        ('beginForm', gp.BACK_FORM), ('draw', 'back', 17), ('draw', 'back', 7), ('endForm',),
+    ]
+    assert ops[4:] == [
+        ('doForm', gp.BACK_FORM), ('draw', 'B01', 7), ('showPage',),
+        ('doForm', gp.BACK_FORM), ('showPage',),
+        ('draw', 'back', 17), ('showPage',),
+    ]
+    assert (images.unique, images.placed) == (2, 5)
+
+
+def test_render_deck_uses_given_folder(gp, tmp_path):
+    deck = tmp_path / 'deck'
+    deck.mkdir()
+    (deck / '2 Island.png').write_text('')
+    cfg = {
+        'page_size': (34, 100),
+        'margin_pt': 5,
+        'gap_pt': 0,
+        'card_width_pt': 10,
+        'card_height_pt': 20,
+        'blank-back': True,
+        'pages-intercalation': False,
+    }
+
+    paths, registries = gp.render_deck(cfg, str(deck), str(tmp_path / 'out'))
+
+    assert paths == [str(tmp_path / 'out_fronts.pdf'), str(tmp_path / 'out_backs.pdf')]
+    assert registries[0].placed == 2
+
+
+def test_parse_deck_shared_double_faced_pair(monkeypatch, gp, tmp_path):
+    deck = tmp_path / 'deck'
+    deck.mkdir()
+    (deck / '3 F104233 Delver.png').write_text('')
+    (deck / 'B104233 Aberration.png').write_text('')
+    monkeypatch.setattr(gp, 'DECK_DIR', str(deck))
+
+    cards = gp.parse_deck({'DEFAULT_BACK': 'back.jpg'})
+
+    assert cards == [{
+        'front': str(deck / '3 F104233 Delver.png'),
+        'back': str(deck / 'B104233 Aberration.png'),
+    }] * 3
+
+
+def test_registry_reads_stored_images_from_memory(monkeypatch, gp):
+    from image_store import ImageStore
+
+    def fail_prepare(*a):
+        raise AssertionError('stored images are already prepared')
+
+    monkeypatch.setattr(gp, 'prepare_for_config', fail_prepare)
+    image = ImageStore().put(('id', 0), b'jpeg-bytes')
+    reg = gp.ImageRegistry({'downsample-images': True})
+
+    reader = reg.get(image, 10, 20)
+    assert reg.get(image, 10, 20) is reader
+    assert reader.read() == b'jpeg-bytes'
+    assert (reg.unique, reg.placed) == (1, 2)
+
+
+@pytest.mark.parametrize('argv', [
+    ['--pages-per-part', '0'],
+    ['--pages-per-part', '-3'],
+    ['--pages-per-part', '5', '--incremental'],
+])
+def test_parse_args_rejects_bad_part_options(gp, argv):
+    with pytest.raises(SystemExit):
+        gp.parse_args(argv)
+
+
+def test_parse_args_accepts_parts(gp):
+    assert gp.parse_args(['--pages-per-part', '1']).pages_per_part == 1
+
+
+def test_parallel_outputs_merge_page_ranges_in_order(monkeypatch, gp, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pypdf = types.ModuleType('pypdf')
+
+    class FakeWriter:
+        def __init__(self):
+            self.parts = []
+
+        def append(self, reader):
+            self.parts.append(reader)
+
+        def write(self, f):
+            f.write('|'.join(self.parts).encode())
+
+    pypdf.PdfReader = lambda path: open(path).read()
+    pypdf.PdfWriter = FakeWriter
+    monkeypatch.setitem(sys.modules, 'pypdf', pypdf)
+
+    def fake_draw(base, pages, config):
+        paths = []
+        for path, sides in gp._output_targets(base, config):
+            with open(path, 'w') as f:
+                f.write(','.join(f"{p}{'F' if s else 'B'}" for p in pages for s in sides))
+            paths.append(path)
+        registries = [types.SimpleNamespace(unique=1, placed=len(pages))] * len(paths)
+        return paths, registries
+
+    monkeypatch.setattr(gp, 'draw_outputs', fake_draw)
+    monkeypatch.setattr(gp, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    base = str(tmp_path / 'deck')
+    cfg = {'pages-intercalation': False}
+
+    paths, counts = gp.draw_outputs_parallel(base, ['1', '2', '3', '4', '5'], cfg, 2)
+
+    assert paths == [f'{base}_fronts.pdf', f'{base}_backs.pdf']
+    assert (tmp_path / 'deck_fronts.pdf').read_text() == '1F,2F,3F|4F,5F'
+    assert (tmp_path / 'deck_backs.pdf').read_text() == '1B,2B,3B|4B,5B'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['deck_backs.pdf', 'deck_fronts.pdf']
+    assert sum(c.placed for c in counts) == 10
+
+
+def test_incremental_pages_written_without_ascii85(monkeypatch, gp):
+    seen = []
+
+    class FakeCache:
+        def build(self, pdf_path, sequence, config, render_page):
+            for page, front in sequence:
+                render_page('page.pdf', page, front)
+            seen.append(gp.rl_config.useA85)
+
+    class RecordingCanvas(gp.canvas.Canvas):
+        def save(self):
+            seen.append(gp.rl_config.useA85)
+
+    monkeypatch.setattr(gp.canvas, 'Canvas', RecordingCanvas)
+    cfg = {
+        'page_size': (10, 10), 'margin_pt': 0, 'gap_pt': 0, 'card_width_pt': 5,
+        'card_height_pt': 5, 'GRID': (1, 1), 'blank-back': True,
+        'downsample-images': False,
+    }
+    sequence = [([{'front': 'a', 'back': None}], True)]
+
+    gp.draw_pages_incremental('deck.pdf', sequence, cfg, FakeCache())
+
+    assert seen == [0, 1]
+
+
+def test_incremental_counts_reused_pages(gp):
+    class FakeCache:
+        def build(self, pdf_path, sequence, config, render_page):
+            for i, (page, front) in enumerate(sequence):
+                if i == 0:
+                    render_page('page.pdf', page, front)
+
+    cfg = {
+        'page_size': (10, 10), 'margin_pt': 0, 'gap_pt': 0, 'card_width_pt': 5,
+        'card_height_pt': 5, 'GRID': (2, 1), 'blank-back': True,
+        'downsample-images': False,
+    }
+    page = [{'front': 'a', 'back': None}, {'front': 'b', 'back': None}]
+    sequence = [(page, True), (page, False), (page, True)]
+
+    images = gp.draw_pages_incremental('deck.pdf', sequence, cfg, FakeCache())
+
+    assert (images.unique, images.placed) == (2, 4)
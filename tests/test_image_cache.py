@@ -0,0 +1,116 @@
+import os
+
+import image_cache
+
+
+URL = 'https://cards.scryfall.io/png/front/6/d/6da0.png?1562736365'
+
+
+def test_cache_key_uses_version():
+    key = image_cache.cache_key('6da0', 0, 'en', URL)
+    assert key == '6da0_0_en_1562736365.png'
+    newer = image_cache.cache_key('6da0', 0, 'en', URL.replace('1562736365', '1700000000'))
+    assert newer != key
+
+
+
+def test_cache_key_separates_image_sizes():
+    large = URL.replace('/png/', '/large/').replace('.png?', '.jpg?')
+    normal = URL.replace('/png/', '/normal/').replace('.png?', '.jpg?')
+    assert image_cache.cache_key('6da0', 0, 'en', large, 'large') == '6da0_0_en_large_1562736365.jpg'
+    assert image_cache.cache_key('6da0', 0, 'en', normal, 'normal') != (
+        image_cache.cache_key('6da0', 0, 'en', large, 'large')
+    )
+
+def test_fetch_hit_and_miss(tmp_path):
+    cache = image_cache.ImageCache(str(tmp_path / 'cache'))
+    downloads = []
+
+    def download(path):
+        downloads.append(path)
+        with open(path, 'wb') as f:
+            f.write(b'png')
+
+    deck1 = tmp_path / 'deck1'
+    deck2 = tmp_path / 'deck2'
+    deck1.mkdir()
+    deck2.mkdir()
+    key = image_cache.cache_key('6da0', 0, 'en', URL)
+
+    cache.fetch(key, str(deck1 / '1 Island.png'), download)
+    cache.fetch(key, str(deck2 / '4 Island.png'), download)
+
+    assert len(downloads) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert (deck2 / '4 Island.png').read_bytes() == b'png'
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = image_cache.ImageCache(str(tmp_path), max_bytes=10)
+    for i, name in enumerate(['old', 'mid', 'new']):
+        path = tmp_path / 'xx' / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b'12345')
+        os.utime(path, (i, i))
+
+    assert cache.evict() == 1
+    assert not (tmp_path / 'xx' / 'old').exists()
+    assert (tmp_path / 'xx' / 'new').exists()
+
+
+def test_concurrent_misses_share_download(tmp_path):
+    import threading
+
+    cache = image_cache.ImageCache(str(tmp_path / 'cache'))
+    started = threading.Event()
+    release = threading.Event()
+    downloads = []
+
+    def download(path):
+        downloads.append(path)
+        started.set()
+        release.wait(5)
+        with open(path, 'wb') as f:
+            f.write(b'png')
+
+    key = image_cache.cache_key('6da0', 0, 'en', URL)
+    first = threading.Thread(
+        target=cache.fetch, args=(key, str(tmp_path / 'a.png'), download)
+    )
+    first.start()
+    started.wait(5)
+    second = threading.Thread(
+        target=cache.fetch, args=(key, str(tmp_path / 'b.png'), download)
+    )
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert len(downloads) == 1
+    assert (tmp_path / 'b.png').read_bytes() == b'png'
+
+
+def test_hits_do_not_touch_linked_files(tmp_path):
+    cache = image_cache.ImageCache(str(tmp_path / 'cache'), max_bytes=5)
+    old_key = image_cache.cache_key('aaaa', 0, 'en', URL)
+    new_key = image_cache.cache_key('bbbb', 0, 'en', URL)
+
+    def download(path):
+        with open(path, 'wb') as f:
+            f.write(b'12345')
+
+    deck = tmp_path / 'deck'
+    deck.mkdir()
+    cache.fetch(old_key, str(deck / '1 Island.png'), download)
+    cache.fetch(new_key, str(deck / '1 Swamp.png'), download)
+    for key in (old_key, new_key):
+        os.utime(cache.path(key), (100, 100))
+    os.utime(cache.path(new_key), (200, 200))
+
+    cache.fetch(old_key, str(deck / '2 Island.png'), download)
+
+    assert os.stat(deck / '2 Island.png').st_mtime == 100
+    assert cache.evict() == 1
+    assert os.path.exists(cache.path(old_key))
+    assert not os.path.exists(cache.path(new_key))
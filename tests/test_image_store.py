@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+from image_store import ImageStore
+
+
+def test_least_recently_used_images_are_evicted():
+    store = ImageStore(max_bytes=10)
+    store.put('a', b'1234')
+    store.put('b', b'1234')
+    assert store.get('a').data == b'1234'
+    store.put('c', b'1234')
+
+    assert store.get('b') is None
+    assert store.get('a') is not None and store.get('c') is not None
+    assert store.size == 8
+
+    store.put('big', b'x' * 20)
+    assert len(store) == 1 and store.get('big') is not None
+
+
+def test_get_or_load_loads_each_key_once():
+    store = ImageStore()
+    calls = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.05)
+        return b'data'
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(store.get_or_load('k', load)))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert len({id(r) for r in results}) == 1
+    assert results[0].open().read() == b'data'
+    assert (store.hits, store.misses) == (0, 1)
+    assert store.get_or_load('k', load) is results[0]
+    assert store.hits == 1
+
+
+def test_failed_load_is_not_stored():
+    store = ImageStore()
+
+    def fail():
+        raise IOError('boom')
+
+    with pytest.raises(IOError):
+        store.get_or_load('k', fail)
+    assert store.get('k') is None
+    assert store.get_or_load('k', lambda: b'ok').data == b'ok'
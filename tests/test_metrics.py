@@ -0,0 +1,60 @@
+import json
+
+import metrics
+
+
+def test_disabled_records_nothing():
+    metrics.disable()
+    before = metrics.snapshot()
+    with metrics.span('x'):
+        pass
+    metrics.count('n')
+
+    assert metrics.span('x') is metrics.span('y')
+    assert metrics.snapshot() == before
+
+
+def test_spans_and_counters_are_aggregated():
+    metrics.enable()
+    try:
+        for _ in range(3):
+            with metrics.span('phase'):
+                pass
+
+        @metrics.timed('call')
+        def work(x):
+            return x * 2
+
+        assert work(2) == 4
+        metrics.count('bytes', 10)
+        metrics.count('bytes', 5)
+        data = metrics.snapshot()
+    finally:
+        metrics.disable()
+
+    assert data['spans']['phase']['count'] == 3
+    assert data['spans']['call']['count'] == 1
+    assert data['counters'] == {'bytes': 15}
+    assert any(line.startswith('bytes') for line in metrics.summary_lines())
+
+
+def test_profiling_writes_chrome_trace(tmp_path, capsys):
+    trace = tmp_path / 'trace.json'
+    with metrics.profiling(False, str(trace)):
+        with metrics.span('render.page'):
+            pass
+
+    data = json.loads(trace.read_text())
+    names = [e['name'] for e in data['traceEvents']]
+    assert names == ['render.page', 'total']
+    assert all(e['ph'] == 'X' and e['dur'] >= 0 for e in data['traceEvents'])
+    assert data['metrics']['spans']['total']['count'] == 1
+    assert 'render.page' in capsys.readouterr().out
+    assert not metrics.enabled()
+
+
+def test_profiling_inactive_is_noop(tmp_path, capsys):
+    with metrics.profiling(False):
+        with metrics.span('x'):
+            pass
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,69 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def pc(monkeypatch):
+    pypdf = types.ModuleType('pypdf')
+
+    class FakeWriter:
+        def __init__(self):
+            self.pages = []
+
+        def append(self, reader):
+            self.pages.append(reader)
+
+        def write(self, f):
+            f.write('\n'.join(self.pages).encode())
+
+    pypdf.PdfReader = lambda path: open(path).read()
+    pypdf.PdfWriter = FakeWriter
+    monkeypatch.setitem(sys.modules, 'pypdf', pypdf)
+    if 'page_cache' in sys.modules:
+        del sys.modules['page_cache']
+    return importlib.import_module('page_cache')
+
+
+def test_build_reuses_unchanged_pages(pc, tmp_path):
+    a = tmp_path / 'a.png'
+    b = tmp_path / 'b.png'
+    a.write_text('a')
+    b.write_text('b')
+    cfg = {'GRID': (1, 1), 'page_size': (10, 10)}
+    rendered = []
+
+    def render(path, page, front):
+        rendered.append((page[0]['front'], front))
+        with open(path, 'w') as f:
+            f.write(f"{page[0]['front']}-{front}")
+
+    pages = [[{'front': str(a), 'back': None}], [{'front': str(b), 'back': None}]]
+    cache = pc.PageCache(str(tmp_path / 'cache'))
+    out = tmp_path / 'deck.pdf'
+    cache.build(str(out), [(p, True) for p in pages], cfg, render)
+    assert len(rendered) == 2
+
+    b.write_text('changed')
+    rendered.clear()
+    cache = pc.PageCache(str(tmp_path / 'cache'))
+    cache.build(str(out), [(p, True) for p in pages], cfg, render)
+
+    assert rendered == [(str(b), True)]
+    assert (cache.reused, cache.rendered) == (1, 1)
+    assert out.read_text().splitlines() == [f'{a}-True', f'{b}-True']
+
+
+def test_fingerprint_depends_on_layout(pc, tmp_path):
+    a = tmp_path / 'a.png'
+    a.write_text('a')
+    page = [{'front': str(a), 'back': None}]
+    cache = pc.PageCache(str(tmp_path / 'cache'))
+
+    base = cache.fingerprint(page, {'back_offset_pt': 0}, False)
+    moved = cache.fingerprint(page, {'back_offset_pt': 1}, False)
+    front = cache.fingerprint(page, {'back_offset_pt': 0}, True)
+
+    assert len({base, moved, front}) == 3
@@ -0,0 +1,126 @@
+import importlib
+import sys
+
+import pytest
+
+from test_fetch_images import FakeEngine, fi  # noqa: F401
+from test_generate_pdf import stub_dependencies
+
+
+@pytest.fixture
+def pl(monkeypatch, fi):
+    stub_dependencies(monkeypatch)
+    for name in ('generate_pdf', 'pipeline'):
+        if name in sys.modules:
+            del sys.modules[name]
+    mod = importlib.import_module('pipeline')
+    monkeypatch.setattr(mod, 'fetch_images', fi)
+    return mod
+
+
+def test_unit_cards(pl, tmp_path):
+    cfg = {'DEFAULT_BACK': 'back.jpg'}
+    single = {'sources': {'island||en': 2, 'isla||en': 1}, 'files': {'3 Isla.png': {}}}
+    dfc = {'sources': {'delver||en': 2}, 'files': {
+        'F01 Delver.png': {}, 'B01 Aberration.png': {},
+        'F02 Delver.png': {}, 'B02 Aberration.png': {},
+    }}
+
+    assert list(pl.unit_cards(single, cfg, 'd')) == [
+        {'front': 'd/3 Isla.png', 'back': 'back.jpg'}
+    ] * 3
+    assert list(pl.unit_cards(dfc, cfg, 'd')) == [
+        {'front': 'd/F01 Delver.png', 'back': 'd/B01 Aberration.png'},
+        {'front': 'd/F02 Delver.png', 'back': 'd/B02 Aberration.png'},
+    ]
+    assert list(pl.unit_cards(single, {'blank-back': True}, 'd'))[0]['back'] is None
+
+    shared = {'sources': {'delver||en': 3}, 'files': {
+        '3 F123456 Delver.png': {}, 'B123456 Aberration.png': {},
+    }}
+    assert list(pl.unit_cards(shared, cfg, 'd')) == [
+        {'front': 'd/3 F123456 Delver.png', 'back': 'd/B123456 Aberration.png'}
+    ] * 3
+
+
+def test_pages_are_drawn_while_fetching(monkeypatch, pl, fi, tmp_path):
+    monkeypatch.setattr(fi, 'DECK_DIR', str(tmp_path))
+    log = []
+
+    class LoggingEngine(FakeEngine):
+        def iter_fetch(self, cards, resolved, deck_dir=None):
+            for result in super().iter_fetch(cards, resolved, deck_dir):
+                log.append(('fetched', self.fetched[-1][1]))
+                yield result
+
+    engine = LoggingEngine(fi, {'A': {'id': 'a'}, 'B': {'id': 'b'}, 'C': {'id': 'c'}})
+    cards = [(1, 'A', None, None), (1, 'B', None, None), (1, 'C', None, None)]
+    cfg = {'blank-back': True, 'GRID': (1, 1)}
+
+    units = fi.iter_update_deck(engine, cards, 'en')
+    for page in pl.generate_pdf.iter_pages(pl.iter_cards(units, cfg), 1, 1):
+        log.append(('page', page[0]['front']))
+
+    assert log == [
+        ('fetched', 'A'), ('page', f'{tmp_path}/1 A.png'),
+        ('fetched', 'B'), ('page', f'{tmp_path}/1 B.png'),
+        ('fetched', 'C'), ('page', f'{tmp_path}/1 C.png'),
+    ]
+    assert (tmp_path / '.manifest.json').exists()
+
+
+def test_in_memory_cards_skip_the_deck_folder(monkeypatch, pl, fi, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    downloads = []
+
+    def fake_download(url):
+        downloads.append(url)
+        return url.encode()
+
+    monkeypatch.setattr(fi, 'download_bytes', fake_download)
+    data = {
+        'Island': {'id': 'i', 'lang': 'en', 'image_uris': {'png': 'http://x/i.png'}},
+        'Delver': {'id': 'd', 'lang': 'en', 'card_faces': [
+            {'name': 'Delver', 'image_uris': {'png': 'http://x/f.png'}},
+            {'name': 'Aberration', 'image_uris': {'png': 'http://x/b.png'}},
+        ]},
+    }
+    config = {
+        'DEFAULT_BACK': 'back.jpg', 'card_width_pt': 180, 'card_height_pt': 252,
+        'back_oversize_pt': 1,
+    }
+    cards = [(2, 'Island', None, None), (1, 'Delver', None, None)]
+    store = pl.ImageStore()
+
+    records = list(pl.iter_memory_cards(FakeEngine(fi, data), cards, 'en', config, store))
+
+    assert [r['back'] for r in records[:2]] == ['back.jpg', 'back.jpg']
+    assert records[0]['front'] is records[1]['front']
+    assert records[0]['front'].data == b'http://x/i.png?lang=en'
+    assert records[2]['back'].data == b'http://x/b.png?lang=en'
+    assert records[2]['back'].key[1] == 1
+    assert len(downloads) == 3
+    assert list(tmp_path.iterdir()) == []
+
+    again = list(pl.iter_memory_cards(FakeEngine(fi, data), cards, 'en', config, store))
+    assert len(downloads) == 3
+    assert again[2]['front'] is records[2]['front']
+
+
+def test_manual_cards_skip_fetched_files(pl, tmp_path):
+    for fname in ('4 Island.png', 'F01 Delver.png', 'B01 Aberration.png',
+                  '2 Proxy.png', 'F07 Token.png', 'B07 Token back.png'):
+        (tmp_path / fname).write_text('')
+    pl.deck_manifest.save(str(tmp_path), [
+        {'sources': {'island||en': 4}, 'files': {'4 Island.png': {}}},
+        {'sources': {'delver||en': 1}, 'files': {
+            'F01 Delver.png': {}, 'B01 Aberration.png': {},
+        }},
+    ])
+
+    assert list(pl.manual_cards({'DEFAULT_BACK': 'back.jpg'}, str(tmp_path))) == [
+        {'front': f'{tmp_path}/2 Proxy.png', 'back': 'back.jpg'},
+        {'front': f'{tmp_path}/2 Proxy.png', 'back': 'back.jpg'},
+        {'front': f'{tmp_path}/F07 Token.png', 'back': f'{tmp_path}/B07 Token back.png'},
+    ]
+    assert list(pl.manual_cards({}, str(tmp_path / 'missing'))) == []
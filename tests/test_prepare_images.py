@@ -0,0 +1,147 @@
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+
+class FakeImage:
+    def __init__(self, size, mode='RGBA', log=None):
+        self.size = size
+        self.mode = mode
+        self.info = {}
+        self.log = log if log is not None else []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def convert(self, mode):
+        self.log.append(('convert', mode))
+        return FakeImage(self.size, mode, self.log)
+
+    def split(self):
+        return [self]
+
+    def paste(self, *a, **k):
+        self.log.append('paste')
+
+    def resize(self, size, resample=None):
+        self.log.append(('resize', size))
+        return FakeImage(size, self.mode, self.log)
+
+    def save(self, path, fmt, **kwargs):
+        self.log.append(('save', fmt, kwargs.get('quality')))
+        with open(path, 'w') as f:
+            f.write(fmt)
+
+
+@pytest.fixture
+def pi(monkeypatch):
+    log = []
+    pil = types.ModuleType('PIL')
+    pil.Image = types.SimpleNamespace(
+        open=lambda p: FakeImage((745, 1040), 'RGBA', log),
+        new=lambda mode, size, color: FakeImage(size, mode, log),
+        LANCZOS=1,
+    )
+    monkeypatch.setitem(sys.modules, 'PIL', pil)
+    if 'prepare_images' in sys.modules:
+        del sys.modules['prepare_images']
+    mod = importlib.import_module('prepare_images')
+    mod._log = log
+    return mod
+
+
+def test_pt_to_px(pi):
+    assert pi.pt_to_px(72, 300) == 300
+
+
+def test_prepare_image_downsamples_and_caches(pi, tmp_path):
+    src = tmp_path / '1 Island.png'
+    src.write_text('')
+    cache = tmp_path / 'cache'
+
+    out = pi.prepare_image(str(src), (300, 420), 'jpeg', 80, str(cache))
+
+    assert out.endswith('.jpg')
+    assert ('resize', (300, 420)) in pi._log
+    assert 'paste' in pi._log
+    assert ('save', 'JPEG', 80) in pi._log
+
+    pi._log.clear()
+    again = pi.prepare_image(str(src), (300, 420), 'jpeg', 80, str(cache))
+    assert again == out
+    assert pi._log == []
+
+
+def test_prepare_image_never_upscales(pi, tmp_path):
+    src = tmp_path / '1 Island.png'
+    src.write_text('')
+
+    pi.prepare_image(str(src), (1000, 2000), 'png', 90, str(tmp_path / 'cache'))
+
+    assert not any(e[0] == 'resize' for e in pi._log if isinstance(e, tuple))
+
+
+def test_hardlinked_sources_share_prepared_image(pi, tmp_path):
+    src = tmp_path / '1 Island.png'
+    src.write_text('')
+    link = tmp_path / '4 Island.png'
+    os.link(src, link)
+    cache = tmp_path / 'cache'
+
+    first = pi.prepare_image(str(src), (300, 420), 'png', 90, str(cache))
+    pi._log.clear()
+    second = pi.prepare_image(str(link), (300, 420), 'png', 90, str(cache))
+
+    assert second == first
+    assert pi._log == []
+
+
+def test_prepare_many_serial(pi, tmp_path, monkeypatch):
+    calls = []
+
+    def fake_prepare(src, w, h, settings):
+        calls.append((src, w, h, settings))
+        return src + '.prepared'
+
+    monkeypatch.setattr(pi, 'prepare_for_config', fake_prepare)
+
+    cfg = {'DPI': 150, 'page_size': (1, 1)}
+    jobs = [('a', 1, 2), ('b', 1, 2), ('a', 1, 2)]
+    result = pi.prepare_many(jobs, cfg, workers=1)
+
+    assert result == {('a', 1, 2): 'a.prepared', ('b', 1, 2): 'b.prepared'}
+    assert calls == [('a', 1, 2, {'DPI': 150}), ('b', 1, 2, {'DPI': 150})]
+
+
+def test_prepare_image_only_shrinks_larger_dimension(pi, tmp_path):
+    src = tmp_path / '1 Island.png'
+    src.write_text('')
+
+    pi.prepare_image(str(src), (600, 2000), 'png', 90, str(tmp_path / 'cache'))
+
+    assert ('resize', (600, 1040)) in pi._log
+
+
+def test_prune_removes_unused_prepared_images(pi, tmp_path):
+    src = tmp_path / '1 Island.png'
+    src.write_text('')
+    cache = tmp_path / 'cache'
+    used = pi.prepare_image(str(src), (300, 420), 'png', 90, str(cache))
+    stale = cache / 'stale.png'
+    stale.write_text('')
+    old = 1_000_000_000
+    os.utime(stale, (old, old))
+    os.utime(used, (old, old))
+
+    # A cache hit marks the entry as used again.
+    pi.prepare_image(str(src), (300, 420), 'png', 90, str(cache))
+
+    assert pi.prune(30, str(cache)) == 1
+    assert not stale.exists()
+    assert os.path.exists(used)
@@ -0,0 +1,190 @@
+import importlib
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from test_fetch_images import FakeEngine, fi  # noqa: F401
+from test_generate_pdf import stub_dependencies
+
+
+@pytest.fixture
+def ps(monkeypatch, fi):
+    stub_dependencies(monkeypatch)
+    for name in ('generate_pdf', 'pipeline', 'batch', 'print_service'):
+        if name in sys.modules:
+            del sys.modules[name]
+    return importlib.import_module('print_service')
+
+
+@pytest.fixture
+def served(monkeypatch, ps, fi, tmp_path):
+    downloads = []
+    engines = []
+    data = {
+        'Island': {'id': 'i', 'lang': 'en', 'image_uris': {'png': 'http://x/i.png'}},
+        'Swamp': {'id': 's', 'lang': 'en', 'image_uris': {'png': 'http://x/s.png'}},
+    }
+
+    def make_engine(name, cfg, lang):
+        engines.append(FakeEngine(fi, data))
+        return engines[-1]
+
+    def fake_download(url):
+        downloads.append(url)
+        return url.encode()
+
+    def fake_draw(base, pages, config):
+        pages = list(pages)
+        with open(f'{base}.pdf', 'wb') as f:
+            f.write(b'%PDF ' + str(len(pages)).encode())
+        return [f'{base}.pdf'], []
+
+    monkeypatch.setattr(fi, '_make_engine', make_engine)
+    monkeypatch.setattr(fi, 'download_bytes', fake_download)
+    monkeypatch.setattr(ps.generate_pdf, 'draw_outputs', fake_draw)
+
+    service = ps.PrintService(
+        {'blank-back': True, 'downsample-images': False, 'language-default': 'en'},
+        out_dir=str(tmp_path), workers=1,
+    )
+    server = ps.make_server(service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f'http://{host}:{port}', service, downloads, engines
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def call(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data)) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as exc:
+        return exc.code, exc.read()
+
+
+def wait(url, job_id):
+    for _ in range(200):
+        status, body = call(f'{url}/jobs/{job_id}')
+        job = json.loads(body)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError('job did not finish')
+
+
+def test_submit_poll_and_download(served):
+    url, service, downloads, engines = served
+    status, body = call(f'{url}/jobs', {'decklist': '2 Island\n1 Swamp\n1 Island\n'})
+    assert status == 202
+    job = wait(url, json.loads(body)['id'])
+
+    assert job['status'] == 'done', job['error']
+    assert job['progress'] == {'cards': 4, 'total': 4, 'pages': 4}
+    assert job['files'] == ['deck.pdf']
+    status, pdf = call(f"{url}/jobs/{job['id']}/files/deck.pdf")
+    assert (status, pdf) == (200, b'%PDF 4')
+    assert len(downloads) == 2
+
+    # A second job reuses resolved cards and prepared images.
+    status, body = call(f'{url}/jobs', {'decklist': '1 Swamp', 'config': {'DPI': 300}})
+    assert wait(url, json.loads(body)['id'])['status'] == 'done'
+    assert len(downloads) == 2
+    assert len(engines) == 1 and len(engines[0].resolved) == 2
+
+
+def test_bad_requests(served, ps):
+    url, service, _, _ = served
+    assert call(f'{url}/jobs', {'config': {}})[0] == 400
+    assert call(f'{url}/jobs', {'decklist': '# nothing'})[0] == 400
+    status, body = call(
+        f'{url}/jobs', {'decklist': '1 Island', 'config': {'DEFAULT_BACK': '/etc/passwd'}}
+    )
+    assert status == 400 and b'DEFAULT_BACK' in body
+    assert service.jobs == {}
+    assert call(f'{url}/jobs/unknown')[0] == 404
+    assert call(f'{url}/other')[0] == 404
+
+    service.max_queued = 0
+    assert call(f'{url}/jobs', {'decklist': '1 Island'})[0] == 503
+
+
+def test_failed_job_reports_error(served, fi, monkeypatch):
+    url, _, _, _ = served
+
+    def broken(url):
+        raise IOError('sin conexión')
+
+    monkeypatch.setattr(fi, 'download_bytes', broken)
+    status, body = call(f'{url}/jobs', {'decklist': '1 Island'})
+    job = wait(url, json.loads(body)['id'])
+    assert (job['status'], job['error']) == ('failed', 'sin conexión')
+    assert call(f"{url}/jobs/{job['id']}/files/deck.pdf")[0] == 404
+
+
+def test_default_back_prepared_once_per_settings(ps, monkeypatch):
+    prepared = []
+
+    def fake_prepare(config):
+        prepared.append(config['DPI'])
+        config['_default_back'] = ('back.jpg', config['DPI'])
+
+    monkeypatch.setattr(ps.generate_pdf, 'prepare_default_back', fake_prepare)
+    service = ps.PrintService({'DEFAULT_BACK': 'back.jpg', 'DPI': 300}, workers=1)
+    assert prepared == [300]
+
+    for dpi in (300, 150, 300, 150):
+        config = ps.generate_pdf.layout_config({'DEFAULT_BACK': 'back.jpg', 'DPI': dpi})
+        service._default_back(config)
+        assert config['_default_back'] == ('back.jpg', dpi)
+    service.close()
+
+    assert prepared == [300, 150]
+
+
+def test_concurrent_jobs_read_the_back_separately(ps, fi, monkeypatch, tmp_path):
+    decoded = []
+    readers = []
+    drawn = []
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fake_open(path):
+        decoded.append(path)
+        return ('decoded', path)
+
+    def fake_reader(image):
+        readers.append(image)
+        return object()
+
+    def fake_draw(base, pages, config):
+        list(pages)
+        barrier.wait()
+        images = ps.generate_pdf.ImageRegistry(config)
+        drawn.append(images.get('back.jpg', 0, 0))
+        return [], [images]
+
+    data = {'Island': {'id': 'i', 'lang': 'en', 'image_uris': {'png': 'http://x/i.png'}}}
+    monkeypatch.setattr(ps.generate_pdf, 'open_rgb', fake_open)
+    monkeypatch.setattr(ps.generate_pdf, 'ImageReader', fake_reader)
+    monkeypatch.setattr(ps.generate_pdf, 'draw_outputs', fake_draw)
+    monkeypatch.setattr(fi, '_make_engine', lambda *a: FakeEngine(fi, data))
+    monkeypatch.setattr(fi, 'download_bytes', lambda url: url.encode())
+    service = ps.PrintService(
+        {'DEFAULT_BACK': 'back.jpg', 'downsample-images': False, 'language-default': 'en'},
+        out_dir=str(tmp_path), workers=2,
+    )
+    jobs = [service.submit('1 Island'), service.submit('1 Island')]
+    service.close()
+
+    assert [job.status for job in jobs] == ['done', 'done'], [j.error for j in jobs]
+    assert decoded == ['back.jpg']
+    assert readers == [('decoded', 'back.jpg')] * 2
+    assert drawn[0] is not drawn[1]
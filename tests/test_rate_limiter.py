@@ -0,0 +1,47 @@
+import rate_limiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_burst_then_waits(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+
+    bucket = rate_limiter.TokenBucket(10, burst=2)
+    delays = [bucket.acquire() for _ in range(4)]
+
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[2] > 0
+    assert clock.now > 0
+    assert bucket.acquired == 4
+    assert bucket.waited == sum(delays)
+
+
+def test_token_bucket_refills(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+
+    bucket = rate_limiter.TokenBucket(10, burst=1)
+    assert bucket.acquire() == 0.0
+    clock.now += 0.1
+    assert bucket.acquire() == 0.0
+
+
+def test_token_bucket_unlimited(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+
+    bucket = rate_limiter.TokenBucket(0)
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
+    assert clock.sleeps == []
@@ -0,0 +1,157 @@
+import importlib
+import json
+import os
+import sys
+import types
+
+import pytest
+
+from test_generate_pdf import stub_dependencies
+
+
+@pytest.fixture
+def wt(monkeypatch):
+    stub_dependencies(monkeypatch)
+    for name in ('generate_pdf', 'watch'):
+        if name in sys.modules:
+            del sys.modules[name]
+    mod = importlib.import_module('watch')
+    monkeypatch.setattr(mod.yaml, 'safe_load', json.load)
+    return mod
+
+
+def test_config_sides(wt):
+    base = {'DPI': 300, 'horizontal-back-offset': -2, 'guided-lines': True}
+    assert wt.config_sides(base, {**base, 'horizontal-back-offset': -1}) == {False}
+    assert wt.config_sides(base, {**base, 'guided-lines': False}) == {True}
+    assert wt.config_sides(base, {**base, 'fetch-workers': 4}) == set()
+    assert wt.config_sides(base, {**base, 'DPI': 150}) == {True, False}
+
+
+def test_deck_sides(wt):
+    old = {'2 Island.png': (1, 1), 'F01 Delver.png': (1, 1), 'B01 Aberration.png': (1, 1)}
+    assert wt.deck_sides(old, {**old, 'B01 Aberration.png': (2, 1)}) == {False}
+    assert wt.deck_sides(old, {**old, '2 Island.png': (2, 1)}) == {True}
+    assert wt.deck_sides(old, {**old, '1 Swamp.png': (1, 1)}) == {True, False}
+    assert wt.deck_sides(old, old) == set()
+
+
+def touch(path, content):
+    path.write_text(content)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_watcher_redraws_affected_outputs(monkeypatch, wt, tmp_path):
+    deck = tmp_path / 'deck'
+    deck.mkdir()
+    (deck / '2 Island.png').write_text('a')
+    (deck / 'F01 Delver.png').write_text('f')
+    (deck / 'B01 Aberration.png').write_text('b')
+    config = tmp_path / 'config.yml'
+    settings = {'pages-intercalation': False, 'blank-back': True, 'downsample-images': False}
+    config.write_text(json.dumps(settings))
+
+    drawn = []
+    opened = []
+
+    def fake_reader(src):
+        opened.append(src)
+        return object()
+
+    real_draw = wt.generate_pdf.draw_outputs
+
+    def draw(base, pages, config, sides, previous):
+        paths, registries = real_draw(base, pages, config, sides, previous)
+        drawn.append([os.path.basename(p) for p in paths])
+        return paths, registries
+
+    monkeypatch.setattr(wt.generate_pdf, 'ImageReader', fake_reader)
+    monkeypatch.setattr(wt.generate_pdf, 'draw_outputs', draw)
+    watcher = wt.Watcher(
+        config_path=str(config), deck_dir=str(deck), card_list=str(tmp_path / 'list.txt'),
+        base=str(tmp_path / 'out' / 'deck_watch'), interval=0.001,
+    )
+
+    watcher.start()
+    assert drawn == [['deck_watch_fronts.pdf', 'deck_watch_backs.pdf']]
+    decoded = len(opened)
+    assert watcher.poll() == []
+
+    touch(config, json.dumps({**settings, 'vertical-back-offset': 1}))
+    watcher.poll()
+    assert drawn[-1] == ['deck_watch_backs.pdf']
+    assert len(opened) == decoded
+
+    touch(deck / '2 Island.png', 'changed')
+    watcher.poll()
+    assert drawn[-1] == ['deck_watch_fronts.pdf']
+    assert len(opened) == decoded + 1
+
+    (deck / '1 Swamp.png').write_text('s')
+    watcher.poll()
+    assert drawn[-1] == ['deck_watch_fronts.pdf', 'deck_watch_backs.pdf']
+
+
+def test_watcher_fetches_with_its_own_paths(monkeypatch, wt, tmp_path):
+    deck = tmp_path / 'deck'
+    deck.mkdir()
+    config = tmp_path / 'config.yml'
+    settings = {'blank-back': True, 'downsample-images': False, 'fetch-engine': 'async'}
+    config.write_text(json.dumps(settings))
+    card_list = tmp_path / 'list.txt'
+    card_list.write_text('1 Island\n')
+    calls = []
+    fake = types.ModuleType('fetch_images')
+    fake._fetch_deck = lambda *args: calls.append(args)
+    fake.fetch_images = lambda *args: pytest.fail('fetch_images() starts a new profile')
+    monkeypatch.setitem(sys.modules, 'fetch_images', fake)
+    monkeypatch.setattr(wt.generate_pdf, 'draw_outputs', lambda *a: ([], []))
+    watcher = wt.Watcher(
+        config_path=str(config), deck_dir=str(deck), card_list=str(card_list),
+        base=str(tmp_path / 'out' / 'deck_watch'), interval=0.001,
+    )
+    watcher.start()
+
+    touch(card_list, '2 Island\n')
+    watcher.poll()
+
+    assert calls == [(settings, 'async', str(card_list), str(deck))]
+
+
+def test_fetch_needed(monkeypatch, wt):
+    fake = types.ModuleType('fetch_images')
+    fake.choose_image_variant = lambda cfg: 'png' if cfg.get('DPI', 300) > 200 else 'normal'
+    monkeypatch.setitem(sys.modules, 'fetch_images', fake)
+    base = {'DPI': 300, 'language-default': 'es'}
+
+    assert wt.fetch_needed(base, {**base, 'language-default': 'en'})
+    assert wt.fetch_needed(base, {**base, 'DPI': 150})
+    assert not wt.fetch_needed(base, {**base, 'DPI': 250})
+    assert not wt.fetch_needed(base, {**base, 'guided-lines': False})
+    assert wt.config_sides(base, {**base, 'language-default': 'en'}) == set()
+
+
+def test_watcher_refetches_when_language_changes(monkeypatch, wt, tmp_path):
+    deck = tmp_path / 'deck'
+    deck.mkdir()
+    config = tmp_path / 'config.yml'
+    settings = {'blank-back': True, 'downsample-images': False, 'language-default': 'es'}
+    config.write_text(json.dumps(settings))
+    calls = []
+    fake = types.ModuleType('fetch_images')
+    fake._fetch_deck = lambda cfg, *args: calls.append(cfg['language-default'])
+    monkeypatch.setitem(sys.modules, 'fetch_images', fake)
+    drawn = []
+    monkeypatch.setattr(wt.generate_pdf, 'draw_outputs', lambda *a: drawn.append(a) or ([], []))
+    watcher = wt.Watcher(
+        config_path=str(config), deck_dir=str(deck), card_list=str(tmp_path / 'list.txt'),
+        base=str(tmp_path / 'out' / 'deck_watch'), interval=0.001,
+    )
+    watcher.start()
+
+    touch(config, json.dumps({**settings, 'language-default': 'en'}))
+    watcher.poll()
+
+    assert calls == ['en']
+    assert len(drawn) == 1
@@ -0,0 +1,245 @@
+"""Re-render the deck PDFs whenever their inputs change.
+
+``python3 generate_pdf.py --watch`` polls ``config.yml``, ``card-list.txt``,
+``DEFAULT_BACK`` and the deck folder and redraws ``results/deck_watch.pdf``
+(or its ``_fronts``/``_backs`` pair) after every change.  The process stays
+up between renders, so image readers, and the pixels ReportLab decoded
+from them, are reused for every image that did not change.
+
+With separate fronts and backs files only the affected one is redrawn:
+back offsets, oversize, rotation and custom ``B##`` backs touch the backs,
+cutting guides and fronts touch the fronts.  A changed card list, or a
+config change that alters which images the deck needs (``language-default``
+or the image variant), is fetched first (as ``fetch_images.py`` would, with
+the watched config and into the watched deck folder), and the new images
+are then picked up from the deck folder.
+"""
+import os
+import time
+
+import yaml
+
+import generate_pdf
+
+CARD_LIST_FILE = 'card-list.txt'
+DEFAULT_INTERVAL = 0.25
+BOTH = frozenset((True, False))
+
+# Settings that only change one side of the sheet.
+BACK_KEYS = frozenset((
+    'DEFAULT_BACK', 'blank-back', 'horizontal-back-offset', 'vertical-back-offset',
+    'back-oversize', 'page-rotation-degrees',
+))
+FRONT_KEYS = frozenset(('guided-lines',))
+# Settings that change which images are fetched; the fetched images then
+# redraw what they touch.
+FETCH_KEYS = frozenset(('language-default', 'image-variant'))
+# Settings ``fetch_images.choose_image_variant`` reads.
+VARIANT_KEYS = ('image-variant', 'DPI', 'downsample-images', 'image-format')
+# Settings read by fetch_images.py or the profiler only.
+IGNORED_KEYS = frozenset((
+    'fetch-workers', 'fetch-engine', 'async-concurrency', 'scryfall-rate-limit',
+    'image-rate-limit', 'bulk-index', 'image-cache-dir', 'image-cache-max-mb',
+    'memory-cache-mb', 'profile', 'profile-trace',
+))
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def scan_deck(deck_dir):
+    """Return ``{name: (mtime, size)}`` for the images in *deck_dir*."""
+    files = {}
+    try:
+        entries = list(os.scandir(deck_dir))
+    except OSError:
+        return files
+    for entry in entries:
+        # Only card images; the manifest and partial downloads are ignored.
+        if generate_pdf.CARD_PATTERN.match(entry.name) and entry.is_file():
+            st = entry.stat()
+            files[entry.name] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def config_sides(old, new):
+    """Return the sides (``True`` for fronts) affected by a config change."""
+    sides = set()
+    for key in set(old) | set(new):
+        if old.get(key) == new.get(key) or key in IGNORED_KEYS or key in FETCH_KEYS:
+            continue
+        if key in BACK_KEYS:
+            sides.add(False)
+        elif key in FRONT_KEYS:
+            sides.add(True)
+        else:
+            return set(BOTH)
+    return sides
+
+
+def fetch_needed(old, new):
+    """Return whether config *new* needs other images than config *old*."""
+    if old.get('language-default') != new.get('language-default'):
+        return True
+    if all(old.get(k) == new.get(k) for k in VARIANT_KEYS):
+        return False
+    # requests is only needed when the variant settings change.
+    import fetch_images
+    return fetch_images.choose_image_variant(old) != fetch_images.choose_image_variant(new)
+
+
+def deck_sides(old, new):
+    """Return the sides affected by the changes from deck scan *old* to *new*."""
+    if set(old) != set(new):
+        # Cards were added or removed, so the layout moves.
+        return set(BOTH)
+    return {
+        generate_pdf.CARD_PATTERN.match(name).group(2) not in ('B', 'b')
+        for name in new if old[name] != new[name]
+    }
+
+
+class Watcher:
+    """Keeps the last render around and redraws what its inputs invalidate."""
+
+    def __init__(self, config_path=generate_pdf.CONFIG_FILE, deck_dir=None,
+                 card_list=CARD_LIST_FILE, base=None, interval=DEFAULT_INTERVAL):
+        self.config_path = config_path
+        self.deck_dir = deck_dir or generate_pdf.DECK_DIR
+        self.card_list = card_list
+        self.base = base or os.path.join(generate_pdf.RESULTS_DIR, 'deck_watch')
+        self.interval = interval
+        self.raw = {}
+        self.state = None
+        self.registries = {}
+        self._back = None
+        self._back_key = None
+
+    def _load_raw(self):
+        with open(self.config_path, 'r') as f:
+            return yaml.safe_load(f) or {}
+
+    def _snapshot(self):
+        back = self.raw.get('DEFAULT_BACK')
+        return {
+            'config': _stat(self.config_path),
+            'card_list': _stat(self.card_list),
+            'back': _stat(back) if back else None,
+            'deck': scan_deck(self.deck_dir),
+        }
+
+    def _settle(self):
+        # Wait until files stop changing so half-written saves are skipped.
+        state = self._snapshot()
+        while True:
+            time.sleep(self.interval)
+            again = self._snapshot()
+            if again == state:
+                return state
+            state = again
+
+    def _default_back(self, config):
+        """Reuse the prepared default back unless it or its settings changed."""
+        path = config.get('DEFAULT_BACK')
+        key = tuple(config.get(k) for k in generate_pdf.DEFAULT_BACK_KEYS) + (
+            _stat(path) if path else None,
+        )
+        if key != self._back_key:
+            generate_pdf.prepare_default_back(config)
+            self._back = config.get('_default_back')
+            self._back_key = key
+        elif self._back:
+            config['_default_back'] = self._back
+
+    def render(self, sides=BOTH):
+        """Draw the outputs holding *sides*; returns the written paths."""
+        config = generate_pdf.layout_config(dict(self.raw))
+        config['GRID'] = generate_pdf.compute_grid(config)
+        self._default_back(config)
+        cols, rows = config['GRID']
+        pages = generate_pdf.build_pages(
+            generate_pdf.parse_deck(config, self.deck_dir), cols, rows
+        )
+        os.makedirs(os.path.dirname(self.base) or '.', exist_ok=True)
+        paths, registries = generate_pdf.draw_outputs(
+            self.base, pages, config, sides, self.registries
+        )
+        self.registries.update(zip(paths, registries))
+        return paths
+
+    def start(self):
+        self.raw = self._load_raw()
+        self.state = self._snapshot()
+        return self._timed_render(BOTH)
+
+    def poll(self):
+        """Check the inputs once; redraw and return the paths if they changed."""
+        if self._snapshot() == self.state:
+            return []
+        new = self._settle()
+        old, self.state = self.state, new
+        sides = set()
+        changed = self.card_list if new['card_list'] != old['card_list'] else None
+
+        if new['config'] != old['config']:
+            try:
+                raw = self._load_raw()
+            except Exception as exc:
+                print(f"Advertencia: no se pudo leer '{self.config_path}': {exc}")
+                return []
+            sides |= config_sides(self.raw, raw)
+            if fetch_needed(self.raw, raw):
+                changed = self.config_path
+            self.raw = raw
+            back = raw.get('DEFAULT_BACK')
+            self.state['back'] = new['back'] = _stat(back) if back else None
+        if changed:
+            self._fetch(changed)
+            # The fetched images are picked up by the next poll.
+            self.state = self._snapshot()
+            self.state['deck'] = old['deck']
+        if new['back'] != old['back'] and not self.raw.get('blank-back'):
+            sides.add(False)
+        sides |= deck_sides(old['deck'], new['deck'])
+
+        if not sides:
+            return []
+        return self._timed_render(sides)
+
+    def _fetch(self, changed):
+        # requests is only needed when the images to fetch change.
+        import fetch_images
+        print(f"'{changed}' cambió; descargando imágenes...")
+        try:
+            fetch_images._fetch_deck(
+                self.raw, self.raw.get('fetch-engine', 'threads'),
+                self.card_list, self.deck_dir,
+            )
+        except Exception as exc:
+            print(f"Advertencia: falló la descarga: {exc}")
+
+    def _timed_render(self, sides):
+        start = time.perf_counter()
+        try:
+            paths = self.render(sides)
+        except Exception as exc:
+            print(f"Error al generar el PDF: {exc}")
+            return []
+        elapsed = time.perf_counter() - start
+        print(f"Actualizado {', '.join(paths)} en {elapsed:.2f} s")
+        return paths
+
+    def run(self):
+        self.start()
+        print("Esperando cambios (Ctrl+C para salir)...")
+        try:
+            while True:
+                time.sleep(self.interval)
+                self.poll()
+        except KeyboardInterrupt:
+            pass